@@ -4,10 +4,10 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from uvicorn.config import logger
 
+from fastapi_mqtt import FanoutHub
 from fastapi_mqtt.config import MQTTConfig
 from fastapi_mqtt.fastmqtt import FastMQTT
 
-from .mqtt_ws_client import DynamicMQTTClient
 from .router import mqtt_router
 
 # NOTE: Need to `pip install websockets` to make it work,
@@ -19,46 +19,37 @@ TEST_BROKER_HOST = os.getenv("TEST_BROKER_HOST", default="localhost")
 
 
 def create_app():
-    """Example fastAPI app with dynamic MQTT client."""
+    """Example fastAPI app forwarding MQTT messages to WebSocket and SSE clients."""
     fast_mqtt = FastMQTT(config=MQTTConfig(host=TEST_BROKER_HOST))
 
-    ws_subscribers = DynamicMQTTClient(fast_mqtt)
+    # topics are subscribed while at least one client listens to them,
+    # clients not reading fast enough lose their oldest messages
+    hub = FanoutHub(fast_mqtt, queue_size=100, slow_consumer="drop_oldest")
 
     @asynccontextmanager
     async def _lifespan(fastapi_app: FastAPI):
         await fast_mqtt.mqtt_startup()
-        fastapi_app.state.ws_subscribers = ws_subscribers
+        fastapi_app.state.hub = hub
         yield
-        await ws_subscribers.close()
+        hub.close()
         await fast_mqtt.mqtt_shutdown()
 
     app = FastAPI(lifespan=_lifespan)
 
     @fast_mqtt.on_message()
     async def _process_message(_client, topic, payload, qos, properties):
-        """
-        Common method to dispatch all received MQTT messages.
-
-        If there are multiple subscriptions that match the same topic of the
-        received message, this method will be called multiple times.
-
-        Example:
-             * Client is subscribed to 'test/#' and 'test/hello/+'
-             * Broker receives a message with topic 'test/hello/there'
-             * This method is called 2 times with the same topic and payload,
-               **one for each topic match** in the client subscriptions.
-        """
-        num_clients_send_to = await ws_subscribers.send_mqtt_msg(fast_mqtt, topic, payload.decode())
+        """Common method called for every received MQTT message."""
         logger.info(
-            "Received message: %s '%s' QoS=%s properties=%s. Broadcasted to %d ws clients",
+            "Received message: %s '%s' QoS=%s properties=%s. Forwarding to %d clients",
             topic,
             payload.decode(),
             qos,
             properties,
-            num_clients_send_to,
+            len(hub),
         )
-        return num_clients_send_to
 
+    # `/mqtt/ws?topic=<filter>` and `/mqtt/sse?topic=<filter>` endpoints
+    app.include_router(hub.router(prefix="/mqtt"))
     app.include_router(mqtt_router)
 
     return app
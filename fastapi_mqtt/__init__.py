@@ -1,7 +1,14 @@
 from gmqtt import Client as MQTTClient
 
 from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.dispatcher import topic_level
 from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.handlers import MQTTMessage
+from fastapi_mqtt.hub import FanoutHub
+from fastapi_mqtt.lastvalue import CachedValue, LastValues, LastValueSettings
+from fastapi_mqtt.publisher import PublishRefusedError
+from fastapi_mqtt.ratelimit import RateLimit
+from fastapi_mqtt.watchdog import HandlerTimeoutError
 
 __author__ = "Sabuhi Shukurov"
 
@@ -15,4 +22,17 @@ __credits__ = [
     "Jeremy T. Hetzel",
 ]
 
-__all__ = ["FastMQTT", "MQTTConfig", "MQTTClient"]
+__all__ = [
+    "CachedValue",
+    "FanoutHub",
+    "FastMQTT",
+    "HandlerTimeoutError",
+    "LastValueSettings",
+    "LastValues",
+    "MQTTClient",
+    "MQTTConfig",
+    "MQTTMessage",
+    "PublishRefusedError",
+    "RateLimit",
+    "topic_level",
+]
@@ -0,0 +1,94 @@
+import asyncio
+from logging import Logger
+from typing import Any, List, Optional, Set
+
+from gmqtt import Client as MQTTClient
+
+from .handlers import MQTTBatchHandler, MQTTMessage
+
+
+class MessageBatcher:
+    """
+    Buffers received messages and hands them over to a handler as a list.
+
+    The buffer is flushed when it holds `max_size` messages or when its oldest
+    message has waited `max_latency` seconds, whatever comes first. At most
+    `max_flushes` batches are handled at once, a full batch waits for a free flush,
+    holding the message that filled it.
+
+    handler: Coroutine function called with the client and the list of messages,
+        guarded by the watchdog so a hung handler is cancelled after its timeout
+    max_size: Maximum number of messages in a batch
+    max_latency: Maximum number of seconds a message waits before being handled
+    max_flushes: Maximum number of batches handled concurrently
+    """
+
+    def __init__(
+        self,
+        handler: MQTTBatchHandler,
+        logger: Logger,
+        *,
+        max_size: int = 100,
+        max_latency: float = 1.0,
+        max_flushes: int = 1,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if max_flushes < 1:
+            raise ValueError("max_flushes must be at least 1")
+        self._handler = handler
+        self._logger = logger
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self.max_flushes = max_flushes
+        self._flushes = asyncio.Semaphore(max_flushes)
+        self._messages: List[MQTTMessage] = []
+        self._client: Optional[MQTTClient] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pending: Set["asyncio.Future[Any]"] = set()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    async def add(
+        self, client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
+    ) -> None:
+        """Message handler buffering the message, flushing the batch once it is full."""
+        self._client = client
+        self._messages.append(MQTTMessage(topic, payload, qos, properties))
+        if len(self._messages) >= self.max_size:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_latency, self._flush_on_timeout)
+
+    def _flush_on_timeout(self) -> None:
+        self._timer = None
+        flush = asyncio.ensure_future(self.flush())
+        self._pending.add(flush)
+        flush.add_done_callback(self._pending.discard)
+
+    async def flush(self) -> Any:
+        """Call the handler with the oldest buffered messages, at most `max_size`, if any."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._flushes:
+            # the messages may have been handled by the flush waited for
+            if not self._messages:
+                return None
+            messages = self._messages[: self.max_size]
+            del self._messages[: self.max_size]
+            try:
+                return await self._handler(self._client, messages)
+            except Exception:
+                self._logger.exception(
+                    "Error while handling a batch of %d messages", len(messages)
+                )
+                return None
+
+    async def close(self) -> None:
+        """Flush the remaining messages and wait for the running flushes."""
+        await self.flush()
+        if self._pending:
+            await asyncio.gather(*self._pending)
@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import inspect
+import json
+import typing
+from logging import Logger
+from typing import Any, Callable, Dict, Literal, Optional
+
+from pydantic import TypeAdapter
+
+# optional dependencies, the ignores cover both installed and missing packages
+try:
+    import orjson  # type: ignore[import-not-found, unused-ignore]
+except ImportError:
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+try:
+    import msgspec  # type: ignore[import-not-found, unused-ignore]
+except ImportError:
+    msgspec = None  # type: ignore[assignment, unused-ignore]
+
+CodecName = Literal["auto", "json", "orjson", "msgspec"]
+
+# payload annotations for which handlers keep receiving the raw bytes
+_RAW_PAYLOAD_TYPES = (inspect.Parameter.empty, bytes, Any)
+
+
+class JSONCodec:
+    """Decodes JSON payloads, subclass it to plug another JSON library."""
+
+    name = "json"
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise RuntimeError("orjson is not installed, run `pip install orjson`")
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecCodec(JSONCodec):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        if msgspec is None:
+            raise RuntimeError("msgspec is not installed, run `pip install msgspec`")
+        self._decoder = msgspec.json.Decoder()
+
+    def loads(self, data: bytes) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+
+def get_codec(name: CodecName = "auto") -> JSONCodec:
+    """Return the codec by name, "auto" picks the fastest installed one."""
+    if name == "auto":
+        if orjson is not None:
+            return OrjsonCodec()
+        if msgspec is not None:
+            return MsgspecCodec()
+        return JSONCodec()
+    if name == "orjson":
+        return OrjsonCodec()
+    if name == "msgspec":
+        return MsgspecCodec()
+    return JSONCodec()
+
+
+class PayloadDecoder:
+    """
+    Decodes payloads into one type, remembering the payload of the message being dispatched.
+
+    All the handlers of a message are called one after another with the same payload
+    object, so the ones sharing a payload type reuse a single decoded value. The value is
+    forgotten once they are called, a payload object delivered again is decoded again.
+    """
+
+    __slots__ = ("_decode", "_payload", "_value", "payload_type")
+
+    def __init__(self, payload_type: Any, decode: Callable[[bytes], Any]) -> None:
+        self.payload_type = payload_type
+        self._decode = decode
+        self._payload: Optional[bytes] = None
+        self._value: Any = None
+
+    def __call__(self, payload: bytes) -> Any:
+        if payload is not self._payload:
+            self._value = self._decode(payload)
+            self._payload = payload
+        return self._value
+
+    def forget(self) -> None:
+        self._payload = self._value = None
+
+
+class PayloadDecoders:
+    """
+    Builds and keeps one `PayloadDecoder` per payload type declared by handlers.
+
+    The payload type is the annotation of the third handler argument
+    (client, topic, payload, qos, properties):
+    `bytes` or no annotation keeps the raw payload, `str` decodes it as UTF-8,
+    `dict` and `list` use the JSON codec, and any other type, like a pydantic model,
+    is validated from JSON by a pydantic `TypeAdapter` built once per type.
+    """
+
+    def __init__(self, codec: JSONCodec, logger: Logger) -> None:
+        self.codec = codec
+        self._logger = logger
+        self._decoders: Dict[Any, PayloadDecoder] = {}
+
+    def for_type(self, payload_type: Any) -> Optional[PayloadDecoder]:
+        """Return the shared decoder of a payload type, None for raw payloads."""
+        if payload_type in _RAW_PAYLOAD_TYPES:
+            return None
+        decoder = self._decoders.get(payload_type)
+        if decoder is None:
+            decoder = PayloadDecoder(payload_type, self._build_decode(payload_type))
+            self._decoders[payload_type] = decoder
+        return decoder
+
+    def forget(self) -> None:
+        """Forget the decoded values, called once the handlers of a message were called."""
+        for decoder in self._decoders.values():
+            decoder.forget()
+
+    def for_handler(self, handler: Callable[..., Any]) -> Optional[PayloadDecoder]:
+        """Return the decoder of the payload type declared by a handler, if any."""
+        try:
+            parameters = list(inspect.signature(handler).parameters.values())
+        except (TypeError, ValueError):
+            return None
+        if len(parameters) < 3:
+            return None
+
+        payload_type = parameters[2].annotation
+        if isinstance(payload_type, str):
+            try:
+                payload_type = typing.get_type_hints(handler).get(parameters[2].name, bytes)
+            except (NameError, TypeError):
+                self._logger.warning("Cannot resolve payload type %s, using bytes", payload_type)
+                return None
+        return self.for_type(payload_type)
+
+    def _build_decode(self, payload_type: Any) -> Callable[[bytes], Any]:
+        if payload_type is str:
+            return functools.partial(bytes.decode, encoding="utf-8")
+        if payload_type in (dict, list):
+            return self.codec.loads
+        return TypeAdapter(payload_type).validate_json
+
+    def wrap(
+        self, handler: Callable[..., Any], message_handler: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        """
+        Return `message_handler` decoding the payload into the type declared by `handler`.
+
+        The payload is decoded when the handler is called, so every handler of a message
+        shares the decoded value. A payload that cannot be decoded is logged and the
+        handler is skipped.
+        """
+        decoder = self.for_handler(handler)
+        if decoder is None:
+            return message_handler
+
+        @functools.wraps(handler)
+        def _decoding_handler(
+            client: Any, topic: str, payload: bytes, qos: int, properties: Any
+        ) -> Any:
+            try:
+                value = decoder(payload)
+            except ValueError as exc:
+                self._logger.warning(
+                    "Cannot decode payload of %s as %s for %s: %s",
+                    topic,
+                    decoder.payload_type,
+                    getattr(handler, "__name__", handler),
+                    exc,
+                )
+                skipped = asyncio.get_running_loop().create_future()
+                skipped.set_result(None)
+                return skipped
+            return message_handler(client, topic, value, qos, properties)
+
+        return _decoding_handler
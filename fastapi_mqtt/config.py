@@ -1,9 +1,22 @@
 from ssl import SSLContext
-from typing import Optional, Union
+from typing import Dict, Literal, Optional, Union
 
 from gmqtt.mqtt.constants import MQTTv50
 from pydantic import BaseModel, ConfigDict
 
+from .codecs import CodecName, JSONCodec
+from .dedup import DedupKey
+from .dispatcher import OverflowPolicy
+from .lastvalue import LastValueSettings
+from .ratelimit import RateLimit
+
+# topic_hash: messages on the same topic always use the same connection, keeping their order
+# round_robin: messages are spread evenly over the connections
+PublishDistribution = Literal["topic_hash", "round_robin"]
+# local_and_broker: deliver to local subscriptions and publish to the broker as well
+# local_only: messages matching local subscriptions are not published to the broker
+LocalDelivery = Literal["local_and_broker", "local_only"]
+
 
 class MQTTConfig(BaseModel):
     """
@@ -33,12 +46,147 @@ class MQTTConfig(BaseModel):
         in case of lost connections. The number of reconnect attempts is unlimited.
         For changing this behavior give reconnect_retries and reconnect_delay values.
         For more info: # https://github.com/wialon/gmqtt#reconnects
+    reconnect_delay_max: The reconnect delay doubles after every failed attempt, up to this
+        number of seconds. Defaults to None, keeping the delay constant.
+    reconnect_jitter: Fraction of the reconnect delay randomly removed from each attempt,
+        so many instances don't reconnect at the same time, e.g. 0.5. Defaults to 0.
 
     The last three parameters are used after the client disconnects abnormally
 
     will_message_topic: Topic of the payload
     will_message_payload: The payload
     will_delay_interval: Delay interval
+
+    topic_cache_size: Maximum number of received topic names whose matching
+        subscriptions are remembered (LRU), 0 disables the cache. Defaults to 1024.
+
+    auto_subscription_identifiers: Assign a unique MQTT5.0 subscription identifier to every
+        subscribed topic, replacing the ones passed to `subscribe()`, so received messages
+        are dispatched by identifier instead of topic matching. Messages arriving without
+        identifiers (e.g. MQTT3.1.1 brokers) fall back to topic matching. As a SUBSCRIBE
+        packet carries a single identifier, every topic is then sent in its own packet.
+        Defaults to False.
+
+    dispatch_workers: Number of worker tasks handling received messages. By default (None)
+        every message is handled as soon as it arrives, without any concurrency limit.
+    dispatch_queue_size: Maximum number of received messages waiting for a free worker,
+        0 means unbounded. Defaults to 10000.
+    dispatch_overflow: What to do with a message when the queue is full:
+        "block" keeps the message and pauses reading from the broker until the queue
+        drained to half (default). Messages already read are still queued, so the queue
+        can briefly exceed its size. A connection paused for twice `keepalive` seconds is
+        considered lost and reconnected.
+        "drop_newest" discards the new message and
+        "drop_oldest" discards the oldest queued message to make room.
+
+    ordered_lanes: Number of lanes used by subscriptions with an `ordering_key`.
+        Messages with the same key are handled in order on the same lane,
+        different keys are handled concurrently. Defaults to 8.
+
+    sync_handler_workers: Maximum number of threads running synchronous (plain `def`)
+        message handlers, so they do not block the event loop. Defaults to 4.
+
+    publish_queue: Coalesce published messages into larger socket writes. Defaults to False.
+    publish_queue_max_bytes: Buffered size that triggers a write. Defaults to 65536.
+    publish_queue_max_delay: Maximum number of seconds a published message is buffered.
+        Defaults to 0.005.
+
+    publish_inflight_window: Maximum number of messages sent with `publish_async()`
+        waiting for their QoS 1/2 acknowledgement at the same time. Defaults to 100.
+
+    connections: Number of connections (gmqtt clients) opened to the broker. With several
+        connections, subscriptions are sent as `$share/<shared_group>/<topic>` shared
+        subscriptions so the broker spreads messages across them, and all the received
+        messages go through the same handlers. Defaults to 1.
+    publish_distribution: How published messages are spread over the connections:
+        "topic_hash" keeps the order per topic (default), "round_robin" spreads them evenly.
+    shared_group: Name of the shared subscription group. Defaults to None, which means
+        no group with a single connection and a group named after the client id otherwise.
+    worker_scaling: Share the load between the worker processes of the app
+        (e.g. `uvicorn --workers 8`): the process id is appended to the client id and
+        subscriptions are sent as shared subscriptions of the same group in every process,
+        so each message is handled by a single worker. The group is named after the
+        `client_id` passed to `FastMQTT` unless `shared_group` is set, one of them is
+        required. Defaults to False.
+
+    payload_codec: JSON library decoding the payloads of handlers declaring a `dict` or
+        `list` payload type: "json", "orjson", "msgspec" or a `JSONCodec` instance.
+        Defaults to "auto", the fastest installed one.
+
+    metrics: Count received and published messages, reconnects and subscriptions, and
+        record calls, failures and latency of every handler per topic filter, exposed by
+        `FastMQTT.metrics.router()` in Prometheus text format. Defaults to False.
+
+    local_delivery: Deliver messages published by the app to its own matching subscriptions
+        in-process, without the broker round trip. Defaults to None (disabled).
+        "local_and_broker" still publishes every message to the broker and subscribes with
+        `no_local` so the broker does not send them back (requires MQTT5.0), shared
+        subscriptions are left to the broker. "local_only" publishes to the broker only the
+        messages no local subscription matches. Subscriptions made with `no_local=True`
+        never receive local deliveries.
+
+    dedup_window: Number of seconds QoS 1 messages are remembered to drop the duplicates
+        redelivered after reconnects, before they reach the handlers. Defaults to 0 (disabled).
+    dedup_max_entries: Maximum number of remembered messages, the oldest are forgotten first.
+        Defaults to 10000.
+    dedup_key: Function returning the fingerprint of a message from its topic, payload and
+        properties, e.g. a message id property. Defaults to a hash of topic and payload,
+        which only drops redeliveries flagged DUP: the same payload published again
+        is not a duplicate.
+
+    spool: Keep the messages published while the broker is unreachable (before the first
+        connection or after losing it) and send them once connected. Defaults to False.
+        Each connection has its own spool, messages for the connections still up are sent.
+    spool_memory_size: Maximum number of messages kept in memory, per connection.
+        Defaults to 1000.
+    spool_path: File the spool overflows to once memory is full, kept across restarts.
+        Defaults to None, dropping the messages that do not fit in memory and the ones
+        left unsent on shutdown. Not supported with `worker_scaling`, every process would
+        write the same file. With several `connections`, the other connections append their
+        index to the path, e.g. `spool.bin.1`.
+    spool_max_bytes: Maximum size of the spool file. Defaults to 16 MiB.
+    spool_drain_rate: Maximum number of spooled messages sent per second per connection,
+        so a reconnect does not flood the broker, 0 means no limit. Defaults to 100.
+
+    subscribe_max_filters: Maximum number of topic filters sent per SUBSCRIBE packet on
+        (re)connect, 0 means as many as the maximum packet size of the broker allows.
+        Defaults to 0.
+
+    inbound_rate_limits: Token-bucket `RateLimit` per subscribed topic filter, applied to
+        the messages dispatched to the handlers of that filter, so a flood on one topic
+        does not starve the other subscriptions. Defaults to {} (no limit).
+    outbound_rate_limits: `RateLimit` per topic or topic filter, applied to the published
+        messages on matching topics. Defaults to {} (no limit).
+    publish_rate_limit: `RateLimit` applied to every published message. Defaults to None.
+        Each limit sets its policy: "drop" the messages above the rate, "delay" them until
+        a token is available (up to `max_delay` seconds), or pass them to an "overflow"
+        handler. Counters of every limiter are kept in `FastMQTT.rate_limiters`.
+        Delayed received messages are handled in the background, without holding a
+        dispatch worker, and their handler results are not returned.
+
+    last_values: Keep the last message received on every topic matching these topic
+        filters, each with its `LastValueSettings` (maximum number of topics, TTL and
+        subscription QoS). The filters are subscribed automatically by the main connection,
+        never as shared subscriptions so every worker keeps every value, and the values are
+        read with `FastMQTT.last_values`, also a FastAPI dependency. Defaults to {}.
+
+    response_topic_prefix: Prefix of the topic the responses to `FastMQTT.request()` are
+        received on, followed by the client id. Defaults to "fastapi-mqtt/responses".
+    request_timeout: Default number of seconds `FastMQTT.request()` waits for a response.
+        Defaults to 10.
+
+    background_connect: Make `mqtt_startup()` return right away and connect in a background
+        task, retrying with the reconnect delays until the broker accepts the connection.
+        `FastMQTT.ready` is set once every connection is up and the broker acknowledged
+        every subscription, routes can depend on `FastMQTT.readiness` to answer 503 until
+        then. Messages published before are kept in the publish spool, enabled by this
+        option (see `spool_memory_size`).
+        Defaults to False.
+
+    handler_timeout: Number of seconds after which a message handler is cancelled, unless
+        it sets its own `timeout`. Defaults to None (no timeout).
+    slow_handler_threshold: Number of seconds after which a running message handler is
+        logged as slow with its name and the topic, and counted. Defaults to None (disabled).
     """
 
     host: str = "localhost"
@@ -51,9 +199,62 @@ class MQTTConfig(BaseModel):
 
     reconnect_retries: Optional[int] = 1
     reconnect_delay: Optional[int] = 6
+    reconnect_delay_max: Optional[float] = None
+    reconnect_jitter: float = 0
 
     will_message_topic: Optional[str] = None
     will_message_payload: Optional[str] = None
     will_delay_interval: Optional[int] = None
 
+    topic_cache_size: int = 1024
+    auto_subscription_identifiers: bool = False
+
+    dispatch_workers: Optional[int] = None
+    dispatch_queue_size: int = 10000
+    dispatch_overflow: OverflowPolicy = "block"
+    ordered_lanes: int = 8
+    sync_handler_workers: int = 4
+
+    publish_queue: bool = False
+    publish_queue_max_bytes: int = 65536
+    publish_queue_max_delay: float = 0.005
+    publish_inflight_window: int = 100
+
+    connections: int = 1
+    publish_distribution: PublishDistribution = "topic_hash"
+    shared_group: Optional[str] = None
+    worker_scaling: bool = False
+
+    payload_codec: Union[CodecName, JSONCodec] = "auto"
+
+    metrics: bool = False
+
+    local_delivery: Optional[LocalDelivery] = None
+
+    dedup_window: float = 0
+    dedup_max_entries: int = 10000
+    dedup_key: Optional[DedupKey] = None
+
+    spool: bool = False
+    spool_memory_size: int = 1000
+    spool_path: Optional[str] = None
+    spool_max_bytes: int = 16 * 1024 * 1024
+    spool_drain_rate: float = 100
+
+    subscribe_max_filters: int = 0
+
+    inbound_rate_limits: Dict[str, RateLimit] = {}
+    outbound_rate_limits: Dict[str, RateLimit] = {}
+    publish_rate_limit: Optional[RateLimit] = None
+
+    last_values: Dict[str, LastValueSettings] = {}
+
+    response_topic_prefix: str = "fastapi-mqtt/responses"
+    request_timeout: float = 10
+
+    background_connect: bool = False
+
+    handler_timeout: Optional[float] = None
+    slow_handler_threshold: Optional[float] = None
+
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -0,0 +1,88 @@
+import random
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from gmqtt import Client as MQTTClient
+from gmqtt import Subscription
+
+# Largest packet allowed by MQTT (maximum of the remaining length plus fixed header)
+MAX_PACKET_SIZE = 268435455 + 5
+# fixed header (5 bytes at most), packet identifier, properties with a subscription identifier
+_SUBSCRIBE_OVERHEAD = 5 + 2 + 1 + 1 + 4
+
+
+def maximum_packet_size(client: MQTTClient) -> int:
+    """Maximum packet size accepted by the broker, as announced in its CONNACK."""
+    properties = client._package_handler._connack_properties
+    announced = properties.get("maximum_packet_size")
+    if announced:
+        return min(announced[0], MAX_PACKET_SIZE)
+    return MAX_PACKET_SIZE
+
+
+def batch_subscriptions(
+    subscriptions: Sequence[Subscription], max_packet_size: int, max_filters: int = 0
+) -> List[Tuple[Any, List[Subscription]]]:
+    """
+    Group subscriptions into SUBSCRIBE packets.
+
+    A SUBSCRIBE packet carries a single subscription identifier, so subscriptions are
+    grouped by identifier, then split to fit `max_packet_size` bytes and, when given,
+    `max_filters` topic filters per packet.
+    Returns (subscription identifier, subscriptions) pairs, one per packet.
+    """
+    by_identifier: Dict[Any, List[Subscription]] = {}
+    for subscription in subscriptions:
+        by_identifier.setdefault(subscription.subscription_identifier, []).append(subscription)
+
+    batches = []
+    for identifier, grouped in by_identifier.items():
+        batch: List[Subscription] = []
+        size = _SUBSCRIBE_OVERHEAD
+        for subscription in grouped:
+            # topic length, topic and subscription options
+            entry_size = 2 + len(subscription.topic.encode()) + 1
+            if batch and (size + entry_size > max_packet_size or len(batch) == max_filters):
+                batches.append((identifier, batch))
+                batch, size = [], _SUBSCRIBE_OVERHEAD
+            batch.append(subscription)
+            size += entry_size
+        batches.append((identifier, batch))
+    return batches
+
+
+class BackoffConfig(dict):
+    """
+    gmqtt connection settings computing an exponential reconnect delay with jitter.
+
+    gmqtt reads `reconnect_delay` before every reconnect attempt, so this dict returns
+    `reconnect_delay * 2 ** failed attempts`, capped at `delay_max`, and shortened by up to
+    `jitter` (a fraction of the delay) so many instances don't reconnect at the same time.
+
+    failed_attempts: Returns the number of failed attempts since the last connection
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        failed_attempts: Callable[[], int],
+        *,
+        delay_max: Optional[float] = None,
+        jitter: float = 0.0,
+    ) -> None:
+        super().__init__(config)
+        self.failed_attempts = failed_attempts
+        self.delay_max = delay_max
+        self.jitter = jitter
+
+    def __getitem__(self, key: str) -> Any:
+        value = super().__getitem__(key)
+        if key != "reconnect_delay" or value is None:
+            return value
+        return self.reconnect_delay(value, self.failed_attempts())
+
+    def reconnect_delay(self, delay: float, failed_attempts: int) -> float:
+        if self.delay_max is not None:
+            delay = min(delay * 2 ** min(failed_attempts, 32), max(self.delay_max, delay))
+        if self.jitter:
+            delay -= delay * self.jitter * random.random()
+        return delay
@@ -0,0 +1,49 @@
+import asyncio
+import itertools
+import os
+from typing import Any, Dict, Tuple
+
+
+class PendingRequests:
+    """
+    Requests waiting for their response, by MQTT5.0 correlation data.
+
+    Correlation data is a random prefix, drawn once per instance so responses to a previous
+    process with the same client id are ignored, followed by a counter.
+    Lookups are O(1), entries are removed as soon as the request completes or times out.
+    """
+
+    __slots__ = ("_futures", "_ids", "_prefix")
+
+    def __init__(self) -> None:
+        self._futures: Dict[bytes, "asyncio.Future[Any]"] = {}
+        self._prefix = os.urandom(4)
+        self._ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def create(self) -> Tuple[bytes, "asyncio.Future[Any]"]:
+        """Return the correlation data of a new request and the future of its response."""
+        correlation_data = self._prefix + next(self._ids).to_bytes(8, "big")
+        future = asyncio.get_running_loop().create_future()
+        self._futures[correlation_data] = future
+        return correlation_data, future
+
+    def resolve(self, correlation_data: bytes, response: Any) -> bool:
+        """Complete the request with its response, returns False for unknown or late ones."""
+        future = self._futures.pop(correlation_data, None)
+        if future is None or future.done():
+            return False
+        future.set_result(response)
+        return True
+
+    def discard(self, correlation_data: bytes) -> None:
+        self._futures.pop(correlation_data, None)
+
+    def fail(self, exception: BaseException) -> None:
+        """Fail every pending request, e.g. on shutdown."""
+        futures, self._futures = self._futures, {}
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(exception)
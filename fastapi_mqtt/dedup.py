@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Receives topic, payload and properties of a message and returns its fingerprint
+DedupKey = Callable[[str, bytes, Any], Hashable]
+
+
+def payload_fingerprint(topic: str, payload: bytes, properties: Any) -> Hashable:
+    """Default fingerprint, a hash of the topic name and the payload."""
+    return hash((topic, payload))
+
+
+class DedupWindow:
+    """
+    Remembers fingerprints of recent messages to detect duplicates.
+
+    A fingerprint is kept `ttl` seconds and at most `maxsize` fingerprints are kept,
+    the oldest ones are forgotten first. Lookups are O(1), memory is bounded by `maxsize`.
+
+    key: Function computing the fingerprint of a message, see `DedupKey`. With the default
+        fingerprint of topic and payload, a message is only a duplicate when redelivered
+        with the DUP flag, so identical payloads published again still go through.
+        A custom key, e.g. a message id property, is trusted on its own.
+    """
+
+    __slots__ = ("_clock", "_expiries", "_redeliveries_only", "key", "maxsize", "suppressed", "ttl")
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int = 10000,
+        key: Optional[DedupKey] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.key = key or payload_fingerprint
+        self._redeliveries_only = key is None
+        self.suppressed = 0
+        self._clock = clock
+        # fingerprints in insertion order, which is also expiry order
+        self._expiries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expiries)
+
+    def is_duplicate(self, topic: str, payload: bytes, properties: Any) -> bool:
+        """Record a message, returns if the same fingerprint was seen within the window."""
+        fingerprint = self.key(topic, payload, properties)
+        now = self._clock()
+        expiries = self._expiries
+        while expiries:
+            oldest, expiry = next(iter(expiries.items()))
+            if expiry > now:
+                break
+            del expiries[oldest]
+
+        if fingerprint in expiries:
+            if not self._redeliveries_only or (properties and properties.get("dup")):
+                self.suppressed += 1
+                return True
+            # the same payload published again, remembered from now on
+            expiries.move_to_end(fingerprint)
+
+        expiries[fingerprint] = now + self.ttl
+        if len(expiries) > self.maxsize:
+            expiries.popitem(last=False)
+        return False
+
+    def clear(self) -> None:
+        self._expiries.clear()
@@ -0,0 +1,226 @@
+import asyncio
+import functools
+from logging import Logger
+from typing import Any, Awaitable, Callable, Hashable, List, Literal, Optional, Tuple
+
+# block: queue the message and pause reading new messages until the queue drains to half
+# drop_newest: discard the message that does not fit
+# drop_oldest: discard the oldest queued message to make room for the new one
+OverflowPolicy = Literal["block", "drop_newest", "drop_oldest"]
+
+# Receives the topic name of a message and returns the key used to order its handling
+OrderingKey = Callable[[str], Hashable]
+
+
+def topic_level(level: int) -> OrderingKey:
+    """
+    Ordering key using a single level of the topic name.
+
+    e.g. `topic_level(1)` orders messages of `devices/<device_id>/#` per device.
+    """
+
+    def _key(topic: str) -> Hashable:
+        levels = topic.split("/")
+        return levels[level] if -len(levels) <= level < len(levels) else topic
+
+    return _key
+
+
+class Dispatcher:
+    """
+    Runs message handling on a fixed number of worker tasks fed by a bounded queue.
+
+    handler: Coroutine function called by the workers with each submitted item
+    workers: Number of concurrent worker tasks
+    queue_size: Maximum number of items waiting for a worker, 0 means unbounded
+    overflow: Policy applied when the queue is full, see `OverflowPolicy`
+    on_backpressure: Called with True when the queue fills up with the "block" policy,
+        to stop reading new items, and with False once it drained to half of `queue_size`.
+        Items submitted while paused are still queued, the queue grows by the items
+        already read at most.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[Any]],
+        logger: Logger,
+        *,
+        workers: int = 1,
+        queue_size: int = 0,
+        overflow: OverflowPolicy = "block",
+        on_backpressure: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("Dispatcher needs at least one worker")
+        self._handler = handler
+        self._logger = logger
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.dropped = 0
+        self.on_backpressure = on_backpressure
+        # reading is paused until the queue drains
+        self.paused = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of items waiting for a free worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Spawn the worker tasks, must be called from a running event loop."""
+        if self._tasks:
+            return
+        # with "block", the queue size is enforced by pausing the reads instead
+        self._queue = asyncio.Queue(0 if self.overflow == "block" else self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(self._queue)) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stop the workers, optionally waiting for the queued items to be handled first."""
+        if self._queue is not None and drain:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, *args: Any) -> bool:
+        """Queue handler arguments following the overflow policy. Returns if it was queued."""
+        if self._queue is None:
+            raise RuntimeError("Dispatcher is not running")
+
+        if self.overflow == "block":
+            self._queue.put_nowait(args)
+            if self.queue_size and self._queue.qsize() >= self.queue_size:
+                self._set_paused(True)
+            return True
+        if not self._queue.full():
+            self._queue.put_nowait(args)
+            return True
+
+        self.dropped += 1
+        if self.overflow == "drop_newest":
+            self._logger.warning("Dispatch queue is full, dropping newest message")
+            return False
+
+        self._logger.warning("Dispatch queue is full, dropping oldest message")
+        self._queue.get_nowait()
+        self._queue.task_done()
+        self._queue.put_nowait(args)
+        return True
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            args: Tuple[Any, ...] = await queue.get()
+            if self.paused and queue.qsize() <= self.queue_size // 2:
+                self._set_paused(False)
+            try:
+                await self._handler(*args)
+            except Exception:
+                self._logger.exception("Error while dispatching message")
+            finally:
+                queue.task_done()
+
+    def _set_paused(self, paused: bool) -> None:
+        if paused == self.paused:
+            return
+        self.paused = paused
+        if paused:
+            self._logger.warning("Dispatch queue is full, pausing reading messages")
+        else:
+            self._logger.info("Dispatch queue drained, resuming reading messages")
+        if self.on_backpressure is not None:
+            self.on_backpressure(paused)
+
+
+class KeyedDispatcher:
+    """
+    Runs handlers on a fixed pool of lanes, each one handling its items in order.
+
+    Items submitted with the same key always go to the same lane, so they are handled
+    one after another in submission order, while different keys run concurrently.
+
+    lanes: Number of lanes (worker tasks)
+    """
+
+    def __init__(self, logger: Logger, *, lanes: int = 8) -> None:
+        if lanes < 1:
+            raise ValueError("KeyedDispatcher needs at least one lane")
+        self._logger = logger
+        self.lanes = lanes
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of items waiting in all the lanes."""
+        return sum(queue.qsize() for queue in self._queues)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Spawn one task per lane, must be called from a running event loop."""
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue() for _ in range(self.lanes)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stop the lanes, optionally waiting for the queued items to be handled first."""
+        if drain:
+            await asyncio.gather(*(queue.join() for queue in self._queues))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+    def submit(
+        self, key: Hashable, handler: Callable[..., Awaitable[Any]], *args: Any
+    ) -> "asyncio.Future[Any]":
+        """
+        Queue a handler call on the lane of the key.
+
+        The call is queued immediately, the returned future resolves with its result.
+        """
+        if not self._tasks:
+            raise RuntimeError("KeyedDispatcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queues[hash(key) % self.lanes].put_nowait((future, handler, args))
+        return future
+
+    def wrap(
+        self, handler: Callable[..., Awaitable[Any]], key: OrderingKey
+    ) -> Callable[..., "asyncio.Future[Any]"]:
+        """Return a message handler submitting calls to the lane of `key(topic)`."""
+
+        @functools.wraps(handler)
+        def _ordered_handler(
+            client: Any, topic: str, payload: bytes, qos: int, properties: Any
+        ) -> "asyncio.Future[Any]":
+            return self.submit(key(topic), handler, client, topic, payload, qos, properties)
+
+        return _ordered_handler
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            future, handler, args = await queue.get()
+            try:
+                result = await handler(*args)
+            except Exception as exc:  # noqa: BLE001 - handed over to the caller
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                queue.task_done()
@@ -1,16 +1,39 @@
 import asyncio
+import functools
+import inspect
+import itertools
 import logging
+import os
 import uuid
-from itertools import zip_longest
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from gmqtt import Client as MQTTClient
-from gmqtt import Message, Subscription
-from gmqtt.mqtt.constants import MQTTv50
+from gmqtt import Message, MQTTConnectError, Subscription
+from gmqtt.mqtt.constants import DEFAULT_CONFIG, MQTTv50
 
+from .batching import MessageBatcher
+from .codecs import get_codec, JSONCodec, PayloadDecoders
 from .config import MQTTConfig
-from .handlers import MQTTHandlers
+from .connection import BackoffConfig, batch_subscriptions, maximum_packet_size
+from .correlation import PendingRequests
+from .dedup import DedupWindow
+from .dispatcher import Dispatcher, KeyedDispatcher, OrderingKey
+from .handlers import MQTTHandlers, MQTTMessage
+from .health import MQTTHealth
+from .lastvalue import LastValueCache, LastValues
+from .metrics import MQTTMetrics
+from .publisher import (
+    AcknowledgementTracker,
+    build_publish_packet,
+    PublishQueue,
+    track_refused_acknowledgements,
+    write_packets,
+)
+from .ratelimit import RateLimiter
+from .spool import PublishSpool
+from .topics import match_topic, SHARED_SUBSCRIPTION_PREFIX, TopicCache, TopicTrie
+from .watchdog import HandlerWatchdog
 
 try:
     from uvicorn.config import logger as log_info
@@ -18,6 +41,21 @@ except ImportError:
     log_info = logging.getLogger()
 
 
+def _is_connected(client: MQTTClient) -> bool:
+    return client._connection is not None and client.is_connected
+
+
+def _handler_name(handler: Callable) -> str:
+    return f"{getattr(handler, '__module__', '')}.{getattr(handler, '__qualname__', handler)}"
+
+
+def _spool_path(path: Optional[str], index: int) -> Optional[str]:
+    """Spool file of the connection at index, the main connection keeps the configured one."""
+    if path is None or index == 0:
+        return path
+    return f"{path}.{index}"
+
+
 class FastMQTT:
     """
     FastMQTT client sets connection parameters before connecting and manipulating the MQTT service.
@@ -50,26 +88,107 @@ class FastMQTT:
         mqtt_logger: Optional[logging.Logger] = None,
         **kwargs: Any,
     ) -> None:
+        self._shared_group: Optional[str] = config.shared_group
+        if config.worker_scaling:
+            client_id = self._join_worker_group(config, client_id)
+
         if not client_id:
             client_id = uuid.uuid4().hex
 
-        self.client: MQTTClient = MQTTClient(client_id, **kwargs)
         self.config: MQTTConfig = config
-
-        self.client._clean_session = clean_session
-        self.client._username = config.username
-        self.client._password = config.password
-        self.client._host = config.host
-        self.client._port = config.port
-        self.client._keepalive = config.keepalive
-        self.client._ssl = config.ssl
-        self.client.optimistic_acknowledgement = optimistic_acknowledgement
-        self.client._connect_properties = kwargs
-        self.client.on_message = self.__on_message
-        self.client.on_connect = self.__on_connect
-        self.subscriptions: Dict[str, Tuple[Subscription, List[Callable]]] = {}
         self._logger = mqtt_logger or log_info
-        self.mqtt_handlers = MQTTHandlers(self.client, self._logger)
+        self.clients: List[MQTTClient] = [
+            self._create_client(
+                client_id if index == 0 else f"{client_id}-{index}",
+                clean_session,
+                optimistic_acknowledgement,
+                **kwargs,
+            )
+            for index in range(max(config.connections, 1))
+        ]
+        self.client: MQTTClient = self.clients[0]
+        self.acknowledgements: AcknowledgementTracker = self.client._persistent_storage
+        self._inflight_window = asyncio.Semaphore(config.publish_inflight_window)
+        self._round_robin = itertools.cycle(range(len(self.clients)))
+        if self._shared_group is None and len(self.clients) > 1:
+            self._shared_group = f"fastapi-mqtt-{client_id}"
+        self.subscriptions: Dict[str, Tuple[Subscription, List[Callable]]] = {}
+        self._topic_trie = TopicTrie()
+        self.topic_cache = TopicCache(config.topic_cache_size)
+        self._subscription_identifiers = itertools.count(1)
+        self._subscriptions_by_identifier: Dict[int, str] = {}
+        # topic filters subscribed by the main connection only, never shared
+        self._unshared_topics: Set[str] = set()
+        self.health = MQTTHealth(self.clients, self.subscriptions)
+        self.mqtt_handlers = MQTTHandlers(
+            self.client,
+            self._logger,
+            sync_handler_workers=config.sync_handler_workers,
+            clients=self.clients,
+        )
+        self.dispatcher: Optional[Dispatcher] = None
+        if config.dispatch_workers:
+            self.dispatcher = Dispatcher(
+                self._dispatch_message,
+                self._logger,
+                workers=config.dispatch_workers,
+                queue_size=config.dispatch_queue_size,
+                overflow=config.dispatch_overflow,
+                on_backpressure=self._pause_reading,
+            )
+        self.ordered_dispatcher: Optional[KeyedDispatcher] = None
+        self.pending_requests = PendingRequests()
+        self.response_topic = f"{config.response_topic_prefix}/{client_id}"
+        self._response_subscription: Optional[Subscription] = None
+        codec = config.payload_codec
+        self.payload_decoders = PayloadDecoders(
+            codec if isinstance(codec, JSONCodec) else get_codec(codec), self._logger
+        )
+        self.dedup: Optional[DedupWindow] = None
+        if config.dedup_window > 0:
+            self.dedup = DedupWindow(
+                config.dedup_window, config.dedup_max_entries, config.dedup_key
+            )
+        # local deliveries, delayed publishes and overflow handlers still running
+        self._background_tasks: Set["asyncio.Task[Any]"] = set()
+        # one spool per connection, so a connection down does not hold the others back
+        self.spools: List[PublishSpool] = []
+        if config.spool or config.background_connect:
+            self.spools = [
+                PublishSpool(
+                    self._logger,
+                    memory_size=config.spool_memory_size,
+                    path=_spool_path(config.spool_path, index),
+                    max_bytes=config.spool_max_bytes,
+                )
+                for index in range(len(self.clients))
+            ]
+        self.spool: Optional[PublishSpool] = self.spools[0] if self.spools else None
+        self._spool_drains: Dict[int, "asyncio.Task[None]"] = {}
+        # set while every connection is up and every subscription acknowledged
+        self.ready = asyncio.Event()
+        self._background_connect: Optional["asyncio.Task[None]"] = None
+        # between mqtt_startup() and mqtt_shutdown(), dispatchers created meanwhile are started
+        self._started = False
+        self.watchdog = HandlerWatchdog(self._logger, config.slow_handler_threshold)
+        self.rate_limiters: List[RateLimiter] = self._create_rate_limiters()
+        self.metrics: Optional[MQTTMetrics] = self._create_metrics() if config.metrics else None
+        self._batchers: List[MessageBatcher] = []
+        self.publish_queues: List[PublishQueue] = []
+        if config.publish_queue:
+            self.publish_queues = [
+                PublishQueue(
+                    client,
+                    self._logger,
+                    max_bytes=config.publish_queue_max_bytes,
+                    max_delay=config.publish_queue_max_delay,
+                )
+                for client in self.clients
+            ]
+        self.publish_queue: Optional[PublishQueue] = (
+            self.publish_queues[0] if self.publish_queues else None
+        )
+        self.last_values: LastValues = self._create_last_values()
 
         if (
             self.config.will_message_topic
@@ -89,63 +208,298 @@ class FastMQTT:
                 self.config.will_delay_interval,
             )
 
+    def _join_worker_group(self, config: MQTTConfig, client_id: Optional[str]) -> str:
+        """Every worker process joins the same group, returns its own client id."""
+        if config.spool_path:
+            # every process would map the same file and overwrite the records of the others
+            raise ValueError("spool_path cannot be shared by the worker_scaling processes")
+        if self._shared_group is None:
+            if not client_id:
+                # a library-wide group would mix the messages of unrelated apps
+                raise ValueError("worker_scaling needs a client_id or a shared_group")
+            self._shared_group = f"fastapi-mqtt-{client_id}"
+        return f"{client_id or uuid.uuid4().hex}-{os.getpid()}"
+
+    def _create_rate_limiters(self) -> List[RateLimiter]:
+        self._inbound_limiters: Dict[str, RateLimiter] = {
+            topic_filter: RateLimiter(topic_filter, limit, "inbound")
+            for topic_filter, limit in self.config.inbound_rate_limits.items()
+        }
+        self._outbound_limiters: Dict[str, RateLimiter] = {
+            topic_filter: RateLimiter(topic_filter, limit, "outbound")
+            for topic_filter, limit in self.config.outbound_rate_limits.items()
+        }
+        self._outbound_trie = TopicTrie()
+        for topic_filter in self._outbound_limiters:
+            self._outbound_trie.add(topic_filter)
+        self._publish_limiters: List[RateLimiter] = []
+        if self.config.publish_rate_limit is not None:
+            self._publish_limiters.append(
+                RateLimiter("*", self.config.publish_rate_limit, "outbound")
+            )
+        self._outbound_limited = bool(self._outbound_limiters or self._publish_limiters)
+        return [
+            *self._inbound_limiters.values(),
+            *self._outbound_limiters.values(),
+            *self._publish_limiters,
+        ]
+
+    def _create_last_values(self) -> LastValues:
+        last_values = LastValues()
+        for topic_filter, settings in self.config.last_values.items():
+            cache = LastValueCache(topic_filter, settings)
+            last_values.caches[topic_filter] = cache
+            # a shared subscription would only feed each connection or worker part of the topics
+            self._unshared_topics.add(topic_filter)
+            self.subscribe(topic_filter, qos=settings.qos)(cache.add)
+        return last_values
+
+    def _create_metrics(self) -> MQTTMetrics:
+        metrics = MQTTMetrics()
+        metrics.rate_limiters.extend(self.rate_limiters)
+        metrics.gauge(
+            "fastapi_mqtt_subscriptions",
+            "Subscribed topic filters.",
+            lambda: len(self.subscriptions),
+        )
+        metrics.gauge(
+            "fastapi_mqtt_pending_requests",
+            "Requests waiting for their response.",
+            lambda: len(self.pending_requests),
+        )
+        metrics.gauge(
+            "fastapi_mqtt_publish_inflight",
+            "Published messages waiting for their acknowledgement.",
+            lambda: sum(client._persistent_storage.inflight for client in self.clients),
+        )
+        if self.spools:
+            spools = self.spools
+            metrics.gauge(
+                "fastapi_mqtt_spool_messages", "Spooled messages.", lambda: sum(map(len, spools))
+            )
+            metrics.gauge(
+                "fastapi_mqtt_spool_disk_bytes",
+                "Size of the records in the spool files.",
+                lambda: sum(spool.disk.used_bytes for spool in spools if spool.disk is not None),
+            )
+            metrics.counter(
+                "fastapi_mqtt_spooled_total",
+                "Messages kept in the spool.",
+                lambda: sum(spool.spooled for spool in spools),
+            )
+            metrics.counter(
+                "fastapi_mqtt_spool_dropped_total",
+                "Messages dropped because the spool was full.",
+                lambda: sum(spool.dropped for spool in spools),
+            )
+        if self.config.last_values:
+            metrics.gauge(
+                "fastapi_mqtt_last_values",
+                "Topics in the last-value caches.",
+                lambda: len(self.last_values),
+            )
+        if self.dedup is not None:
+            dedup = self.dedup
+            metrics.counter(
+                "fastapi_mqtt_duplicates_suppressed_total",
+                "QoS 1 duplicates dropped before dispatch.",
+                lambda: dedup.suppressed,
+            )
+        metrics.counter(
+            "fastapi_mqtt_slow_handler_calls_total",
+            "Message handler calls running longer than the slow handler threshold.",
+            lambda: self.watchdog.slow_calls,
+        )
+        metrics.counter(
+            "fastapi_mqtt_handler_timeouts_total",
+            "Message handler calls cancelled by their timeout.",
+            lambda: self.watchdog.timeouts,
+        )
+        return metrics
+
+    def _create_client(
+        self,
+        client_id: str,
+        clean_session: bool,
+        optimistic_acknowledgement: bool,
+        **kwargs: Any,
+    ) -> MQTTClient:
+        client = MQTTClient(client_id, **kwargs)
+        client._clean_session = clean_session
+        client._username = self.config.username
+        client._password = self.config.password
+        client._host = self.config.host
+        client._port = self.config.port
+        client._keepalive = self.config.keepalive
+        client._ssl = self.config.ssl
+        client.optimistic_acknowledgement = optimistic_acknowledgement
+        client._persistent_storage = AcknowledgementTracker()
+        track_refused_acknowledgements(client)
+        client._connect_properties = kwargs
+        client.on_message = self.__on_message
+        client.on_connect = self.__on_connect
+        client.on_disconnect = self.__on_disconnect
+        client.on_subscribe = self.__on_subscribe
+        return client
+
     @staticmethod
     def match(topic: str, template: str) -> bool:
         """
         Defined match topics
 
+        Kept for compatibility, message dispatch uses the compiled `TopicTrie` instead.
+
         topic: topic name
         template: template topic name that contains wildcards
         """
-        if str(template).startswith("$share/"):
-            template = template.split("/", 2)[2]
-
-        topic_parts = topic.split("/")
-        template_parts = template.split("/")
+        return match_topic(topic, template)
 
-        for topic_part, part in zip_longest(topic_parts, template_parts):
-            if part == "#" and not str(topic_part).startswith("$"):
-                return True
-            elif (topic_part is None or part not in {"+", topic_part}) or (
-                part == "+" and topic_part.startswith("$")
-            ):
-                return False
-            continue
+    def _resolve_subscriptions(self, topic: str) -> Tuple[str, ...]:
+        """Return the subscribed topic filters matching a received topic name."""
+        topic_filters = self.topic_cache.get(topic)
+        if topic_filters is None:
+            topic_filters = tuple(self._topic_trie.match(topic))
+            self.topic_cache.put(topic, topic_filters)
+        return topic_filters
 
-        return len(template_parts) == len(topic_parts)
+    def _identified_subscriptions(self, properties: Any) -> Tuple[str, ...]:
+        """Return the subscribed topic filters referenced by MQTT5.0 subscription identifiers."""
+        if not self._subscriptions_by_identifier or not properties:
+            return ()
+        identifiers = properties.get("subscription_identifier") or ()
+        return tuple(
+            self._subscriptions_by_identifier[identifier]
+            for identifier in identifiers
+            if identifier in self._subscriptions_by_identifier
+        )
 
     async def connection(self) -> None:
-        if self.client._username:
-            self.client.set_auth_credentials(self.client._username, self.client._password)
+        await asyncio.gather(*(self.__connect_client(client) for client in self.clients))
+
+    async def _connect_in_background(self) -> None:
+        """
+        Connect every client, retrying the unreachable ones with the reconnect delays.
+
+        A connection refused by the broker in its CONNACK is left to the gmqtt reconnects.
+        """
+        reconnect_delay = self.config.reconnect_delay
+        if reconnect_delay is None:
+            reconnect_delay = DEFAULT_CONFIG["reconnect_delay"]
+        backoff = BackoffConfig(
+            {},
+            lambda: 0,
+            delay_max=self.config.reconnect_delay_max,
+            jitter=self.config.reconnect_jitter,
+        )
+        for attempt in itertools.count():
+            clients = [client for client in self.clients if client._connection is None]
+            results = await asyncio.gather(
+                *(self.__connect_client(client) for client in clients), return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            if not errors:
+                return
+            delay = backoff.reconnect_delay(reconnect_delay, attempt)
+            self._logger.warning(
+                "Connection to broker failed (%s), retrying in %.1f seconds", errors[0], delay
+            )
+            for client, result in zip(clients, results):  # noqa: B905
+                # gmqtt already reconnects after a CONNACK refusal, keep its connection
+                if not isinstance(result, MQTTConnectError) and not _is_connected(client):
+                    client._connection = None
+            await asyncio.sleep(delay)
+
+    async def readiness(self) -> None:
+        """
+        FastAPI dependency answering 503 Service Unavailable until the client is ready,
+        e.g. `@app.get("/items", dependencies=[Depends(fast_mqtt.readiness)])`.
+        """
+        if not self.ready.is_set():
+            raise HTTPException(status_code=503, detail="MQTT broker is not connected")
+
+    async def __connect_client(self, client: MQTTClient) -> None:
+        if client._username:
+            client.set_auth_credentials(client._username, client._password)
             self._logger.debug("user is authenticated")
 
-        await self.__set_connetion_config()
+        await self.__set_connetion_config(client)
 
         version = self.config.version or MQTTv50
         self._logger.info("Used broker version is %s", version)
 
-        await self.client.connect(
-            self.client._host,
-            self.client._port,
-            self.client._ssl,
-            self.client._keepalive,
+        await client.connect(
+            client._host,
+            client._port,
+            client._ssl,
+            client._keepalive,
             version,
         )
         self._logger.debug("Connected to broker")
 
-    async def __set_connetion_config(self) -> None:
+    async def __set_connetion_config(self, client: MQTTClient) -> None:
         """
         The connected MQTT clients will always try to reconnect in case of lost connections.
         The number of reconnect attempts is unlimited.
         For changing this behavior, set reconnect_retries and reconnect_delay with its values.
+        The delay doubles after every failed attempt up to reconnect_delay_max,
+        with reconnect_jitter spreading the reconnects of many instances.
         For more info: https://github.com/wialon/gmqtt#reconnects
         """
-        self.client.set_config(
+        client.set_config(
             {
                 "reconnect_retries": self.config.reconnect_retries,
                 "reconnect_delay": self.config.reconnect_delay,
             }
         )
+        state = client._connection_state
+        state.config = BackoffConfig(
+            state.config,
+            lambda: state.failed_connections,
+            delay_max=self.config.reconnect_delay_max,
+            jitter=self.config.reconnect_jitter,
+        )
+
+    def _broker_topic(self, topic: str) -> str:
+        """
+        Topic filter sent to the broker for an entry of `self.subscriptions`.
+
+        With a shared group, the topic filter is sent as a `$share/<group>/` shared
+        subscription, so the broker spreads messages across the connections.
+        """
+        if (
+            self._shared_group is None
+            or topic in self._unshared_topics
+            or topic.startswith(SHARED_SUBSCRIPTION_PREFIX)
+        ):
+            return topic
+        return f"{SHARED_SUBSCRIPTION_PREFIX}{self._shared_group}/{topic}"
+
+    def _broker_subscription(self, subscription: Subscription) -> Subscription:
+        """Subscription sent to the broker, a copy per connection when there are several."""
+        broker_topic = self._broker_topic(subscription.topic)
+        # messages published by the app are delivered locally, the broker must not echo them
+        no_local = subscription.no_local or (
+            self.config.local_delivery == "local_and_broker"
+            and not broker_topic.startswith(SHARED_SUBSCRIPTION_PREFIX)
+        )
+        if broker_topic is subscription.topic and no_local == subscription.no_local:
+            return subscription
+        return Subscription(
+            broker_topic,
+            subscription.qos,
+            no_local,
+            subscription.retain_as_published,
+            subscription.retain_handling_options,
+            subscription.subscription_identifier,
+        )
+
+    def _select_client(self, topic: Any) -> int:
+        """Index of the connection used to publish a message on the topic."""
+        if len(self.clients) == 1:
+            return 0
+        if self.config.publish_distribution == "round_robin":
+            return next(self._round_robin)
+        return hash(topic) % len(self.clients)
 
     def __on_connect(self, client: MQTTClient, flags: int, rc: int, properties: Any) -> None:
         """
@@ -153,12 +507,94 @@ class FastMQTT:
         Will perform subscription for given topics.
         It cannot be done earlier, since subscription relies on connection.
         """
+        self.health.connected(client._client_id)
+        if self.metrics is not None:
+            self.metrics.connected(client._client_id)
         if self.mqtt_handlers.user_connect_handler is not None:
             self.mqtt_handlers.user_connect_handler(client, flags, rc, properties)
 
-        for topic in self.subscriptions:
-            self._logger.debug("Subscribing for %s", topic)
-            self.client.subscribe(self.subscriptions[topic][0])
+        self._subscribe_all(client)
+        if self.dispatcher is not None and self.dispatcher.paused:
+            # a new connection starts reading, the queue is still full
+            self._pause_client_reading(client, True)
+
+        self._set_ready()
+
+        index = self.clients.index(client)
+        if self.spools and self.spools[index]:
+            drain = self._spool_drains.get(index)
+            if drain is None or drain.done():
+                self._logger.info("Sending %d spooled messages", len(self.spools[index]))
+                self._spool_drains[index] = asyncio.get_running_loop().create_task(
+                    self._drain_spool(index)
+                )
+
+    def __on_disconnect(self, client: MQTTClient, packet: Any, exc: Any = None) -> None:
+        """Generic on disconnecting handler, it would call user handler if defined."""
+        self.ready.clear()
+        self.health.disconnected(client._client_id)
+        if self.mqtt_handlers.user_disconnect_handler is not None:
+            self.mqtt_handlers.user_disconnect_handler(client, packet, exc)
+
+    def __on_subscribe(self, client: MQTTClient, mid: int, qos: Any, properties: Any) -> None:
+        """Generic on subscribing handler, it would call user handler if defined."""
+        self.health.subscribed(client._client_id, mid, qos)
+        self._set_ready()
+        if self.mqtt_handlers.user_subscribe_handler is not None:
+            self.mqtt_handlers.user_subscribe_handler(client, mid, qos, properties)
+
+    def _set_ready(self) -> None:
+        """Set `ready` once every connection is up and the broker accepted every subscription."""
+        if self.health.subscribed_all and all(_is_connected(client) for client in self.clients):
+            self.ready.set()
+
+    def _send_subscriptions(
+        self, client: MQTTClient, subscriptions: List[Subscription], **kwargs: Any
+    ) -> None:
+        """Send a SUBSCRIBE packet, its SUBACK is awaited by the health state."""
+        mid = client.subscribe(subscriptions, **kwargs)
+        self.health.subscribing(
+            client._client_id, mid, [subscription.topic for subscription in subscriptions]
+        )
+
+    def _pause_reading(self, paused: bool) -> None:
+        """Pause or resume reading from every connection, while the dispatch queue is full."""
+        for client in self.clients:
+            self._pause_client_reading(client, paused)
+
+    def _pause_client_reading(self, client: MQTTClient, paused: bool) -> None:
+        transport = client._connection._transport if client._connection is not None else None
+        if transport is None or transport.is_closing():
+            return
+        if paused:
+            transport.pause_reading()
+        else:
+            transport.resume_reading()
+
+    def _subscribe_all(self, client: MQTTClient) -> None:
+        """Send every subscription with as few SUBSCRIBE packets as the broker accepts."""
+        subscriptions = [
+            self._broker_subscription(subscription)
+            for topic, (subscription, _) in self.subscriptions.items()
+            if client is self.client or topic not in self._unshared_topics
+        ]
+        # responses are received by the main connection only, never shared
+        if self._response_subscription is not None and client is self.client:
+            subscriptions.append(self._response_subscription)
+        if not subscriptions:
+            return
+        # replace the subscriptions sent on a previous connection
+        topics = {subscription.topic for subscription in subscriptions}
+        client.subscriptions = [s for s in client.subscriptions if s.topic not in topics]
+
+        batches = batch_subscriptions(
+            subscriptions, maximum_packet_size(client), self.config.subscribe_max_filters
+        )
+        self._logger.debug(
+            "Subscribing for %d topics with %d packets", len(subscriptions), len(batches)
+        )
+        for identifier, batch in batches:
+            self._send_subscriptions(client, batch, subscription_identifier=identifier)
 
     async def __on_message(
         self, client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
@@ -167,6 +603,47 @@ class FastMQTT:
         Generic on message handler, it will call user handler if defined.
         This will invoke per topic handlers that are subscribed for
         """
+        self.health.message_received()
+        if self.metrics is not None:
+            self.metrics.messages_received += 1
+        if topic == self.response_topic:
+            self._resolve_response(topic, payload, qos, properties)
+            return None
+        if (
+            qos == 1
+            and self.dedup is not None
+            and self.dedup.is_duplicate(topic, payload, properties)
+        ):
+            self._logger.debug("Dropping duplicate message on %s", topic)
+            return None
+        if self.dispatcher is not None:
+            return await self.dispatcher.submit(client, topic, payload, qos, properties)
+        return await self._dispatch_message(client, topic, payload, qos, properties)
+
+    def _resolve_response(self, topic: str, payload: bytes, qos: int, properties: Any) -> None:
+        correlation_data = properties.get("correlation_data") if properties else None
+        response = MQTTMessage(topic, payload, qos, properties)
+        if not correlation_data or not self.pending_requests.resolve(correlation_data[0], response):
+            self._logger.debug("Dropping response without pending request on %s", topic)
+
+    async def _dispatch_message(
+        self,
+        client: MQTTClient,
+        topic: str,
+        payload: bytes,
+        qos: int,
+        properties: Any,
+        topic_templates: Optional[Tuple[str, ...]] = None,
+    ) -> Any:
+        """
+        Call the user message handler and the handlers of every matching subscription.
+
+        Returns the results of the handlers, with the exception raised in place of the
+        result of a failed one.
+
+        topic_templates: Subscriptions to call instead of the matching ones,
+            for local deliveries.
+        """
         gather = []
         if self.mqtt_handlers.user_message_handler is not None:
             self._logger.debug("Calling user_message_handler")
@@ -174,13 +651,148 @@ class FastMQTT:
                 self.mqtt_handlers.user_message_handler(client, topic, payload, qos, properties)
             )
 
-        for topic_template in self.subscriptions:
-            if self.match(topic, topic_template):
-                self._logger.debug("Calling specific handler for topic %s", topic)
-                for handler in self.subscriptions[topic_template][1]:
-                    gather.append(handler(client, topic, payload, qos, properties))
+        if topic_templates is None:
+            topic_templates = self._identified_subscriptions(properties)
+            if not topic_templates:
+                topic_templates = self._resolve_subscriptions(topic)
+        for topic_template in topic_templates:
+            self._logger.debug("Calling specific handler for topic %s", topic)
+            if self.metrics is not None:
+                self.metrics.message_matched(topic_template)
+            gather.extend(
+                self._handler_calls(topic_template, (client, topic, payload, qos, properties))
+            )
+        # handlers decode when called, the next message is decoded anew
+        self.payload_decoders.forget()
+
+        return await self._gather_handlers(topic, gather)
+
+    async def _gather_handlers(self, topic: str, calls: List[Awaitable[Any]]) -> List[Any]:
+        """Await handler calls concurrently, logging the failed ones without cancelling others."""
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self._logger.error("Error in message handler on %s", topic, exc_info=result)
+        return results
+
+    def _handler_calls(self, topic_template: str, args: Tuple[Any, ...]) -> List[Awaitable[Any]]:
+        """Call the handlers of a subscription, within its inbound rate limit."""
+        handlers = self.subscriptions[topic_template][1]
+        limiter = self._inbound_limiters.get(topic_template)
+        if limiter is None:
+            return [handler(*args) for handler in handlers]
+        wait = limiter.acquire()
+        if wait == 0:
+            return [handler(*args) for handler in handlers]
+        if wait is None:
+            self._logger.debug("Rate limit of %s exceeded, shedding message", topic_template)
+            overflow_handler = limiter.limit.overflow_handler
+            if overflow_handler is None:
+                return []
+            return [self.mqtt_handlers.as_async(overflow_handler)(*args)]
+        # rescheduled, so the wait does not hold a dispatcher worker
+        self._run_in_background(
+            self._call_later(wait, handlers, args), "calling rate limited message handlers"
+        )
+        return []
+
+    async def _call_later(
+        self, delay: float, handlers: List[Callable[..., Awaitable[Any]]], args: Tuple[Any, ...]
+    ) -> Any:
+        await asyncio.sleep(delay)
+        calls = [handler(*args) for handler in handlers]
+        self.payload_decoders.forget()
+        return await self._gather_handlers(args[1], calls)
+
+    def _local_subscriptions(self, topic: str) -> Tuple[str, ...]:
+        """Subscriptions receiving the messages published by the app on a topic in-process."""
+        return tuple(
+            topic_template
+            for topic_template in self._resolve_subscriptions(topic)
+            if not self.subscriptions[topic_template][0].no_local
+            and (
+                self.config.local_delivery == "local_only"
+                or not self._broker_topic(topic_template).startswith(SHARED_SUBSCRIPTION_PREFIX)
+            )
+        )
+
+    def _deliver_locally(self, message: Message) -> bool:
+        """
+        Dispatch a published message to the local subscriptions it matches, as if received.
+
+        Returns if the message must not be sent to the broker.
+        """
+        if self.config.local_delivery is None:
+            return False
+        topic = message.topic.decode() if isinstance(message.topic, bytes) else message.topic
+        topic_templates = self._local_subscriptions(topic)
+        if not topic_templates:
+            return False
+
+        # received properties are lists, except the dup and retain flags
+        properties: Dict[str, Any] = {
+            name: value if isinstance(value, list) else [value]
+            for name, value in message.properties.items()
+        }
+        properties.update(dup=0, retain=int(message.retain))
+        args = (self.client, topic, message.payload, message.qos, properties, topic_templates)
+        if self.dispatcher is not None:
+            delivery = self.dispatcher.submit(*args)
+        else:
+            delivery = self._dispatch_message(*args)
+        self._run_in_background(delivery, "delivering message locally")
+        return self.config.local_delivery == "local_only"
+
+    def _run_in_background(self, coroutine: Awaitable[Any], description: str) -> None:
+        """Run a coroutine in a task awaited on shutdown, logging its exception."""
+        task = asyncio.ensure_future(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(functools.partial(self._background_task_done, description))
+
+    def _background_task_done(self, description: str, task: "asyncio.Task[Any]") -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._logger.error("Error while %s", description, exc_info=task.exception())
+
+    def _outbound_wait(self, message: Message) -> Optional[float]:
+        """
+        Apply the outbound rate limits to a message.
+
+        Returns the number of seconds to hold it, 0 to publish it now, or None when it was
+        shed, after passing it to the overflow handler of the limiter.
+        """
+        limiters = self._publish_limiters
+        if self._outbound_limiters:
+            topic = message.topic.decode() if isinstance(message.topic, bytes) else message.topic
+            limiters = [
+                self._outbound_limiters[topic_filter]
+                for topic_filter in self._outbound_trie.match(topic)
+            ] + limiters
+        wait = 0.0
+        acquired_by: List[Tuple[RateLimiter, float]] = []
+        for limiter in limiters:
+            acquired = limiter.acquire()
+            if acquired is None:
+                # the message is not sent, the earlier limiters get their token back
+                for taken_by, taken in acquired_by:
+                    taken_by.refund(taken)
+                self._shed(limiter, message)
+                return None
+            acquired_by.append((limiter, acquired))
+            wait = max(wait, acquired)
+        return wait
 
-        return await asyncio.gather(*gather)
+    def _shed(self, limiter: RateLimiter, message: Message) -> None:
+        self._logger.debug("Rate limit of %s exceeded, shedding message", limiter.name)
+        if limiter.limit.overflow_handler is None:
+            return
+        result = limiter.limit.overflow_handler(message)
+        if inspect.isawaitable(result):
+            self._run_in_background(result, "handling a rate limited message")
+
+    async def _publish_later(self, delay: float, message: Message) -> None:
+        await asyncio.sleep(delay)
+        self._publish(message)
 
     def publish(
         self,
@@ -200,10 +812,238 @@ class FastMQTT:
         qos: Quality of Assurance
 
         retain:
+
+        With `local_delivery`, the message is also dispatched right away to the local
+        subscriptions it matches.
+        Messages above an outbound rate limit are dropped, passed to the overflow handler,
+        or published later by a background task.
         """
-        return self.client.publish(
-            message_or_topic, payload=payload, qos=qos, retain=retain, **kwargs
-        )
+        if isinstance(message_or_topic, Message):
+            message = message_or_topic
+        else:
+            message = Message(message_or_topic, payload, qos=qos, retain=retain, **kwargs)
+
+        if not self._outbound_limited:
+            return self._publish(message)
+        wait = self._outbound_wait(message)
+        if wait:
+            self._run_in_background(self._publish_later(wait, message), "publishing message")
+        elif wait is not None:
+            return self._publish(message)
+        return None
+
+    def _publish(self, message: Message) -> Any:
+        """Deliver a message locally, then send or spool it."""
+        if self._deliver_locally(message):
+            return None
+        index = self._select_client(message.topic)
+        if self._spooled(message, index):
+            return None
+        return self._send(message, index)
+
+    def _send(self, message: Message, index: int) -> Any:
+        """Publish a message on the connection at index."""
+        if self.metrics is not None:
+            self.metrics.messages_published += 1
+        if self.publish_queues:
+            self.publish_queues[index].put(message)
+            return None
+        return self.clients[index].publish(message)
+
+    def _spooled(self, message: Message, index: int) -> bool:
+        """
+        Keep the message in the spool of its connection when it is down.
+        Returns if it was kept.
+
+        While the spool is not empty, new messages are queued behind the spooled ones.
+        """
+        if not self.spools:
+            return False
+        spool = self.spools[index]
+        if not spool and _is_connected(self.clients[index]):
+            return False
+        spool.put(message)
+        return True
+
+    async def _drain_spool(self, index: int) -> None:
+        """Send the spooled messages of a connection, at most `spool_drain_rate` per second."""
+        spool = self.spools[index]
+        client = self.clients[index]
+        rate = self.config.spool_drain_rate
+        # messages sent between two pauses, 10 pauses per second when rate limited
+        burst = max(int(rate / 10), 1) if rate > 0 else 100
+        sent = 0
+        while spool:
+            message = spool.peek()
+            if message is None:
+                break
+            if not _is_connected(client):
+                self._logger.info("Connection lost, %d messages left in spool", len(spool))
+                return
+            self._send(message, index)
+            spool.pop()
+            sent += 1
+            if sent % burst == 0:
+                await asyncio.sleep(burst / rate if rate > 0 else 0)
+        self._logger.debug("Publish spool drained, %d messages sent", sent)
+
+    def publish_many(self, messages: Iterable[Message]) -> None:
+        """
+        Defined to publish several messages with a single socket write
+
+        messages: gmqtt `Message(topic, payload, qos=0, retain=False, **properties)` objects
+        """
+        messages_by_client: Dict[int, List[Message]] = {}
+        for message in messages:
+            wait = self._outbound_wait(message) if self._outbound_limited else 0
+            if wait:
+                self._run_in_background(self._publish_later(wait, message), "publishing message")
+            if wait != 0 or self._deliver_locally(message):
+                continue
+            index = self._select_client(message.topic)
+            if not self._spooled(message, index):
+                messages_by_client.setdefault(index, []).append(message)
+        if self.metrics is not None:
+            self.metrics.messages_published += sum(map(len, messages_by_client.values()))
+
+        for index, client_messages in messages_by_client.items():
+            if self.publish_queues:
+                self.publish_queues[index].put_many(client_messages)
+            else:
+                client = self.clients[index]
+                write_packets(client, [build_publish_packet(client, m)[1] for m in client_messages])
+
+    async def publish_async(
+        self,
+        message_or_topic: Any,
+        payload: Any = None,
+        qos: int = 1,
+        retain: bool = False,
+        timeout: Optional[float] = None,  # noqa: ASYNC109
+        **kwargs,
+    ) -> None:
+        """
+        Defined to publish payload MQTT server and wait for its acknowledgement
+
+        Returns once the broker acknowledged the message (PUBACK for QoS 1, PUBCOMP for
+        QoS 2), QoS 0 messages return as soon as they are sent.
+        At most `publish_inflight_window` messages wait for their acknowledgement,
+        further calls wait for a free slot.
+
+        timeout: Maximum number of seconds to wait for a free slot and the acknowledgement,
+            raising `asyncio.TimeoutError`. The message stays in flight and is still resent
+            after reconnects.
+
+        Raises `ConnectionError` when the connection is down, unless the message is kept
+        in the publish spool, which returns without waiting for its acknowledgement.
+        Raises `PublishRefusedError` when the broker refuses the message.
+        A message delayed by an outbound rate limit is awaited before being sent,
+        a shed one returns right away.
+        """
+        if isinstance(message_or_topic, Message):
+            message = message_or_topic
+        else:
+            message = Message(message_or_topic, payload, qos=qos, retain=retain, **kwargs)
+
+        if message.qos == 0:
+            self.publish(message)
+            return
+        wait = self._outbound_wait(message) if self._outbound_limited else 0
+        if wait is None:
+            return
+        if wait:
+            await asyncio.sleep(wait)
+        if self._deliver_locally(message):
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        await asyncio.wait_for(self._inflight_window.acquire(), timeout)
+        try:
+            sent = self._send_acknowledged(message)
+        except BaseException:
+            self._inflight_window.release()
+            raise
+        if sent is None:
+            self._inflight_window.release()
+            return
+
+        client, mid = sent
+        acknowledgement = client._persistent_storage.wait(mid)
+        acknowledgement.add_done_callback(self._release_inflight_slot)
+        remaining = None if deadline is None else max(deadline - loop.time(), 0)
+        await asyncio.wait_for(asyncio.shield(acknowledgement), remaining)
+
+    def _send_acknowledged(self, message: Message) -> Optional[Tuple[MQTTClient, Any]]:
+        """
+        Send a QoS 1/2 message, returns its connection and packet identifier,
+        or None when it was kept in the publish spool.
+        """
+        index = self._select_client(message.topic)
+        if self._spooled(message, index):
+            return None
+        client = self.clients[index]
+        if not _is_connected(client):
+            raise ConnectionError("MQTT client is not connected")
+        if self.publish_queues:
+            mid = self.publish_queues[index].put(message)
+        else:
+            mid, packet = build_publish_packet(client, message)
+            write_packets(client, [packet])
+        if self.metrics is not None:
+            self.metrics.messages_published += 1
+        return client, mid
+
+    def _release_inflight_slot(self, acknowledgement: "asyncio.Future[None]") -> None:
+        self._inflight_window.release()
+        if not acknowledgement.cancelled():
+            # mark a lost session as retrieved when the caller already timed out
+            acknowledgement.exception()
+
+    async def request(
+        self,
+        topic: str,
+        payload: Any = None,
+        qos: int = 1,
+        timeout: Optional[float] = None,  # noqa: ASYNC109
+        **kwargs,
+    ) -> MQTTMessage:
+        """
+        Publish a request and wait for its response (MQTT5.0)
+
+        The message is published with the `response_topic` and `correlation_data`
+        properties, the responder publishes its response to that topic with the same
+        correlation data. Responses to every request arrive on a single subscription,
+        made on the first call.
+
+        timeout: Maximum number of seconds to wait, raising `asyncio.TimeoutError`.
+            Defaults to `request_timeout`.
+
+        Returns the response as an `MQTTMessage`.
+        """
+        self._subscribe_responses()
+        correlation_data, response = self.pending_requests.create()
+        try:
+            self.publish(
+                topic,
+                payload,
+                qos=qos,
+                response_topic=self.response_topic,
+                correlation_data=correlation_data,
+                **kwargs,
+            )
+            return await asyncio.wait_for(
+                response, self.config.request_timeout if timeout is None else timeout
+            )
+        finally:
+            self.pending_requests.discard(correlation_data)
+
+    def _subscribe_responses(self) -> None:
+        if self._response_subscription is not None:
+            return
+        self._response_subscription = Subscription(self.response_topic, qos=1)
+        if _is_connected(self.client):
+            self._send_subscriptions(self.client, [self._response_subscription])
 
     def unsubscribe(self, topic: str, **kwargs):
         """
@@ -212,18 +1052,96 @@ class FastMQTT:
         topic: topic name
         """
         self._logger.debug("unsubscribe")
+        self._forget_subscription(topic)
+
+        broker_topic = self._broker_topic(topic)
+        self.health.unsubscribed(broker_topic)
+        if topic not in self._unshared_topics:
+            for client in self.clients[1:]:
+                client.unsubscribe(broker_topic, **kwargs)
+        self._unshared_topics.discard(topic)
+        return self.client.unsubscribe(broker_topic, **kwargs)
+
+    def _forget_subscription(self, topic: str) -> None:
         if topic in self.subscriptions:
-            del self.subscriptions[topic]
+            subscription, _ = self.subscriptions.pop(topic)
+            if self.config.auto_subscription_identifiers:
+                self._subscriptions_by_identifier.pop(subscription.subscription_identifier, None)
+            self._topic_trie.remove(topic)
+            self.topic_cache.clear()
 
-        return self.client.unsubscribe(topic, **kwargs)
+    def add_subscription(
+        self, topic: str, handler: Callable, qos: int = 0, shared: bool = True
+    ) -> None:
+        """
+        Add a message handler for a topic filter at runtime, e.g. for a WebSocket client
+
+        Unlike `subscribe()`, the subscription is sent to the broker right away when
+        connected. Remove it with `remove_subscription()`.
+
+        shared: With False, the topic filter is subscribed by the main connection only and
+            never as a shared subscription, so every message reaches this process.
+        """
+        if not shared:
+            self._unshared_topics.add(topic)
+        self._add_handler(topic, self.mqtt_handlers.as_async(handler), qos)
+        subscription = self._broker_subscription(self.subscriptions[topic][0])
+        for client in self.clients if shared else [self.client]:
+            if _is_connected(client):
+                self._send_subscriptions(client, [subscription])
+
+    def remove_subscription(self, topic: str, handler: Callable) -> None:
+        """Remove a handler added by `add_subscription()`, unsubscribing the last one."""
+        if topic not in self.subscriptions:
+            return
+        handlers = self.subscriptions[topic][1]
+        handlers[:] = [
+            message_handler
+            for message_handler in handlers
+            if handler not in (message_handler, getattr(message_handler, "__wrapped__", None))
+        ]
+        if handlers:
+            return
+        if _is_connected(self.client):
+            self.unsubscribe(topic)
+        else:
+            self._forget_subscription(topic)
+            self._unshared_topics.discard(topic)
 
     async def mqtt_startup(self) -> None:
         """Initial connection for MQTT client, for lifespan startup."""
+        self._started = True
+        if self.dispatcher is not None:
+            self.dispatcher.start()
+        if self.ordered_dispatcher is not None:
+            self.ordered_dispatcher.start()
+        if self.config.background_connect:
+            self._background_connect = asyncio.ensure_future(self._connect_in_background())
+            return
         await self.connection()
 
     async def mqtt_shutdown(self) -> None:
         """Final disconnection for MQTT client, for lifespan shutdown."""
-        await self.client.disconnect()
+        self._started = False
+        self.pending_requests.fail(ConnectionError("MQTT client is shutting down"))
+        if self._background_connect is not None:
+            self._background_connect.cancel()
+        for drain in self._spool_drains.values():
+            drain.cancel()
+        # delayed publishes and local deliveries may publish more messages
+        while self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        for publish_queue in self.publish_queues:
+            publish_queue.flush()
+        await asyncio.gather(*(client.disconnect() for client in self.clients))
+        for spool in self.spools:
+            spool.close()
+        if self.dispatcher is not None:
+            await self.dispatcher.stop()
+        if self.ordered_dispatcher is not None:
+            await self.ordered_dispatcher.stop()
+        await asyncio.gather(*(batcher.close() for batcher in self._batchers))
+        self.mqtt_handlers.shutdown()
 
     def init_app(self, app: FastAPI) -> None:  # pragma: no cover
         """Add startup and shutdown event handlers for app without lifespan."""
@@ -244,43 +1162,160 @@ class FastMQTT:
         retain_as_published: bool = False,
         retain_handling_options: int = 0,
         subscription_identifier: Any = None,
+        ordering_key: Optional[OrderingKey] = None,
+        timeout: Optional[float] = None,
     ) -> Callable[..., Any]:
         """
         Decorator method used to subscribe for specific topics.
+        Synchronous (plain `def`) handlers are run in a thread pool.
+
+        The payload is passed as bytes, unless the handler annotates it with another type:
+        `str`, `dict`, `list` or any type pydantic validates from JSON, like a model.
+        It is decoded once per message and shared by the handlers declaring the same type.
+
+        ordering_key: Optional function returning a key from the topic name of a message,
+            e.g. `topic_level(1)`. Messages with the same key are handled one after another
+            in the order they were received, different keys are handled concurrently.
+        timeout: Number of seconds after which the handler is cancelled, raising
+            `HandlerTimeoutError`. Defaults to `handler_timeout`.
         """
 
         def subscribe_handler(handler: Callable) -> Callable:
             self._logger.debug("Subscribe for topics: %s", topics)
+            async_handler = self.mqtt_handlers.as_async(handler)
+            name = _handler_name(handler)
+            ordered_dispatcher = self.ordered_dispatcher
+            if ordering_key is not None and ordered_dispatcher is None:
+                ordered_dispatcher = self.ordered_dispatcher = KeyedDispatcher(
+                    self._logger, lanes=self.config.ordered_lanes
+                )
+                if self._started:
+                    ordered_dispatcher.start()
             for topic in topics:
-                if topic not in self.subscriptions:
-                    subscription = Subscription(
-                        topic,
-                        qos,
-                        no_local,
-                        retain_as_published,
-                        retain_handling_options,
-                        subscription_identifier,
-                    )
-                    self.subscriptions[topic] = (subscription, [handler])
-                else:
-                    # Use the most restrictive field of the same subscription
-                    old_subscription = self.subscriptions[topic][0]
-                    new_subscription = Subscription(
-                        topic,
-                        max(qos, old_subscription.qos),
-                        no_local or old_subscription.no_local,
-                        retain_as_published or old_subscription.retain_as_published,
-                        max(
-                            retain_handling_options,
-                            old_subscription.retain_handling_options,
-                        ),
-                        old_subscription.subscription_identifier or subscription_identifier,
-                    )
-                    self.subscriptions[topic] = (
-                        new_subscription,
-                        self.subscriptions[topic][1],
-                    )
-                    self.subscriptions[topic][1].append(handler)
+                message_handler = self.watchdog.guard(
+                    async_handler, topic, name, self._handler_timeout(timeout)
+                )
+                if self.metrics is not None:
+                    message_handler = self.metrics.instrument(message_handler, topic, name)
+                if ordering_key is not None and ordered_dispatcher is not None:
+                    message_handler = ordered_dispatcher.wrap(message_handler, ordering_key)
+                message_handler = self.payload_decoders.wrap(handler, message_handler)
+                self._add_handler(
+                    topic,
+                    message_handler,
+                    qos,
+                    no_local,
+                    retain_as_published,
+                    retain_handling_options,
+                    subscription_identifier,
+                )
+            return handler
+
+        return subscribe_handler
+
+    def _add_handler(
+        self,
+        topic: str,
+        message_handler: Callable,
+        qos: int = 0,
+        no_local: bool = False,
+        retain_as_published: bool = False,
+        retain_handling_options: int = 0,
+        subscription_identifier: Any = None,
+    ) -> None:
+        if topic not in self.subscriptions:
+            identifier = subscription_identifier
+            if self.config.auto_subscription_identifiers:
+                identifier = next(self._subscription_identifiers)
+                self._subscriptions_by_identifier[identifier] = topic
+            subscription = Subscription(
+                topic,
+                qos,
+                no_local,
+                retain_as_published,
+                retain_handling_options,
+                identifier,
+            )
+            self.subscriptions[topic] = (subscription, [message_handler])
+            self._topic_trie.add(topic)
+            self.topic_cache.clear()
+        else:
+            # Use the most restrictive field of the same subscription
+            old_subscription = self.subscriptions[topic][0]
+            new_subscription = Subscription(
+                topic,
+                max(qos, old_subscription.qos),
+                no_local or old_subscription.no_local,
+                retain_as_published or old_subscription.retain_as_published,
+                max(
+                    retain_handling_options,
+                    old_subscription.retain_handling_options,
+                ),
+                old_subscription.subscription_identifier or subscription_identifier,
+            )
+            self.subscriptions[topic] = (
+                new_subscription,
+                self.subscriptions[topic][1],
+            )
+            self.subscriptions[topic][1].append(message_handler)
+
+    def subscribe_batch(
+        self,
+        *topics,
+        max_size: int = 100,
+        max_latency: float = 1.0,
+        max_flushes: int = 1,
+        qos: int = 0,
+        no_local: bool = False,
+        retain_as_published: bool = False,
+        retain_handling_options: int = 0,
+        subscription_identifier: Any = None,
+        timeout: Optional[float] = None,
+    ) -> Callable[..., Any]:
+        """
+        Decorator method used to subscribe for specific topics, handling messages in batches.
+
+        The handler is called with the client and a list of `MQTTMessage`
+        once `max_size` messages were received or the oldest one waited `max_latency`
+        seconds. Remaining messages are handled on `mqtt_shutdown()`.
+
+        max_flushes: Maximum number of batches handled concurrently, the message filling
+            a batch waits for a free one.
+        timeout: Number of seconds after which the handler of a batch is cancelled, its
+            messages are dropped. Defaults to `handler_timeout`.
+        """
+
+        def subscribe_handler(handler: Callable) -> Callable:
+            self._logger.debug("Subscribe for topics in batches: %s", topics)
+            name = _handler_name(handler)
+            batcher = MessageBatcher(
+                self.watchdog.guard(
+                    self.mqtt_handlers.as_async(handler),
+                    ", ".join(topics),
+                    name,
+                    self._handler_timeout(timeout),
+                    batch=True,
+                ),
+                self._logger,
+                max_size=max_size,
+                max_latency=max_latency,
+                max_flushes=max_flushes,
+            )
+            self._batchers.append(batcher)
+            for topic in topics:
+                # the timeout applies to the batch handler, not to adding a message
+                message_handler: Callable[..., Awaitable[Any]] = batcher.add
+                if self.metrics is not None:
+                    message_handler = self.metrics.instrument(message_handler, topic, name)
+                self._add_handler(
+                    topic,
+                    message_handler,
+                    qos,
+                    no_local,
+                    retain_as_published,
+                    retain_handling_options,
+                    subscription_identifier,
+                )
             return handler
 
         return subscribe_handler
@@ -296,17 +1331,30 @@ class FastMQTT:
 
         return connect_handler
 
-    def on_message(self) -> Callable[..., Any]:
+    def on_message(self, timeout: Optional[float] = None) -> Callable[..., Any]:
         """
         The decorator method is used to subscribe to messages from all topics.
+        Synchronous (plain `def`) handlers are run in a thread pool.
+
+        timeout: Number of seconds after which the handler is cancelled, raising
+            `HandlerTimeoutError`. Defaults to `handler_timeout`.
         """
 
         def message_handler(handler: Callable) -> Callable:
             self._logger.debug("on_message handler accepted")
-            return self.mqtt_handlers.on_message(handler)
+            self.mqtt_handlers.user_message_handler = self.watchdog.guard(
+                self.mqtt_handlers.as_async(handler),
+                "#",
+                _handler_name(handler),
+                self._handler_timeout(timeout),
+            )
+            return handler
 
         return message_handler
 
+    def _handler_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        return self.config.handler_timeout if timeout is None else timeout
+
     def on_disconnect(self) -> Callable[..., Any]:
         """
         The Decorator method used wrap disconnect callback.
@@ -1,37 +1,115 @@
+import asyncio
+import functools
+import inspect
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from logging import Logger
-from typing import Any, Awaitable, Callable, Optional
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Tuple
 
 from gmqtt import Client as MQTTClient
 
 # client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
 MQTTMessageHandler = Callable[[MQTTClient, str, bytes, int, Any], Awaitable[Any]]
+
+
+class MQTTMessage(NamedTuple):
+    """Received message, as passed to batch handlers."""
+
+    topic: str
+    payload: bytes
+    qos: int
+    properties: Any
+
+
+# client: MQTTClient, messages: List[MQTTMessage]
+MQTTBatchHandler = Callable[[MQTTClient, List[MQTTMessage]], Awaitable[Any]]
 # client: MQTTClient, flags: int, rc: int, properties: Any
 MQTTConnectionHandler = Callable[[MQTTClient, int, int, Any], Any]
+# client: MQTTClient, packet: Any
+MQTTDisconnectionHandler = Callable[..., Any]
+# client: MQTTClient, mid: int, qos: Tuple[int, ...], properties: Any
+MQTTSubscriptionHandler = Callable[[MQTTClient, int, Tuple[int, ...], Any], Any]
+
+
+def _is_async_callable(handler: Callable[..., Any]) -> bool:
+    """Tell if calling the handler returns a coroutine, including partials and objects."""
+    while isinstance(handler, functools.partial):
+        handler = handler.func
+    return inspect.iscoroutinefunction(handler) or inspect.iscoroutinefunction(
+        type(handler).__call__
+    )
 
 
 class MQTTHandlers:
-    def __init__(self, client: MQTTClient, logger: Logger):
+    def __init__(
+        self,
+        client: MQTTClient,
+        logger: Logger,
+        sync_handler_workers: int = 4,
+        clients: Optional[List[MQTTClient]] = None,
+    ):
         self._logger = logger
         self.client = client
+        # every connection of the FastMQTT client, callbacks are set on all of them
+        self.clients = clients or [client]
         self.user_message_handler: Optional[MQTTMessageHandler] = None
         self.user_connect_handler: Optional[MQTTConnectionHandler] = None
+        self.user_disconnect_handler: Optional[MQTTDisconnectionHandler] = None
+        self.user_subscribe_handler: Optional[MQTTSubscriptionHandler] = None
+        self.sync_handler_workers = sync_handler_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool running synchronous message handlers, created on first use."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.sync_handler_workers, thread_name_prefix="fastapi-mqtt"
+            )
+        return self._executor
+
+    def as_async(self, handler: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+        """
+        Return the message handler as a coroutine function.
+
+        Plain `def` handlers are run in the thread pool, so blocking calls inside them
+        do not stall the event loop. An awaitable they return, e.g. from a decorator
+        wrapping an async handler, is awaited on the event loop.
+        """
+        if _is_async_callable(handler):
+            return handler
+
+        @functools.wraps(handler)
+        async def _threaded_handler(*args: Any) -> Any:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, functools.partial(handler, *args))
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        return _threaded_handler
+
+    def shutdown(self) -> None:
+        """Release the thread pool of synchronous handlers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     def on_message(self, handler: MQTTMessageHandler) -> MQTTMessageHandler:
         self._logger.info("on_message handler accepted")
-        self.user_message_handler = handler
+        self.user_message_handler = self.as_async(handler)
         return handler
 
-    def on_subscribe(self, handler: Callable) -> Callable[..., Any]:
+    def on_subscribe(self, handler: MQTTSubscriptionHandler) -> MQTTSubscriptionHandler:
         """
         Decorator method is used to obtain subscribed topics and properties.
         """
         self._logger.info("on_subscribe handler accepted")
-        self.client.on_subscribe = handler
+        self.user_subscribe_handler = handler
         return handler
 
-    def on_disconnect(self, handler: Callable) -> Callable[..., Any]:
-        self.client.on_disconnect = handler
+    def on_disconnect(self, handler: MQTTDisconnectionHandler) -> MQTTDisconnectionHandler:
+        self.user_disconnect_handler = handler
         return handler
 
     def on_connect(self, handler: MQTTConnectionHandler) -> MQTTConnectionHandler:
@@ -0,0 +1,148 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from gmqtt import Client as MQTTClient
+from gmqtt import Subscription
+
+# SUBACK reason codes from 0x80 are failures
+SUBACK_FAILURE = 0x80
+
+
+class MQTTHealth:
+    """
+    Connection state of a FastMQTT client, kept up to date by its callbacks.
+
+    Connections, disconnections, messages and SUBACKs each update a counter or a timestamp,
+    reading the state costs a few lookups per connection, so `router()` can be probed at
+    a high rate. The client is healthy while every connection is up and every subscription
+    sent to the broker was acknowledged.
+
+    clients: Connections of the FastMQTT client
+    subscriptions: Subscriptions of the FastMQTT client, by topic filter
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[MQTTClient],
+        subscriptions: Dict[str, Tuple[Subscription, List[Callable]]],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clients = clients
+        self._subscriptions = subscriptions
+        self._clock = clock
+        self.connected_clients: Set[str] = set()
+        self._seen_clients: Set[str] = set()
+        self.connects = 0
+        self.reconnects = 0
+        self.disconnects = 0
+        self.messages_received = 0
+        # clock times, None until it first happens
+        self.last_connect: Optional[float] = None
+        self.last_disconnect: Optional[float] = None
+        self.last_message: Optional[float] = None
+        # topic filters of the SUBSCRIBE packets waiting for their SUBACK, by client and mid
+        self._pending_subscriptions: Dict[str, Dict[int, Tuple[str, ...]]] = {}
+        self.subscriptions_pending = 0
+        # broker topic filters refused in the last SUBACK received for them
+        self.rejected_subscriptions: Set[str] = set()
+
+    def connected(self, client_id: str) -> None:
+        self.connects += 1
+        if client_id in self._seen_clients:
+            self.reconnects += 1
+        else:
+            self._seen_clients.add(client_id)
+        self.connected_clients.add(client_id)
+        self.last_connect = self._clock()
+
+    def disconnected(self, client_id: str) -> None:
+        """Forget the SUBACKs the connection waited for, subscriptions are sent again."""
+        if client_id in self.connected_clients:
+            self.connected_clients.discard(client_id)
+            self.disconnects += 1
+            self.last_disconnect = self._clock()
+        pending = self._pending_subscriptions.pop(client_id, {})
+        self.subscriptions_pending -= sum(map(len, pending.values()))
+
+    def message_received(self) -> None:
+        self.messages_received += 1
+        self.last_message = self._clock()
+
+    def subscribing(self, client_id: str, mid: Optional[int], topics: Sequence[str]) -> None:
+        """Record a SUBSCRIBE packet sent with the packet identifier `mid`."""
+        if mid is None:
+            return
+        self._pending_subscriptions.setdefault(client_id, {})[mid] = tuple(topics)
+        self.subscriptions_pending += len(topics)
+
+    def subscribed(self, client_id: str, mid: int, reason_codes: Sequence[int]) -> None:
+        """Record the SUBACK of a SUBSCRIBE packet."""
+        topics = self._pending_subscriptions.get(client_id, {}).pop(mid, None)
+        if topics is None:
+            return
+        self.subscriptions_pending -= len(topics)
+        for topic, reason_code in zip(topics, reason_codes):  # noqa: B905
+            if reason_code >= SUBACK_FAILURE:
+                self.rejected_subscriptions.add(topic)
+            else:
+                self.rejected_subscriptions.discard(topic)
+
+    def unsubscribed(self, topic: str) -> None:
+        self.rejected_subscriptions.discard(topic)
+
+    @property
+    def connected_all(self) -> bool:
+        return len(self.connected_clients) == len(self._clients)
+
+    @property
+    def subscribed_all(self) -> bool:
+        return not self.subscriptions_pending and not self.rejected_subscriptions
+
+    @property
+    def healthy(self) -> bool:
+        return self.connected_all and self.subscribed_all
+
+    def _since(self, timestamp: Optional[float], now: float) -> Optional[float]:
+        return None if timestamp is None else round(now - timestamp, 3)
+
+    def state(self) -> Dict[str, Any]:
+        """Return the health state as a JSON serializable dict, ages in seconds."""
+        now = self._clock()
+        return {
+            "healthy": self.healthy,
+            "connections": {
+                "connected": len(self.connected_clients),
+                "total": len(self._clients),
+            },
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "seconds_since_connect": self._since(self.last_connect, now),
+            "seconds_since_disconnect": self._since(self.last_disconnect, now),
+            "messages_received": self.messages_received,
+            "seconds_since_message": self._since(self.last_message, now),
+            "inflight": sum(client._persistent_storage.inflight for client in self._clients),
+            "subscriptions": {
+                "total": len(self._subscriptions),
+                "pending": self.subscriptions_pending,
+                "rejected": sorted(self.rejected_subscriptions),
+            },
+        }
+
+    def router(self, path: str = "/health", **kwargs: Any) -> APIRouter:
+        """
+        Return a FastAPI router serving the health state as JSON, to mount with
+        `app.include_router()`. The status code is 200 while healthy, 503 otherwise.
+
+        kwargs: Passed to `APIRouter`, e.g. `prefix` or `tags`.
+        """
+        router = APIRouter(**kwargs)
+
+        @router.get(path, response_class=JSONResponse, include_in_schema=False)
+        async def _health() -> JSONResponse:
+            state = self.state()
+            return JSONResponse(state, status_code=200 if state["healthy"] else 503)
+
+        return router
@@ -0,0 +1,338 @@
+import asyncio
+import functools
+import json
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Literal, Optional, Set, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from .fastmqtt import FastMQTT
+from .topics import TopicTrie
+
+# drop_oldest: discard the oldest queued message to make room for the new one
+# disconnect: close the subscriber, its WebSocket or SSE connection is closed
+SlowConsumerPolicy = Literal["drop_oldest", "disconnect"]
+
+# Receives topic and payload of a message and returns the text sent to the subscribers
+Serializer = Callable[[str, bytes], str]
+
+# WebSocket close code of the subscribers disconnected for being too slow (try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def json_serializer(topic: str, payload: bytes) -> str:
+    """Default serializer, a JSON object with the topic and the payload decoded as UTF-8."""
+    return json.dumps({"topic": topic, "payload": payload.decode(errors="replace")})
+
+
+class HubFrame:
+    """A message serialized once for every subscriber, the SSE event is formatted on first use."""
+
+    __slots__ = ("_event", "text")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._event: Optional[str] = None
+
+    @property
+    def event(self) -> str:
+        """The message as a Server-Sent Events `data` event."""
+        if self._event is None:
+            self._event = "".join(f"data: {line}\n" for line in self.text.split("\n")) + "\n"
+        return self._event
+
+
+class HubSubscriber:
+    """
+    Bounded queue of the messages of one consumer, e.g. a WebSocket or SSE connection.
+
+    Iterate over it to receive the `HubFrame` of every message, the iteration ends once
+    the subscriber is closed. `dropped` counts the messages discarded by the
+    "drop_oldest" policy, `slow` tells if the "disconnect" policy closed it.
+    """
+
+    __slots__ = (
+        "_frames",
+        "_hub",
+        "_waiter",
+        "closed",
+        "dropped",
+        "maxsize",
+        "policy",
+        "slow",
+        "topic_filters",
+    )
+
+    def __init__(
+        self,
+        hub: "FanoutHub",
+        topic_filters: Tuple[str, ...],
+        maxsize: int,
+        policy: SlowConsumerPolicy,
+    ) -> None:
+        self._hub = hub
+        self.topic_filters = topic_filters
+        self.maxsize = maxsize
+        self.policy = policy
+        self._frames: Deque[HubFrame] = deque()
+        self._waiter: Optional["asyncio.Future[None]"] = None
+        self.closed = False
+        self.slow = False
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of queued messages."""
+        return len(self._frames)
+
+    def put(self, frame: HubFrame) -> bool:
+        """Queue a message, returns False if the subscriber is closed."""
+        if self.closed:
+            return False
+        if len(self._frames) >= self.maxsize:
+            if self.policy == "disconnect":
+                self.slow = True
+                self.close()
+                return False
+            self._frames.popleft()
+            self.dropped += 1
+        self._frames.append(frame)
+        self._wake_up()
+        return True
+
+    async def get(self) -> Optional[HubFrame]:
+        """Return the next message, None once closed."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        if self.closed:
+            return None
+        return self._frames.popleft()
+
+    def __aiter__(self) -> "HubSubscriber":
+        return self
+
+    async def __anext__(self) -> HubFrame:
+        frame = await self.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    def close(self) -> None:
+        """Stop receiving messages, unsubscribing the topic filters nobody else listens to."""
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.clear()
+        self._wake_up()
+        self._hub._remove(self)
+
+    def _wake_up(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class FanoutHub:
+    """
+    Forwards MQTT messages to many consumers, like WebSocket or Server-Sent Events clients.
+
+    A topic filter is subscribed while at least one consumer listens to it, without shared
+    subscription so every message reaches this process. Messages are matched with a
+    `TopicTrie` of the filters and serialized once, then queued for every matching
+    subscriber, at most `queue_size` messages each. When a queue is full, `slow_consumer`
+    decides what happens: drop the oldest message or disconnect the subscriber.
+
+    qos: QoS of the subscriptions
+    serializer: Returns the text sent for a message, defaults to `json_serializer`
+    """
+
+    def __init__(
+        self,
+        fast_mqtt: FastMQTT,
+        *,
+        queue_size: int = 100,
+        slow_consumer: SlowConsumerPolicy = "drop_oldest",
+        qos: int = 0,
+        serializer: Optional[Serializer] = None,
+    ) -> None:
+        self.mqtt = fast_mqtt
+        self.queue_size = queue_size
+        self.slow_consumer = slow_consumer
+        self.qos = qos
+        self.serializer = serializer or json_serializer
+        self.subscribers: Dict[str, Set[HubSubscriber]] = {}
+        self._trie = TopicTrie()
+        # message handler of each subscribed filter, to remove it
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        # messages dropped for the closed subscribers, open ones keep their own count
+        self._dropped = 0
+        self.disconnected = 0
+        if fast_mqtt.metrics is not None:
+            fast_mqtt.metrics.gauge(
+                "fastapi_mqtt_hub_subscribers",
+                "Consumers of the fan-out hub.",
+                lambda: len(self),
+            )
+            fast_mqtt.metrics.counter(
+                "fastapi_mqtt_hub_dropped_total",
+                "Messages dropped for slow hub consumers.",
+                lambda: self.dropped,
+            )
+            fast_mqtt.metrics.counter(
+                "fastapi_mqtt_hub_disconnected_total",
+                "Hub consumers disconnected for being too slow.",
+                lambda: self.disconnected,
+            )
+
+    def __len__(self) -> int:
+        return len(self._all_subscribers())
+
+    @property
+    def dropped(self) -> int:
+        """Messages dropped for slow subscribers since creation."""
+        return self._dropped + sum(subscriber.dropped for subscriber in self._all_subscribers())
+
+    def _all_subscribers(self) -> Set[HubSubscriber]:
+        return set().union(*self.subscribers.values())
+
+    def subscribe(
+        self,
+        *topic_filters: str,
+        queue_size: Optional[int] = None,
+        slow_consumer: Optional[SlowConsumerPolicy] = None,
+    ) -> HubSubscriber:
+        """Return a new subscriber of the topic filters, close it once done."""
+        subscriber = HubSubscriber(
+            self,
+            topic_filters,
+            queue_size or self.queue_size,
+            slow_consumer or self.slow_consumer,
+        )
+        for topic_filter in topic_filters:
+            subscribers = self.subscribers.get(topic_filter)
+            if subscribers is None:
+                subscribers = self.subscribers[topic_filter] = set()
+                self._trie.add(topic_filter)
+                handler = self._handlers[topic_filter] = functools.partial(
+                    self._on_message, topic_filter
+                )
+                self.mqtt.add_subscription(topic_filter, handler, self.qos, shared=False)
+            subscribers.add(subscriber)
+        return subscriber
+
+    def _remove(self, subscriber: HubSubscriber) -> None:
+        if subscriber.slow:
+            self.disconnected += 1
+        self._dropped += subscriber.dropped
+        for topic_filter in subscriber.topic_filters:
+            subscribers = self.subscribers.get(topic_filter)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[topic_filter]
+                self._trie.remove(topic_filter)
+                self.mqtt.remove_subscription(topic_filter, self._handlers.pop(topic_filter))
+
+    async def _on_message(
+        self, topic_filter: str, client: Any, topic: str, payload: bytes, qos: int, properties: Any
+    ) -> int:
+        # called once per matching filter with the same message, only the handler of the
+        # first one fans it out
+        topic_filters = self._trie.match(topic)
+        if not topic_filters or topic_filter != topic_filters[0]:
+            return 0
+        return self.fan_out(topic, payload)
+
+    def fan_out(self, topic: str, payload: bytes) -> int:
+        """Queue a message for every subscriber of a matching filter, returns their number."""
+        topic_filters = self._trie.match(topic)
+        if not topic_filters:
+            return 0
+        if len(topic_filters) == 1:
+            subscribers = self.subscribers[topic_filters[0]]
+        else:
+            subscribers = set().union(
+                *(self.subscribers[topic_filter] for topic_filter in topic_filters)
+            )
+        frame = HubFrame(self.serializer(topic, payload))
+        # the disconnect policy removes subscribers while iterating
+        return sum(subscriber.put(frame) for subscriber in list(subscribers))
+
+    def close(self) -> None:
+        """Close every subscriber, ending their connections."""
+        for subscriber in self._all_subscribers():
+            subscriber.close()
+
+    def router(
+        self, websocket_path: str = "/ws", sse_path: str = "/sse", **kwargs: Any
+    ) -> APIRouter:
+        """
+        Return a FastAPI router with a WebSocket and a Server-Sent Events endpoint.
+
+        Clients pass the topic filters as `topic` query parameters, e.g.
+        `/ws?topic=sensors/%2B/temperature&topic=alerts/%23`, and receive a text message
+        (a `data` event for SSE) per MQTT message.
+
+        kwargs: Passed to `APIRouter`, e.g. `prefix` or `dependencies` for authentication.
+        """
+        router = APIRouter(**kwargs)
+
+        @router.websocket(websocket_path)
+        async def _websocket(websocket: WebSocket) -> None:
+            topic_filters = websocket.query_params.getlist("topic")
+            await websocket.accept()
+            if not topic_filters:
+                await websocket.close(code=1008, reason="No topic")
+                return
+            await self._serve_websocket(websocket, self.subscribe(*topic_filters))
+
+        @router.get(sse_path, response_class=StreamingResponse)
+        async def _server_sent_events(request: Request) -> StreamingResponse:
+            topic_filters = request.query_params.getlist("topic")
+            if not topic_filters:
+                raise HTTPException(status_code=400, detail="No topic")
+            return StreamingResponse(
+                self._event_stream(self.subscribe(*topic_filters)),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        return router
+
+    async def _serve_websocket(self, websocket: WebSocket, subscriber: HubSubscriber) -> None:
+        async def _receive() -> None:
+            # incoming messages are ignored, reading detects the disconnection
+            try:
+                while True:
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                pass
+
+        receiving = asyncio.ensure_future(_receive())
+        receiving.add_done_callback(lambda _: subscriber.close())
+        try:
+            async for frame in subscriber:
+                await websocket.send_text(frame.text)
+            if subscriber.slow:
+                await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer")
+            elif not receiving.done():
+                await websocket.close()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiving.cancel()
+            subscriber.close()
+
+    async def _event_stream(self, subscriber: HubSubscriber) -> AsyncIterator[str]:
+        try:
+            async for frame in subscriber:
+                yield frame.event
+        finally:
+            subscriber.close()
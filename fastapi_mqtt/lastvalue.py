@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from gmqtt import Client as MQTTClient
+from pydantic import BaseModel
+
+from .topics import match_topic
+
+
+class LastValueSettings(BaseModel):
+    """
+    Settings of the last-value cache of a topic filter.
+
+    max_entries: Maximum number of topics kept, the least recently used are evicted first
+    ttl: Number of seconds a value is kept after it was received, None keeps it until evicted
+    qos: QoS of the subscription feeding the cache
+    """
+
+    max_entries: int = 1000
+    ttl: Optional[float] = None
+    qos: int = 0
+
+
+class CachedValue(NamedTuple):
+    """Last message received on a topic."""
+
+    topic: str
+    payload: bytes
+    qos: int
+    properties: Any
+    # wall clock time the message was received at, as returned by time.time()
+    received_at: float
+
+
+class LastValueCache:
+    """
+    Last message received on every topic matching a topic filter.
+
+    Lookups by topic name are O(1) and refresh the entry for the LRU eviction,
+    wildcard queries scan the cached topics.
+    """
+
+    __slots__ = ("_clock", "_entries", "settings", "topic_filter")
+
+    def __init__(
+        self,
+        topic_filter: str,
+        settings: LastValueSettings,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.topic_filter = topic_filter
+        self.settings = settings
+        self._clock = clock
+        # topic name: (value, expiry in clock time)
+        self._entries: "OrderedDict[str, Tuple[CachedValue, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def add(
+        self, client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
+    ) -> None:
+        """Message handler storing the message as the last value of its topic."""
+        ttl = self.settings.ttl
+        expiry = self._clock() + ttl if ttl is not None else float("inf")
+        self._entries[topic] = (CachedValue(topic, payload, qos, properties, time.time()), expiry)
+        self._entries.move_to_end(topic)
+        if len(self._entries) > self.settings.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, topic: str) -> Optional[CachedValue]:
+        """Return the last value of a topic name, None if unknown or expired."""
+        entry = self._entries.get(topic)
+        if entry is None:
+            return None
+        if entry[1] <= self._clock():
+            del self._entries[topic]
+            return None
+        self._entries.move_to_end(topic)
+        return entry[0]
+
+    def query(self, topic_filter: str) -> List[CachedValue]:
+        """Return the last values of the topics matching a topic filter, oldest used first."""
+        now = self._clock()
+        expired = [topic for topic, (_, expiry) in self._entries.items() if expiry <= now]
+        for topic in expired:
+            del self._entries[topic]
+        return [
+            value for topic, (value, _) in self._entries.items() if match_topic(topic, topic_filter)
+        ]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class LastValues:
+    """
+    Every last-value cache of a FastMQTT client, queried by topic name or topic filter.
+
+    The instance is a FastAPI dependency returning itself, e.g.
+    `values: LastValues = Depends(fast_mqtt.last_values)`.
+    """
+
+    def __init__(self) -> None:
+        self.caches: Dict[str, LastValueCache] = {}
+
+    def __call__(self) -> "LastValues":
+        return self
+
+    def __len__(self) -> int:
+        return sum(len(cache) for cache in self.caches.values())
+
+    def get(self, topic: str) -> Optional[CachedValue]:
+        """Return the last value received on a topic name."""
+        latest = None
+        for cache in self.caches.values():
+            value = cache.get(topic)
+            if value is not None and (latest is None or value.received_at > latest.received_at):
+                latest = value
+        return latest
+
+    def query(self, topic_filter: str) -> List[CachedValue]:
+        """Return the last value of every cached topic matching a topic filter, e.g. `sensors/+`."""
+        values: Dict[str, CachedValue] = {}
+        for cache in self.caches.values():
+            for value in cache.query(topic_filter):
+                latest = values.get(value.topic)
+                if latest is None or value.received_at > latest.received_at:
+                    values[value.topic] = value
+        return list(values.values())
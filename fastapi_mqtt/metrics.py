@@ -0,0 +1,229 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Set, Tuple, TYPE_CHECKING
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+if TYPE_CHECKING:
+    from .ratelimit import RateLimiter
+
+# Upper bounds in seconds of the handler latency buckets
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets, allocated once.
+
+    Observing a value is a binary search and two additions, cumulative counts
+    are only computed when rendering.
+    """
+
+    __slots__ = ("bounds", "count", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        # the last slot counts values above every bound (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return the (le, count) pairs of the exposition format."""
+        total = 0
+        buckets = []
+        for index, bound in enumerate(self.bounds):
+            total += self.counts[index]
+            buckets.append((repr(float(bound)), total))
+        buckets.append(("+Inf", self.count))
+        return buckets
+
+
+class HandlerMetrics:
+    """Calls, failures and latency of a message handler for one topic filter."""
+
+    __slots__ = ("calls", "duration", "failures", "labels")
+
+    def __init__(self, topic_filter: str, handler: str, buckets: Sequence[float]) -> None:
+        self.labels = _labels(filter=topic_filter, handler=handler)
+        self.calls = 0
+        self.failures = 0
+        self.duration = Histogram(buckets)
+
+
+class MQTTMetrics:
+    """
+    In-process counters of a FastMQTT client, rendered in Prometheus text format.
+
+    Messages are counted per matching topic filter, handlers per topic filter and handler
+    with a latency histogram. Everything is updated from the event loop, without locks.
+
+    buckets: Upper bounds in seconds of the handler latency histograms
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.messages_received = 0
+        self.messages_published = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.filter_messages: Dict[str, int] = {}
+        self.handlers: List[HandlerMetrics] = []
+        self.rate_limiters: List["RateLimiter"] = []
+        self._connected_clients: Set[str] = set()
+        self._collected: List[Tuple[str, str, str, Callable[[], float]]] = []
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> None:
+        """Register a value read when rendering, e.g. the number of subscriptions."""
+        self._collected.append((name, "gauge", documentation, read))
+
+    def counter(self, name: str, documentation: str, read: Callable[[], float]) -> None:
+        """Register a counter kept by another component, read when rendering."""
+        self._collected.append((name, "counter", documentation, read))
+
+    def message_matched(self, topic_filter: str) -> None:
+        self.filter_messages[topic_filter] = self.filter_messages.get(topic_filter, 0) + 1
+
+    def connected(self, client_id: str) -> None:
+        """Count a CONNACK, every connection after the first one of a client is a reconnect."""
+        self.connects += 1
+        if client_id in self._connected_clients:
+            self.reconnects += 1
+        else:
+            self._connected_clients.add(client_id)
+
+    def instrument(
+        self, handler: Callable[..., Awaitable[Any]], topic_filter: str, name: str
+    ) -> Callable[..., Awaitable[Any]]:
+        """Return the coroutine function `handler` recording its calls, failures and latency."""
+        stats = HandlerMetrics(topic_filter, name, self.buckets)
+        self.handlers.append(stats)
+        clock = time.perf_counter
+
+        @functools.wraps(handler)
+        async def _instrumented_handler(*args: Any) -> Any:
+            stats.calls += 1
+            start = clock()
+            try:
+                return await handler(*args)
+            except Exception:
+                stats.failures += 1
+                raise
+            finally:
+                stats.duration.observe(clock() - start)
+
+        return _instrumented_handler
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def _header(name: str, kind: str, documentation: str) -> None:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        _header("fastapi_mqtt_messages_received_total", "counter", "Messages received.")
+        lines.append(f"fastapi_mqtt_messages_received_total {self.messages_received}")
+        _header("fastapi_mqtt_messages_published_total", "counter", "Messages published.")
+        lines.append(f"fastapi_mqtt_messages_published_total {self.messages_published}")
+        _header("fastapi_mqtt_connects_total", "counter", "Connections acknowledged by the broker.")
+        lines.append(f"fastapi_mqtt_connects_total {self.connects}")
+        _header("fastapi_mqtt_reconnects_total", "counter", "Connections after the first one.")
+        lines.append(f"fastapi_mqtt_reconnects_total {self.reconnects}")
+
+        _header(
+            "fastapi_mqtt_filter_messages_total", "counter", "Messages received per topic filter."
+        )
+        for topic_filter, count in self.filter_messages.items():
+            labels = _labels(filter=topic_filter)
+            lines.append(f"fastapi_mqtt_filter_messages_total{{{labels}}} {count}")
+
+        _header("fastapi_mqtt_handler_calls_total", "counter", "Message handler calls.")
+        for stats in self.handlers:
+            lines.append(f"fastapi_mqtt_handler_calls_total{{{stats.labels}}} {stats.calls}")
+        _header("fastapi_mqtt_handler_failures_total", "counter", "Message handler exceptions.")
+        for stats in self.handlers:
+            lines.append(f"fastapi_mqtt_handler_failures_total{{{stats.labels}}} {stats.failures}")
+
+        name = "fastapi_mqtt_handler_duration_seconds"
+        _header(name, "histogram", "Message handler latency.")
+        for stats in self.handlers:
+            for le, count in stats.duration.cumulative():
+                lines.append(f'{name}_bucket{{{stats.labels},le="{le}"}} {count}')
+            lines.append(f"{name}_sum{{{stats.labels}}} {stats.duration.sum!r}")
+            lines.append(f"{name}_count{{{stats.labels}}} {stats.duration.count}")
+
+        if self.rate_limiters:
+            _header(
+                "fastapi_mqtt_rate_limited_total",
+                "counter",
+                "Messages above a rate limit, per action.",
+            )
+            lines.extend(self._rate_limiter_samples())
+
+        for name, kind, documentation, read in self._collected:
+            _header(name, kind, documentation)
+            lines.append(f"{name} {_format_value(read())}")
+
+        lines.append("")
+        return "\n".join(lines)
+
+    def _rate_limiter_samples(self) -> List[str]:
+        samples = []
+        for limiter in self.rate_limiters:
+            for action in ("delayed", "dropped", "overflowed"):
+                labels = _labels(direction=limiter.direction, limiter=limiter.name, action=action)
+                samples.append(
+                    f"fastapi_mqtt_rate_limited_total{{{labels}}} {getattr(limiter, action)}"
+                )
+        return samples
+
+    def router(self, path: str = "/metrics", **kwargs: Any) -> APIRouter:
+        """
+        Return a FastAPI router serving the metrics, to mount with `app.include_router()`.
+
+        kwargs: Passed to `APIRouter`, e.g. `prefix` or `tags`.
+        """
+        router = APIRouter(**kwargs)
+
+        @router.get(path, response_class=PlainTextResponse, include_in_schema=False)
+        async def _metrics() -> PlainTextResponse:
+            return PlainTextResponse(self.render(), media_type=EXPOSITION_CONTENT_TYPE)
+
+        return router
@@ -0,0 +1,184 @@
+import asyncio
+import struct
+from logging import Logger
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from gmqtt import Client as MQTTClient
+from gmqtt import Message
+from gmqtt.mqtt.package import PublishPacket
+from gmqtt.storage import PersistentStorage
+
+
+def build_publish_packet(client: MQTTClient, message: Message) -> Tuple[Optional[int], bytes]:
+    """
+    Serialize a PUBLISH packet for the current connection of the client.
+
+    As with `gmqtt.Client.publish`, QoS 1/2 packets are stored to be resent after
+    a reconnect until they are acknowledged.
+    Returns the packet identifier (None for QoS 0) and the packet.
+    """
+    mid, packet = PublishPacket.build_package(message, client._connection._protocol)
+    if message.qos > 0:
+        client._persistent_storage.push_message(mid, packet)
+    return mid, packet
+
+
+# PUBACK and PUBREC reason codes from 0x80 are failures
+REFUSED_REASON_CODE = 0x80
+
+
+class PublishRefusedError(Exception):
+    """The broker refused a QoS 1/2 message with a PUBACK or PUBREC reason code."""
+
+    def __init__(self, mid: int, reason_code: int) -> None:
+        super().__init__(f"Message {mid} refused by the broker, reason code {reason_code:#x}")
+        self.mid = mid
+        self.reason_code = reason_code
+
+
+def track_refused_acknowledgements(client: MQTTClient) -> None:
+    """
+    Fail the acknowledgement of the messages the broker refuses.
+
+    gmqtt drops a message acknowledged with a failure reason code like an accepted one,
+    its PUBACK and PUBREC handlers are wrapped to report the reason code to the
+    `AcknowledgementTracker` of the client first.
+    """
+    handler = client._package_handler
+    for name in ("_handle_puback_packet", "_handle_pubrec_packet"):
+        setattr(handler, name, _refusal_checking_handler(client, getattr(handler, name)))
+
+
+def _refusal_checking_handler(
+    client: MQTTClient, handle: Callable[[int, bytes], None]
+) -> Callable[[int, bytes], None]:
+    def _handle_acknowledgement(cmd: int, packet: bytes) -> None:
+        # MQTT5.0 packets carry the reason code after the packet identifier
+        if len(packet) > 2 and packet[2] >= REFUSED_REASON_CODE:
+            (mid,) = struct.unpack("!H", packet[:2])
+            client._persistent_storage.refuse(mid, packet[2])
+        handle(cmd, packet)
+
+    return _handle_acknowledgement
+
+
+def write_packets(client: MQTTClient, packets: List[bytes]) -> None:
+    """Write serialized packets to the transport of the client with a single call."""
+    if packets:
+        client._connection._protocol.write_data(b"".join(packets))
+
+
+class PublishQueue:
+    """
+    Coalesces outbound PUBLISH packets into larger socket writes.
+
+    Packets are serialized as soon as they are queued, keeping publish order and
+    packet identifiers, and written together when `max_bytes` are buffered or
+    `max_delay` seconds after the first buffered packet.
+
+    max_bytes: Buffered size that triggers a write
+    max_delay: Maximum number of seconds a packet waits in the buffer
+    """
+
+    def __init__(
+        self,
+        client: MQTTClient,
+        logger: Logger,
+        *,
+        max_bytes: int = 65536,
+        max_delay: float = 0.005,
+    ) -> None:
+        self.client = client
+        self._logger = logger
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._packets: List[bytes] = []
+        self._size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.writes = 0
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._size
+
+    def put(self, message: Message) -> Optional[int]:
+        """Serialize a message and buffer its packet. Returns the packet identifier."""
+        return self.put_many((message,))[0]
+
+    def put_many(self, messages: Iterable[Message]) -> List[Optional[int]]:
+        """Serialize messages and buffer their packets, writing every `max_bytes`."""
+        mids = []
+        for message in messages:
+            mid, packet = build_publish_packet(self.client, message)
+            mids.append(mid)
+            self._packets.append(packet)
+            self._size += len(packet)
+            if self._size >= self.max_bytes:
+                self.flush()
+
+        if self._packets and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return mids
+
+    def flush(self) -> None:
+        """Write every buffered packet now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._packets:
+            return
+
+        packets, self._packets, self._size = self._packets, [], 0
+        self._logger.debug("Writing %d coalesced PUBLISH packets", len(packets))
+        write_packets(self.client, packets)
+        self.writes += 1
+
+
+class AcknowledgementTracker(PersistentStorage):
+    """
+    gmqtt storage of in-flight QoS 1/2 messages resolving futures on acknowledgement.
+
+    gmqtt removes a message from its storage once the PUBACK (QoS 1) or PUBCOMP (QoS 2)
+    is received, which completes the future returned by `wait()` for its packet identifier.
+    If the broker session is lost, the pending futures fail with `ConnectionError`,
+    if the broker refuses the message they fail with `PublishRefusedError`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._acknowledgements: Dict[int, "asyncio.Future[None]"] = {}
+
+    @property
+    def inflight(self) -> int:
+        """Number of messages waiting for their acknowledgement."""
+        return len(self._messages)
+
+    def wait(self, mid: int) -> "asyncio.Future[None]":
+        """Future resolved when the message with the given packet identifier is acknowledged."""
+        future = self._acknowledgements.get(mid)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            if mid in self._messages:
+                self._acknowledgements[mid] = future
+            else:
+                future.set_result(None)
+        return future
+
+    def refuse(self, mid: int, reason_code: int) -> None:
+        """Fail the future of a message refused by the broker, before it is removed."""
+        future = self._acknowledgements.pop(mid, None)
+        if future is not None and not future.done():
+            future.set_exception(PublishRefusedError(mid, reason_code))
+
+    def remove_message_by_mid(self, mid: Any) -> None:
+        super().remove_message_by_mid(mid)
+        future = self._acknowledgements.pop(mid, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def clear(self) -> None:
+        super().clear()
+        acknowledgements, self._acknowledgements = self._acknowledgements, {}
+        for future in acknowledgements.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Session lost before acknowledgement"))
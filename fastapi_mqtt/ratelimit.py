@@ -0,0 +1,119 @@
+import time
+from typing import Any, Callable, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# drop: discard the message
+# delay: hold the message until a token is available, dropping it past `max_delay` seconds
+# overflow: pass the message to `overflow_handler` instead
+LimitPolicy = Literal["drop", "delay", "overflow"]
+
+
+class RateLimit(BaseModel):
+    """
+    Settings of a token-bucket limiter.
+
+    rate: Sustained number of messages per second
+    burst: Number of messages allowed at once above the rate, defaults to `max(rate, 1)`
+    policy: What happens to messages above the limit, see `LimitPolicy`
+    max_delay: Longest wait of a delayed message in seconds, later messages are dropped
+    overflow_handler: Called with the shed messages with the "overflow" policy: with the
+        handler arguments (client, topic, payload, qos, properties) for received messages,
+        with the gmqtt `Message` for published ones. Can be a coroutine function.
+    """
+
+    rate: float = Field(gt=0)
+    burst: Optional[float] = Field(default=None, gt=0)
+    policy: LimitPolicy = "drop"
+    max_delay: float = 1.0
+    overflow_handler: Optional[Callable[..., Any]] = None
+
+    @model_validator(mode="after")
+    def _check_overflow_handler(self) -> "RateLimit":
+        if self.policy == "overflow" and self.overflow_handler is None:
+            raise ValueError("The overflow policy needs an overflow_handler")
+        return self
+
+
+class RateLimiter:
+    """
+    Token bucket applying a `RateLimit`.
+
+    name: Topic filter of the limiter, "*" for the limit of every published message
+    direction: "inbound" for received messages, "outbound" for published ones
+    Counters: `passed` messages went through right away, `delayed` ones waited for a token,
+    `dropped` and `overflowed` ones were shed.
+    """
+
+    __slots__ = (
+        "_clock",
+        "_tokens",
+        "_updated",
+        "burst",
+        "delayed",
+        "direction",
+        "dropped",
+        "limit",
+        "name",
+        "overflowed",
+        "passed",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        limit: RateLimit,
+        direction: str = "inbound",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.direction = direction
+        self.limit = limit
+        self.burst = limit.burst if limit.burst is not None else max(limit.rate, 1)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self.passed = 0
+        self.delayed = 0
+        self.dropped = 0
+        self.overflowed = 0
+
+    @property
+    def shed(self) -> int:
+        return self.dropped + self.overflowed
+
+    def acquire(self) -> Optional[float]:
+        """
+        Take a token for a message.
+
+        Returns 0 when the message can go now, the number of seconds to hold it with the
+        "delay" policy, or None when it is shed (counted as dropped or overflowed).
+        """
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.limit.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.passed += 1
+            return 0
+
+        if self.limit.policy == "delay":
+            wait = (1 - self._tokens) / self.limit.rate
+            if wait <= self.limit.max_delay:
+                # reserve the token, later messages wait behind this one
+                self._tokens -= 1
+                self.delayed += 1
+                return wait
+        if self.limit.policy == "overflow":
+            self.overflowed += 1
+        else:
+            self.dropped += 1
+        return None
+
+    def refund(self, wait: float) -> None:
+        """Give back the token taken by `acquire()` returning `wait`, for an unsent message."""
+        self._tokens = min(self.burst, self._tokens + 1)
+        if wait:
+            self.delayed -= 1
+        else:
+            self.passed -= 1
@@ -0,0 +1,238 @@
+import base64
+import json
+import mmap
+import struct
+from collections import deque
+from logging import Logger
+from pathlib import Path
+from typing import Any, Deque, List, Optional, Union
+
+from gmqtt import Message
+
+# magic, read offset, write offset, number of records
+_HEADER = struct.Struct("!8sQQQ")
+_MAGIC = b"FMQSPOOL"
+# topic length, payload length, properties length, qos, retain
+_RECORD = struct.Struct("!HIIB?")
+
+
+def _encode_property(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_property(item) for item in value]
+    return value
+
+
+def _decode_property(value: Any) -> Any:
+    if isinstance(value, dict) and "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    if isinstance(value, list):
+        return tuple(_decode_property(item) for item in value)
+    return value
+
+
+def encode_message(message: Message) -> bytes:
+    """Serialize a message into a spool record."""
+    properties = json.dumps(
+        {name: _encode_property(value) for name, value in message.properties.items()}
+    ).encode()
+    header = _RECORD.pack(
+        len(message.topic), len(message.payload), len(properties), message.qos, message.retain
+    )
+    return b"".join((header, message.topic, message.payload, properties))
+
+
+def record_size(buffer: Union[bytes, mmap.mmap], offset: int = 0) -> int:
+    """Return the size of the spool record starting at offset."""
+    topic_size, payload_size, properties_size, _, _ = _RECORD.unpack_from(buffer, offset)
+    return _RECORD.size + topic_size + payload_size + properties_size
+
+
+def decode_message(buffer: Union[bytes, mmap.mmap], offset: int = 0) -> Message:
+    """Deserialize the spool record starting at offset."""
+    topic_size, payload_size, properties_size, qos, retain = _RECORD.unpack_from(buffer, offset)
+    offset += _RECORD.size
+    topic = buffer[offset : offset + topic_size]
+    offset += topic_size
+    payload = buffer[offset : offset + payload_size]
+    offset += payload_size
+    properties = {
+        name: _decode_property(value)
+        for name, value in json.loads(buffer[offset : offset + properties_size]).items()
+    }
+    # user properties are pairs, the only list property gmqtt accepts
+    if "user_property" in properties:
+        properties["user_property"] = list(properties["user_property"])
+    return Message(topic, payload, qos=qos, retain=retain, **properties)
+
+
+class DiskSpool:
+    """
+    Append-only file of spooled messages, memory-mapped and kept across restarts.
+
+    The file has a fixed size of `max_bytes`, records are appended at the write offset and
+    consumed from the read offset. Space is reclaimed once every record was consumed,
+    when both offsets go back to the start of the file.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int) -> None:
+        self.path = Path(path)
+        size = _HEADER.size + max_bytes
+        mode = "r+b" if self.path.exists() else "w+b"
+        self._file = self.path.open(mode)
+        self._file.seek(0, 2)
+        if self._file.tell() < size:
+            self._file.truncate(size)
+        else:
+            size = self._file.tell()
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self.size = size
+
+        magic, self._read, self._write, self.count = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or not _HEADER.size <= self._read <= self._write <= size:
+            self._reset()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def used_bytes(self) -> int:
+        """Bytes of the file taken by records, including the consumed ones not reclaimed yet."""
+        return self._write - _HEADER.size
+
+    def _reset(self) -> None:
+        self._read = self._write = _HEADER.size
+        self.count = 0
+        self._store_header()
+
+    def _store_header(self) -> None:
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, self._read, self._write, self.count)
+
+    def append(self, record: bytes) -> bool:
+        """Write a record, returns False when the file is full."""
+        end = self._write + len(record)
+        if end > self.size:
+            return False
+        self._mmap[self._write : end] = record
+        self._write = end
+        self.count += 1
+        self._store_header()
+        return True
+
+    def peek(self) -> Optional[Message]:
+        """Return the oldest message without consuming it."""
+        if not self.count:
+            return None
+        return decode_message(self._mmap, self._read)
+
+    def pop(self) -> None:
+        """Consume the oldest message."""
+        if not self.count:
+            return
+        self._read += record_size(self._mmap, self._read)
+        self.count -= 1
+        if self.count:
+            self._store_header()
+        else:
+            self._reset()
+
+    def records(self) -> List[bytes]:
+        """Return every pending record, oldest first."""
+        records = []
+        offset = self._read
+        for _ in range(self.count):
+            size = record_size(self._mmap, offset)
+            records.append(self._mmap[offset : offset + size])
+            offset += size
+        return records
+
+    def clear(self) -> None:
+        self._reset()
+
+    def close(self) -> None:
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.close()
+
+
+class PublishSpool:
+    """
+    Messages published while the broker is unreachable, kept until they can be sent.
+
+    Messages are kept in memory up to `memory_size` messages, then appended to a
+    `DiskSpool` file when a `path` is given, or dropped otherwise.
+    Messages left in memory are written to the file on `close()`, so a restart
+    sends them as well. Without a file they are logged and counted as dropped.
+
+    memory_size: Maximum number of messages kept in memory
+    path: File used when memory is full, None disables disk overflow
+    max_bytes: Maximum size of the file
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        *,
+        memory_size: int = 1000,
+        path: Optional[Union[str, Path]] = None,
+        max_bytes: int = 16 * 1024 * 1024,
+    ) -> None:
+        self._logger = logger
+        self.memory_size = memory_size
+        self._memory: Deque[Message] = deque()
+        self.disk: Optional[DiskSpool] = DiskSpool(path, max_bytes) if path else None
+        self.spooled = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._memory) + (len(self.disk) if self.disk is not None else 0)
+
+    @property
+    def memory_messages(self) -> int:
+        return len(self._memory)
+
+    def put(self, message: Message) -> bool:
+        """Keep a message, returns False if it was dropped because the spool is full."""
+        # once messages overflow to disk, newer ones follow them to keep the order
+        if (self.disk is None or not self.disk) and len(self._memory) < self.memory_size:
+            self._memory.append(message)
+        elif self.disk is None or not self.disk.append(encode_message(message)):
+            self.dropped += 1
+            self._logger.warning("Publish spool is full, dropping message on %s", message.topic)
+            return False
+        self.spooled += 1
+        return True
+
+    def peek(self) -> Optional[Message]:
+        """Return the oldest message without removing it."""
+        if self._memory:
+            return self._memory[0]
+        return self.disk.peek() if self.disk is not None else None
+
+    def pop(self) -> None:
+        """Remove the oldest message."""
+        if self._memory:
+            self._memory.popleft()
+        elif self.disk is not None:
+            self.disk.pop()
+
+    def close(self) -> None:
+        """Write the messages kept in memory to the file, ahead of the ones already in it."""
+        if self.disk is None:
+            if self._memory:
+                self.dropped += len(self._memory)
+                self._logger.warning(
+                    "Publish spool closed, dropping %d unsent messages", len(self._memory)
+                )
+                self._memory.clear()
+            return
+        if self._memory:
+            records = [encode_message(message) for message in self._memory]
+            records.extend(self.disk.records())
+            self.disk.clear()
+            for record in records:
+                if not self.disk.append(record):
+                    self.dropped += 1
+            self._memory.clear()
+        self.disk.close()
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from itertools import zip_longest
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+SHARED_SUBSCRIPTION_PREFIX = "$share/"
+
+
+def strip_shared_prefix(topic_filter: str) -> str:
+    """
+    Remove the `$share/<group>/` part of a shared subscription filter.
+
+    According to MQTT5.0 item 4.8.2 the group name is not part of the filter
+    that is matched against topic names.
+    """
+    if topic_filter.startswith(SHARED_SUBSCRIPTION_PREFIX):
+        return topic_filter.split("/", 2)[2]
+    return topic_filter
+
+
+def match_topic(topic: str, topic_filter: str) -> bool:
+    """
+    Check a single topic name against a single topic filter.
+
+    topic: topic name
+    topic_filter: topic filter that may contain wildcards
+    """
+    topic_filter = strip_shared_prefix(str(topic_filter))
+
+    topic_parts = topic.split("/")
+    filter_parts = topic_filter.split("/")
+
+    for topic_part, part in zip_longest(topic_parts, filter_parts):
+        if part == "#" and not str(topic_part).startswith("$"):
+            return True
+        elif (topic_part is None or part not in {"+", topic_part}) or (
+            part == "+" and topic_part.startswith("$")
+        ):
+            return False
+        continue
+
+    return len(filter_parts) == len(topic_parts)
+
+
+class _TopicNode:
+    __slots__ = ("children", "filters")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TopicNode"] = {}
+        # Original filters (including `$share/` ones) ending at this level
+        self.filters: Set[str] = set()
+
+
+class TopicTrie:
+    """
+    Compiled index of topic filters.
+
+    Filters are split into levels once, when they are added, so matching a topic
+    name costs time proportional to the number of topic levels instead of the
+    number of registered filters.
+    Semantics are the same as `match_topic`: `+` and `#` never match a level
+    starting with `$`, `a/#` also matches `a`, and `$share/<group>/` is ignored.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self) -> None:
+        self._root = _TopicNode()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, topic_filter: object) -> bool:
+        if not isinstance(topic_filter, str):
+            return False
+        node = self._find(topic_filter)
+        return node is not None and topic_filter in node.filters
+
+    def __iter__(self) -> Iterator[str]:
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            yield from node.filters
+            stack.extend(node.children.values())
+
+    def _find(self, topic_filter: str) -> Optional[_TopicNode]:
+        node = self._root
+        for level in strip_shared_prefix(topic_filter).split("/"):
+            child = node.children.get(level)
+            if child is None:
+                return None
+            node = child
+        return node
+
+    def add(self, topic_filter: str) -> None:
+        """Register a topic filter, adding it twice has no effect."""
+        node = self._root
+        for level in strip_shared_prefix(topic_filter).split("/"):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _TopicNode()
+            node = child
+
+        if topic_filter not in node.filters:
+            node.filters.add(topic_filter)
+            self._size += 1
+
+    def remove(self, topic_filter: str) -> bool:
+        """Unregister a topic filter, pruning empty branches. Returns if it was present."""
+        path = [self._root]
+        levels = strip_shared_prefix(topic_filter).split("/")
+        for level in levels:
+            child = path[-1].children.get(level)
+            if child is None:
+                return False
+            path.append(child)
+
+        node = path[-1]
+        if topic_filter not in node.filters:
+            return False
+        node.filters.discard(topic_filter)
+        self._size -= 1
+
+        for depth in range(len(levels) - 1, -1, -1):
+            if node.filters or node.children:
+                break
+            node = path[depth]
+            del node.children[levels[depth]]
+        return True
+
+    def clear(self) -> None:
+        self._root = _TopicNode()
+        self._size = 0
+
+    def match(self, topic: str) -> List[str]:
+        """Return every registered filter matching the given topic name."""
+        matched: List[str] = []
+        nodes = [self._root]
+
+        for level in topic.split("/"):
+            wildcards_allowed = not level.startswith("$")
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                if wildcards_allowed:
+                    multi_level = children.get("#")
+                    if multi_level is not None:
+                        matched.extend(multi_level.filters)
+                    single_level = children.get("+")
+                    if single_level is not None:
+                        next_nodes.append(single_level)
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+            if not next_nodes:
+                return matched
+            nodes = next_nodes
+
+        for node in nodes:
+            matched.extend(node.filters)
+            # `sport/#` also matches the parent level `sport`
+            multi_level = node.children.get("#")
+            if multi_level is not None:
+                matched.extend(multi_level.filters)
+        return matched
+
+
+class TopicCache:
+    """
+    Bounded LRU cache of topic names resolved to their matching topic filters.
+
+    maxsize: Maximum number of topic names kept, 0 disables the cache.
+
+    `hits` and `misses` count lookups since creation, to help sizing it.
+    """
+
+    __slots__ = ("_entries", "hits", "maxsize", "misses")
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self._entries: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, topic: str) -> Optional[Tuple[str, ...]]:
+        try:
+            topic_filters = self._entries[topic]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(topic)
+        self.hits += 1
+        return topic_filters
+
+    def put(self, topic: str, topic_filters: Tuple[str, ...]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[topic] = topic_filters
+        self._entries.move_to_end(topic)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached resolution, counters are kept."""
+        self._entries.clear()
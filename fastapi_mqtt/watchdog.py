@@ -0,0 +1,125 @@
+import asyncio
+import functools
+from logging import Logger
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class HandlerTimeoutError(asyncio.TimeoutError):
+    """Raised when a message handler runs longer than its timeout, it is cancelled."""
+
+
+class GuardedHandler:
+    """Slow calls and timeouts of a message handler for one topic filter."""
+
+    __slots__ = ("name", "slow_calls", "timeout", "timeouts", "topic_filter")
+
+    def __init__(self, topic_filter: str, name: str, timeout: Optional[float]) -> None:
+        self.topic_filter = topic_filter
+        self.name = name
+        self.timeout = timeout
+        self.slow_calls = 0
+        self.timeouts = 0
+
+
+class HandlerWatchdog:
+    """
+    Cancels message handlers running longer than their timeout and reports the ones
+    running longer than `slow_threshold` seconds, while they are still running.
+
+    Both are logged with the handler name and the topic of the message, and counted per
+    handler and topic filter. A timed out synchronous handler is no longer awaited but
+    its thread runs until the function returns.
+
+    slow_threshold: Number of seconds after which a running handler is reported,
+        None disables the reports
+    """
+
+    def __init__(self, logger: Logger, slow_threshold: Optional[float] = None) -> None:
+        self._logger = logger
+        self.slow_threshold = slow_threshold
+        self.handlers: List[GuardedHandler] = []
+
+    @property
+    def slow_calls(self) -> int:
+        return sum(stats.slow_calls for stats in self.handlers)
+
+    @property
+    def timeouts(self) -> int:
+        return sum(stats.timeouts for stats in self.handlers)
+
+    def guard(
+        self,
+        handler: Callable[..., Awaitable[Any]],
+        topic_filter: str,
+        name: str,
+        timeout: Optional[float] = None,
+        batch: bool = False,
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Return the coroutine function `handler` cancelled after `timeout` seconds,
+        raising `HandlerTimeoutError`, and reported when slow.
+
+        The handler is returned as is without timeout nor slow threshold.
+
+        batch: The handler is called with the client and a list of messages,
+            it is reported with its topic filter instead of the topic of a message
+        """
+        if timeout is None and self.slow_threshold is None:
+            return handler
+        stats = GuardedHandler(topic_filter, name, timeout)
+        self.handlers.append(stats)
+
+        @functools.wraps(handler)
+        async def _guarded_handler(client: Any, *args: Any) -> Any:
+            topic = topic_filter if batch else args[0]
+            report = None
+            if self.slow_threshold is not None:
+                report = asyncio.get_running_loop().call_later(
+                    self.slow_threshold, self._report_slow, stats, topic
+                )
+            try:
+                if timeout is None:
+                    return await handler(client, *args)
+                return await self._call_with_timeout(handler(client, *args), stats, timeout, topic)
+            finally:
+                if report is not None:
+                    report.cancel()
+
+        return _guarded_handler
+
+    async def _call_with_timeout(
+        self, call: Awaitable[Any], stats: GuardedHandler, seconds: float, topic: str
+    ) -> Any:
+        """
+        Await a handler call, cancelled after `seconds`. Only this cancellation
+        raises `HandlerTimeoutError`, a `TimeoutError` of the handler itself is raised as is.
+        """
+        task = asyncio.ensure_future(call)
+        expired = False
+
+        def _expire() -> None:
+            nonlocal expired
+            expired = True
+            task.cancel()
+
+        timer = asyncio.get_running_loop().call_later(seconds, _expire)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not expired:
+                raise
+            stats.timeouts += 1
+            raise HandlerTimeoutError(
+                f"Handler {stats.name} timed out after {seconds} seconds on {topic}"
+            ) from None
+        finally:
+            timer.cancel()
+
+    def _report_slow(self, stats: GuardedHandler, topic: str) -> None:
+        stats.slow_calls += 1
+        self._logger.warning(
+            "Handler %s is running for more than %s seconds on %s",
+            stats.name,
+            self.slow_threshold,
+            topic,
+        )
@@ -0,0 +1,6 @@
+"""
+Benchmarks of fastapi-mqtt, run with `python -m tests.benchmarks`.
+
+The `bench_*.py` modules are not collected by pytest, publish benchmarks use the
+in-process broker of `tests/broker.py` so nothing leaves the machine.
+"""
@@ -0,0 +1,62 @@
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from . import bench_dispatch, bench_match, bench_publish
+
+SUITES = {
+    "match": bench_match,
+    "dispatch": bench_dispatch,
+    "publish": bench_publish,
+}
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return json.dumps([result["name"], result["params"]], sort_keys=True)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Return one line per benchmark with the throughput change against the baseline."""
+    previous = {_key(result): result for result in baseline["results"]}
+    lines = []
+    for result in current["results"]:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        change = result["ops_per_second"] / before["ops_per_second"] - 1
+        lines.append(f"{result['name']} {result['params']}: {change:+.1%}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks")
+    parser.add_argument("suites", nargs="*", choices=[[], *SUITES], help="default: all")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and sizes")
+    parser.add_argument("--output", type=Path, help="write the JSON results to a file")
+    parser.add_argument("--compare", type=Path, help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.suites or SUITES:
+        results.extend(SUITES[name].run(quick=args.quick))
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print("\n".join(compare(baseline, report)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import asyncio
+from typing import Any, List
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from .common import measure_async, Result
+
+
+def _subscribed_client(subscriptions: int, **config: Any) -> FastMQTT:
+    """Client with exact, single and multi level wildcard subscriptions, one handler each."""
+    fast_mqtt = FastMQTT(config=MQTTConfig(**config))
+
+    async def _handler(client: Any, topic: str, payload: bytes, qos: int, properties: Any):
+        pass
+
+    for index in range(subscriptions):
+        kind = index % 3
+        if kind == 0:
+            topic_filter = f"devices/{index}/state"
+        elif kind == 1:
+            topic_filter = f"devices/{index}/+/temperature"
+        else:
+            topic_filter = f"sites/{index}/#"
+        fast_mqtt.subscribe(topic_filter)(_handler)
+    return fast_mqtt
+
+
+def run(quick: bool = False) -> List[Result]:
+    return asyncio.run(_run(quick))
+
+
+async def _run(quick: bool) -> List[Result]:
+    sizes = (10, 1_000, 10_000) if quick else (10, 1_000, 10_000, 100_000)
+    messages = 2_000 if quick else 20_000
+    results = []
+    for subscriptions in sizes:
+        fast_mqtt = _subscribed_client(subscriptions)
+        # index of the i-th subscription of a kind, see `_subscribed_client`
+        per_kind = max(subscriptions // 3, 1)
+
+        def _index(i: int, kind: int, per_kind: int = per_kind) -> int:
+            return 3 * (i % per_kind) + kind
+
+        # every message matches a subscription, hot topics stay in the topic cache
+        hot_topics = [f"devices/{_index(i, 0)}/state" for i in range(64)] + [
+            f"devices/{_index(i, 1)}/kitchen/temperature" for i in range(64)
+        ]
+        unique_topics = [f"sites/{_index(i, 2)}/{i}" for i in range(messages)]
+
+        async def _hot(fast_mqtt: FastMQTT = fast_mqtt, topics: List[str] = hot_topics) -> None:
+            on_message = fast_mqtt._FastMQTT__on_message
+            for i in range(messages):
+                await on_message(fast_mqtt.client, topics[i % len(topics)], b"", 0, {})
+
+        async def _unique(
+            fast_mqtt: FastMQTT = fast_mqtt, topics: List[str] = unique_topics
+        ) -> None:
+            on_message = fast_mqtt._FastMQTT__on_message
+            for topic in topics:
+                await on_message(fast_mqtt.client, topic, b"", 0, {})
+
+        results.append(
+            await measure_async("dispatch_hot_topics", messages, _hot, subscriptions=subscriptions)
+        )
+        results.append(
+            await measure_async(
+                "dispatch_unique_topics", messages, _unique, subscriptions=subscriptions
+            )
+        )
+        fast_mqtt.mqtt_handlers.shutdown()
+    return results
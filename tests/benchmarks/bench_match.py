@@ -0,0 +1,40 @@
+from typing import List
+
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.topics import TopicTrie
+
+from .common import measure, Result
+
+CASES = [
+    ("sport/tennis/player1", "sport/tennis/player1/#"),
+    ("sport/tennis/player1/ranking", "sport/tennis/+/ranking"),
+    ("sport/tennis/player1/score/wimbledon", "sport/#"),
+    ("sport/tennis/player1", "sport/+/player2"),
+    ("$SYS/broker/uptime", "#"),
+    ("devices/42/sensors/temperature", "$share/group/devices/+/sensors/#"),
+]
+
+
+def run(quick: bool = False) -> List[Result]:
+    loops = 2_000 if quick else 20_000
+    operations = loops * len(CASES)
+
+    def _match() -> None:
+        match = FastMQTT.match
+        for _ in range(loops):
+            for topic, topic_filter in CASES:
+                match(topic, topic_filter)
+
+    trie = TopicTrie()
+    for _, topic_filter in CASES:
+        trie.add(topic_filter)
+
+    def _trie_match() -> None:
+        for _ in range(loops):
+            for topic, _ in CASES:
+                trie.match(topic)
+
+    return [
+        measure("match", operations, _match),
+        measure("trie_match", operations, _trie_match, filters=len(CASES)),
+    ]
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Any, List
+
+from gmqtt import Message
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from ..broker import Broker
+from .common import measure_async, Result
+
+
+async def _wait_received(broker: Broker, expected: int) -> None:
+    while broker.received < expected:  # noqa: ASYNC110
+        await asyncio.sleep(0.001)
+
+
+async def _connected_client(broker: Broker, **config: Any) -> FastMQTT:
+    fast_mqtt = FastMQTT(config=MQTTConfig(host=broker.host, port=broker.port, **config))
+    await fast_mqtt.mqtt_startup()
+    return fast_mqtt
+
+
+def run(quick: bool = False) -> List[Result]:
+    return asyncio.run(_run(quick))
+
+
+async def _run(quick: bool) -> List[Result]:
+    messages = 2_000 if quick else 20_000
+    payload = b"x" * 64
+    results = []
+    async with Broker() as broker:
+        for publish_queue in (False, True):
+            fast_mqtt = await _connected_client(broker, publish_queue=publish_queue)
+
+            async def _publish(fast_mqtt: FastMQTT = fast_mqtt) -> None:
+                expected = broker.received + messages
+                for i in range(messages):
+                    fast_mqtt.publish(f"bench/{i % 100}", payload)
+                await _wait_received(broker, expected)
+
+            async def _publish_many(fast_mqtt: FastMQTT = fast_mqtt) -> None:
+                expected = broker.received + messages
+                fast_mqtt.publish_many(
+                    Message(f"bench/{i % 100}", payload) for i in range(messages)
+                )
+                await _wait_received(broker, expected)
+
+            results.append(
+                await measure_async("publish", messages, _publish, publish_queue=publish_queue)
+            )
+            results.append(
+                await measure_async(
+                    "publish_many", messages, _publish_many, publish_queue=publish_queue
+                )
+            )
+            await fast_mqtt.mqtt_shutdown()
+
+        fast_mqtt = await _connected_client(broker)
+
+        async def _publish_async() -> None:
+            await asyncio.gather(
+                *(fast_mqtt.publish_async(f"bench/{i % 100}", payload) for i in range(messages))
+            )
+
+        results.append(
+            await measure_async(
+                "publish_async_qos1",
+                messages,
+                _publish_async,
+                inflight_window=fast_mqtt.config.publish_inflight_window,
+            )
+        )
+        await fast_mqtt.mqtt_shutdown()
+    return results
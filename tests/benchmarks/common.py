@@ -0,0 +1,42 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+Result = Dict[str, Any]
+
+
+def _result(name: str, operations: int, seconds: float, params: Dict[str, Any]) -> Result:
+    return {
+        "name": name,
+        "params": params,
+        "operations": operations,
+        "seconds": seconds,
+        "ops_per_second": operations / seconds if seconds else float("inf"),
+    }
+
+
+def measure(
+    name: str, operations: int, func: Callable[[], Any], repeat: int = 3, **params: Any
+) -> Result:
+    """Time `func`, which runs `operations` operations, keeping the best of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return _result(name, operations, best, params)
+
+
+async def measure_async(
+    name: str,
+    operations: int,
+    func: Callable[[], Awaitable[Any]],
+    repeat: int = 3,
+    **params: Any,
+) -> Result:
+    """Same as `measure` for a coroutine function."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - start)
+    return _result(name, operations, best, params)
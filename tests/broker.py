@@ -0,0 +1,350 @@
+"""
+Minimal in-process MQTT broker, a stand-in for a real broker in tests and benchmarks.
+
+It speaks enough MQTT 3.1.1 and 5.0 for gmqtt clients: CONNECT, SUBSCRIBE, UNSUBSCRIBE,
+PUBLISH (QoS 0, 1 and 2 from clients), PINGREQ and DISCONNECT.
+Messages are routed with `fastapi_mqtt.topics.match_topic` and delivered at QoS 0 with the
+properties of the publisher plus the identifiers of the matching subscriptions.
+`no_local` is honored and `$share/<group>/` subscriptions deliver each message to one member
+of the group. Sessions and retained messages are not kept.
+"""
+
+import asyncio
+import itertools
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from fastapi_mqtt.topics import match_topic, SHARED_SUBSCRIPTION_PREFIX
+
+CONNECT = 0x10
+PUBLISH = 0x30
+PUBACK = 0x40
+PUBREC = 0x50
+PUBREL = 0x60
+PUBCOMP = 0x70
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+UNSUBSCRIBE = 0xA0
+UNSUBACK = 0xB0
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+SUBSCRIPTION_IDENTIFIER = 0x0B
+MAXIMUM_PACKET_SIZE = 0x27
+MQTTv50 = 5
+
+
+def encode_varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        value, digit = divmod(value, 128)
+        encoded.append(digit | (0x80 if value else 0))
+        if not value:
+            return bytes(encoded)
+
+
+def decode_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Return the decoded integer and the offset after it."""
+    value = multiplier = 0
+    while True:
+        digit = data[offset]
+        offset += 1
+        value += (digit & 0x7F) << (7 * multiplier)
+        multiplier += 1
+        if not digit & 0x80:
+            return value, offset
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def decode_string(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = struct.unpack_from("!H", data, offset)
+    offset += 2
+    return data[offset : offset + length].decode(), offset + length
+
+
+def packet(first_byte: int, body: bytes) -> bytes:
+    return bytes((first_byte,)) + encode_varint(len(body)) + body
+
+
+def _subscription_identifiers(properties: bytes) -> List[int]:
+    """Return the subscription identifiers found in a SUBSCRIBE properties block."""
+    identifiers = []
+    offset = 0
+    while offset < len(properties):
+        identifier = properties[offset]
+        offset += 1
+        if identifier == SUBSCRIPTION_IDENTIFIER:
+            value, offset = decode_varint(properties, offset)
+            identifiers.append(value)
+        else:  # pragma: no cover - gmqtt only sends subscription identifiers
+            break
+    return identifiers
+
+
+class _Subscription:
+    __slots__ = ("group", "identifier", "no_local", "session", "topic_filter")
+
+    def __init__(
+        self,
+        session: "_Session",
+        topic_filter: str,
+        no_local: bool,
+        identifier: Optional[int],
+    ) -> None:
+        self.session = session
+        self.group: Optional[str] = None
+        if topic_filter.startswith(SHARED_SUBSCRIPTION_PREFIX):
+            _, self.group, topic_filter = topic_filter.split("/", 2)
+        self.topic_filter = topic_filter
+        self.no_local = no_local
+        self.identifier = identifier
+
+
+class _Session:
+    def __init__(
+        self, broker: "Broker", reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.version = MQTTv50
+        self.client_id = ""
+
+    async def read_packet(self) -> Tuple[int, bytes]:
+        header = await self.reader.readexactly(1)
+        length = multiplier = 0
+        while True:
+            digit = (await self.reader.readexactly(1))[0]
+            length += (digit & 0x7F) << (7 * multiplier)
+            multiplier += 1
+            if not digit & 0x80:
+                break
+        return header[0], await self.reader.readexactly(length)
+
+    def send(self, data: bytes) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def properties(self, data: bytes, offset: int) -> Tuple[bytes, int]:
+        """Return the properties block at offset (empty for MQTT 3.1.1) and the offset after it."""
+        if self.version != MQTTv50:
+            return b"", offset
+        length, offset = decode_varint(data, offset)
+        return data[offset : offset + length], offset + length
+
+    async def run(self) -> None:
+        try:
+            while True:
+                first_byte, body = await self.read_packet()
+                if not self.handle(first_byte, body):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.broker.disconnected(self)
+            self.writer.close()
+
+    def handle(self, first_byte: int, body: bytes) -> bool:  # noqa: C901
+        """Handle a packet from the client, returns False to close the connection."""
+        kind = first_byte & 0xF0
+        if kind == CONNECT:
+            _, offset = decode_string(body, 0)
+            self.version = body[offset]
+            offset += 4  # version, flags and keep alive
+            _, offset = self.properties(body, offset)
+            self.client_id, _ = decode_string(body, offset)
+            self.send(packet(0x20, self.broker.connack_body(self.version)))
+        elif kind == PUBLISH:
+            qos = (first_byte >> 1) & 0x03
+            topic, offset = decode_string(body, 0)
+            packet_id = body[offset : offset + 2]
+            if qos:
+                offset += 2
+            properties, offset = self.properties(body, offset)
+            self.broker.route(self, topic, properties, body[offset:])
+            if qos == 1:
+                self.send(packet(PUBACK, packet_id))
+            elif qos == 2:
+                self.send(packet(PUBREC, packet_id))
+        elif kind == PUBREL:
+            self.send(packet(PUBCOMP, body[:2]))
+        elif kind == SUBSCRIBE:
+            self.broker.subscribe_packets += 1
+            packet_id = body[:2]
+            properties, offset = self.properties(body, 2)
+            identifiers = _subscription_identifiers(properties)
+            identifier = identifiers[0] if identifiers else None
+            reason_codes = bytearray()
+            while offset < len(body):
+                topic_filter, offset = decode_string(body, offset)
+                options = body[offset]
+                offset += 1
+                self.broker.subscribe(
+                    _Subscription(self, topic_filter, bool(options & 0x04), identifier)
+                )
+                reason_codes.append(options & 0x03)
+            no_properties = b"\x00" if self.version == MQTTv50 else b""
+            self.send(packet(SUBACK, packet_id + no_properties + bytes(reason_codes)))
+        elif kind == UNSUBSCRIBE:
+            packet_id = body[:2]
+            _, offset = self.properties(body, 2)
+            topic_filters = []
+            while offset < len(body):
+                topic_filter, offset = decode_string(body, offset)
+                topic_filters.append(topic_filter)
+            self.broker.unsubscribe(self, topic_filters)
+            if self.version == MQTTv50:
+                self.send(packet(UNSUBACK, packet_id + b"\x00" + bytes(len(topic_filters))))
+            else:
+                self.send(packet(UNSUBACK, packet_id))
+        elif kind == PINGREQ:
+            self.send(packet(PINGRESP, b""))
+        elif kind == DISCONNECT:
+            return False
+        return True
+
+    def deliver(
+        self, topic: str, properties: bytes, payload: bytes, identifiers: List[int]
+    ) -> None:
+        """Send a message with the properties of the publisher and the subscription identifiers."""
+        if self.version == MQTTv50:
+            encoded = properties + b"".join(
+                bytes((SUBSCRIPTION_IDENTIFIER,)) + encode_varint(identifier)
+                for identifier in identifiers
+            )
+            properties = encode_varint(len(encoded)) + encoded
+        else:
+            properties = b""
+        self.send(packet(PUBLISH, encode_string(topic) + properties + payload))
+
+
+class Broker:
+    """
+    In-process MQTT broker listening on localhost.
+
+    port: TCP port to listen on, 0 picks a free one (read it from `port` once started)
+    maximum_packet_size: Announced to MQTT5.0 clients in CONNACK when given
+
+    `received` and `delivered` count PUBLISH packets from and to clients,
+    `subscribe_packets` counts SUBSCRIBE packets.
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, maximum_packet_size: Optional[int] = None
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.received = 0
+        self.delivered = 0
+        self.subscribe_packets = 0
+        self.maximum_packet_size = maximum_packet_size
+        self.sessions: List[_Session] = []
+        self._subscriptions: List[_Subscription] = []
+        self._groups: Dict[Tuple[str, str], itertools.count] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def connack_body(self, version: int) -> bytes:
+        """Session present flag, success reason code and MQTT5.0 properties."""
+        if version != MQTTv50:
+            return b"\x00\x00"
+        properties = b""
+        if self.maximum_packet_size is not None:
+            properties = struct.pack("!BL", MAXIMUM_PACKET_SIZE, self.maximum_packet_size)
+        return b"\x00\x00" + encode_varint(len(properties)) + properties
+
+    async def start(self) -> "Broker":
+        self._server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for session in self.sessions:
+            session.writer.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self) -> "Broker":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = _Session(self, reader, writer)
+        self.sessions.append(session)
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.append(task)
+        await session.run()
+
+    def disconnected(self, session: _Session) -> None:
+        if session in self.sessions:
+            self.sessions.remove(session)
+        self._subscriptions = [s for s in self._subscriptions if s.session is not session]
+
+    def subscribe(self, subscription: _Subscription) -> None:
+        self._subscriptions = [
+            s
+            for s in self._subscriptions
+            if not (
+                s.session is subscription.session
+                and s.topic_filter == subscription.topic_filter
+                and s.group == subscription.group
+            )
+        ]
+        self._subscriptions.append(subscription)
+
+    def unsubscribe(self, session: _Session, topic_filters: List[str]) -> None:
+        removed = set(topic_filters)
+        self._subscriptions = [
+            s
+            for s in self._subscriptions
+            if not (
+                s.session is session
+                and (
+                    s.topic_filter in removed
+                    or f"{SHARED_SUBSCRIPTION_PREFIX}{s.group}/{s.topic_filter}" in removed
+                )
+            )
+        ]
+
+    def route(self, sender: _Session, topic: str, properties: bytes, payload: bytes) -> None:
+        """Deliver a published message to every matching subscription."""
+        self.received += 1
+        identifiers: Dict[_Session, List[int]] = {}
+        groups: Dict[Tuple[str, str], List[_Subscription]] = {}
+        for subscription in self._subscriptions:
+            if not match_topic(topic, subscription.topic_filter):
+                continue
+            if subscription.group is not None:
+                key = (subscription.group, subscription.topic_filter)
+                groups.setdefault(key, []).append(subscription)
+                continue
+            if subscription.no_local and subscription.session is sender:
+                continue
+            session_identifiers = identifiers.setdefault(subscription.session, [])
+            if subscription.identifier is not None:
+                session_identifiers.append(subscription.identifier)
+
+        for key, members in groups.items():
+            turn = next(self._groups.setdefault(key, itertools.count()))
+            subscription = members[turn % len(members)]
+            session_identifiers = identifiers.setdefault(subscription.session, [])
+            if subscription.identifier is not None:
+                session_identifiers.append(subscription.identifier)
+
+        for session, session_identifiers in identifiers.items():
+            session.deliver(topic, properties, payload, session_identifiers)
+            self.delivered += 1
@@ -2,7 +2,7 @@ import logging
 import os
 from collections import defaultdict
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import Any, Awaitable, Callable
 
 import pytest
 import pytest_asyncio
@@ -20,6 +20,27 @@ TEST_BROKER_HOST = os.getenv("TEST_BROKER_HOST", default="test.mosquitto.org")
 TEST_BROKER_USER = "testuser" if TEST_BROKER_HOST != "test.mosquitto.org" else None
 TEST_BROKER_PWD = "secret" if TEST_BROKER_HOST != "test.mosquitto.org" else None
 
+# deliver(fast_mqtt, topic, payload=b"", qos=0, properties=None), see `deliver()`
+Deliver = Callable[..., Awaitable[Any]]
+
+
+@pytest.fixture
+def deliver() -> Deliver:
+    """Fixture handling a message as if received by the client, returns the handler results."""
+
+    async def _deliver(
+        fast_mqtt: FastMQTT,
+        topic: str,
+        payload: bytes = b"",
+        qos: int = 0,
+        properties: Any = None,
+    ) -> Any:
+        return await fast_mqtt._FastMQTT__on_message(
+            fast_mqtt.client, topic, payload, qos, {} if properties is None else properties
+        )
+
+    return _deliver
+
 
 @pytest.fixture
 def test_app():  # noqa: C901
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, List
+
+from fastapi_mqtt import FastMQTT, MQTTConfig, MQTTMessage
+
+from .conftest import Deliver
+
+
+async def test_batch_flushed_by_size_and_latency(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    batches: List[List[MQTTMessage]] = []
+
+    @fast_mqtt.subscribe_batch("telemetry/#", max_size=3, max_latency=0.05)
+    async def _insert_rows(client: Any, messages: List[MQTTMessage]):
+        batches.append(messages)
+
+    for number in range(4):
+        await deliver(fast_mqtt, f"telemetry/{number}", str(number).encode())
+    assert [[m.payload for m in batch] for batch in batches] == [[b"0", b"1", b"2"]]
+    assert batches[0][0] == MQTTMessage("telemetry/0", b"0", 0, {})
+
+    await asyncio.sleep(0.1)
+    assert [[m.payload for m in batch] for batch in batches][1:] == [[b"3"]]
+
+
+async def test_batch_flushed_on_shutdown(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    batches: List[List[str]] = []
+
+    @fast_mqtt.subscribe_batch("telemetry/#", max_size=10, max_latency=60)
+    def _insert_rows(client: Any, messages: List[MQTTMessage]):
+        batches.append([message.topic for message in messages])
+
+    await deliver(fast_mqtt, "telemetry/a", b"")
+    await deliver(fast_mqtt, "telemetry/b", b"")
+    assert batches == []
+
+    await fast_mqtt.mqtt_shutdown()
+    assert batches == [["telemetry/a", "telemetry/b"]]
+
+
+async def test_hung_batch_handler_cancelled_and_flushes_limited(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(handler_timeout=0.05))
+    batches: List[List[bytes]] = []
+    running: List[int] = [0, 0]  # current and highest number of running handlers
+
+    @fast_mqtt.subscribe_batch("telemetry/#", max_size=1, max_latency=60)
+    async def _insert_rows(client: Any, messages: List[MQTTMessage]):
+        running[0] += 1
+        running[1] = max(running)
+        try:
+            if messages[0].payload == b"hung":
+                await asyncio.sleep(60)
+            batches.append([message.payload for message in messages])
+        finally:
+            running[0] -= 1
+
+    results = await asyncio.gather(
+        *(deliver(fast_mqtt, "telemetry/a", payload) for payload in (b"hung", b"1", b"2"))
+    )
+
+    # the hung batch was cancelled by the timeout, one batch was handled at a time
+    assert results == [[None]] * 3
+    assert batches == [[b"1"], [b"2"]]
+    assert fast_mqtt.watchdog.timeouts == 1
+    assert running == [0, 1]
@@ -0,0 +1,103 @@
+import logging
+from typing import Any, Dict, List
+
+import pytest
+from pydantic import BaseModel
+
+from fastapi_mqtt import FastMQTT, MQTTConfig
+from fastapi_mqtt.codecs import get_codec, JSONCodec, PayloadDecoders
+
+from .conftest import Deliver
+
+
+class Humidity(BaseModel):
+    sensor: str
+    value: float
+
+
+async def test_typed_payloads_decoded_once(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(payload_codec="json"))
+    received: Dict[str, Any] = {}
+    decoded: List[bytes] = []
+
+    class _CountingCodec(JSONCodec):
+        def loads(self, data: bytes) -> Any:
+            decoded.append(data)
+            return super().loads(data)
+
+    fast_mqtt.payload_decoders.codec = _CountingCodec()
+
+    @fast_mqtt.subscribe("mqtt/+/humidity")
+    async def _model(client: Any, topic: str, payload: Humidity, qos: int, properties: Any):
+        received["model"] = payload
+
+    @fast_mqtt.subscribe("mqtt/+/humidity")
+    async def _dict(client: Any, topic: str, payload: dict, qos: int, properties: Any):
+        received["dict"] = payload
+
+    @fast_mqtt.subscribe("mqtt/#")
+    def _dict_again(client: Any, topic: str, payload: dict, qos: int, properties: Any):
+        received["dict_again"] = payload
+
+    @fast_mqtt.subscribe("mqtt/#")
+    async def _text(client: Any, topic: str, payload: str, qos: int, properties: Any):
+        received["str"] = payload
+
+    @fast_mqtt.subscribe("mqtt/#")
+    async def _raw(client, topic, payload, qos, properties):
+        received["raw"] = payload
+
+    data = b'{"sensor": "kitchen", "value": 0.5}'
+    await deliver(fast_mqtt, "mqtt/kitchen/humidity", data)
+
+    assert received["model"] == Humidity(sensor="kitchen", value=0.5)
+    assert received["dict"] == {"sensor": "kitchen", "value": 0.5}
+    assert received["dict_again"] is received["dict"]
+    assert received["str"] == data.decode()
+    assert received["raw"] is data
+    assert decoded == [data]
+    fast_mqtt.mqtt_handlers.shutdown()
+
+
+async def test_payload_delivered_again_decoded_again(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    received: List[Dict[str, Any]] = []
+
+    @fast_mqtt.subscribe("orders/+")
+    async def _order(client: Any, topic: str, payload: dict, qos: int, properties: Any):
+        payload["seen"] = True
+        received.append(payload)
+
+    # the same bytes object, as published twice locally
+    data = b'{"id": 1}'
+    await deliver(fast_mqtt, "orders/1", data)
+    await deliver(fast_mqtt, "orders/1", data)
+
+    assert received == [{"id": 1, "seen": True}] * 2
+    assert received[0] is not received[1]
+
+
+async def test_invalid_payload_skips_handler(caplog: pytest.LogCaptureFixture, deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    received: List[Any] = []
+
+    @fast_mqtt.subscribe("mqtt/+/humidity")
+    async def _model(client: Any, topic: str, payload: Humidity, qos: int, properties: Any):
+        received.append(payload)
+
+    @fast_mqtt.subscribe("mqtt/+/humidity")
+    async def _raw(client: Any, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(payload)
+
+    with caplog.at_level(logging.WARNING):
+        await deliver(fast_mqtt, "mqtt/kitchen/humidity", b"not json")
+    assert received == [b"not json"]
+    assert "Cannot decode payload of mqtt/kitchen/humidity" in caplog.text
+
+
+def test_decoders_shared_per_type():
+    decoders = PayloadDecoders(get_codec("json"), logging.getLogger(__name__))
+    assert decoders.for_type(bytes) is None
+    assert decoders.for_type(Humidity) is decoders.for_type(Humidity)
+    assert decoders.for_type(List[int])(b"[1, 2]") == [1, 2]
+    assert type(get_codec("auto")).__name__ in {"OrjsonCodec", "MsgspecCodec", "JSONCodec"}
@@ -0,0 +1,158 @@
+import asyncio
+import socket
+from typing import Any, List
+
+import pytest
+from fastapi import HTTPException
+from gmqtt import Client as MQTTClient
+from gmqtt import MQTTConnectError, Subscription
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.connection import BackoffConfig, batch_subscriptions
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from .broker import Broker
+from .test_local_broker import _wait_for
+
+
+def test_batch_subscriptions():
+    subscriptions = [Subscription(f"devices/{index}/state") for index in range(5)]
+    subscriptions += [Subscription("alerts/#", subscription_identifier=7)]
+    # each filter takes 2 + 15 + 1 bytes on top of 13 bytes of packet overhead
+    batches = batch_subscriptions(subscriptions, max_packet_size=13 + 18 * 2)
+
+    assert [(identifier, len(batch)) for identifier, batch in batches] == [
+        (None, 2),
+        (None, 2),
+        (None, 1),
+        (7, 1),
+    ]
+    assert [s for _, batch in batches for s in batch] == subscriptions
+
+    batches = batch_subscriptions(subscriptions, max_packet_size=4096, max_filters=3)
+    assert [len(batch) for _, batch in batches] == [3, 2, 1]
+
+
+def test_reconnect_backoff_with_jitter():
+    failed_attempts = 0
+    # opt-in, the default delay stays constant
+    mqtt_config = MQTTConfig()
+    config = BackoffConfig(
+        {"reconnect_delay": 6},
+        lambda: failed_attempts,
+        delay_max=mqtt_config.reconnect_delay_max,
+        jitter=mqtt_config.reconnect_jitter,
+    )
+    assert [config.reconnect_delay(6, attempt) for attempt in range(3)] == [6, 6, 6]
+
+    config = BackoffConfig(
+        {"reconnect_delay": 6, "reconnect_retries": 3},
+        lambda: failed_attempts,
+        delay_max=60,
+    )
+    delays = []
+    for failed_attempts in range(6):  # noqa: B007
+        delays.append(config["reconnect_delay"])
+    assert delays == [6, 12, 24, 48, 60, 60]
+    assert config["reconnect_retries"] == 3
+
+    config.jitter = 0.5
+    failed_attempts = 1
+    jittered = {config["reconnect_delay"] for _ in range(50)}
+    assert all(6 <= delay <= 12 for delay in jittered)
+    assert len(jittered) > 1
+
+
+async def test_subscriptions_sent_in_batches_through_local_broker():
+    async with Broker(maximum_packet_size=1024) as broker:
+        fast_mqtt = FastMQTT(
+            config=MQTTConfig(
+                host=broker.host,
+                port=broker.port,
+                subscribe_max_filters=40,
+            )
+        )
+        received: List[str] = []
+
+        async def _handler(client: MQTTClient, topic: str, payload: bytes, qos: int, props: Any):
+            received.append(topic)
+
+        for index in range(100):
+            fast_mqtt.subscribe(f"devices/{index}/state")(_handler)
+
+        await fast_mqtt.mqtt_startup()
+        for _ in range(100):
+            if len(broker._subscriptions) == 100:
+                break
+            await asyncio.sleep(0.01)
+        fast_mqtt.publish("devices/99/state", "on")
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        await fast_mqtt.mqtt_shutdown()
+
+    # 40 filters per packet
+    assert broker.subscribe_packets == 3
+    assert received == ["devices/99/state"]
+    assert len(fast_mqtt.client.subscriptions) == 100
+
+
+async def test_background_connect_waits_for_the_broker():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(host="127.0.0.1", port=port, background_connect=True, reconnect_delay=0)
+    )
+    received: List[bytes] = []
+
+    @fast_mqtt.subscribe("jobs/#")
+    async def _jobs(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(payload)
+
+    # returns while the broker is still down, publishing is buffered
+    await fast_mqtt.mqtt_startup()
+    fast_mqtt.publish("jobs/1", "early")
+    assert not fast_mqtt.ready.is_set()
+    with pytest.raises(HTTPException) as raised:
+        await fast_mqtt.readiness()
+    assert raised.value.status_code == 503
+
+    async with Broker(port=port):
+        await asyncio.wait_for(fast_mqtt.ready.wait(), 2)
+        # ready waits for the SUBACK, not only the CONNACK
+        assert fast_mqtt.health.subscriptions_pending == 0
+        await fast_mqtt.readiness()
+        await _wait_for(lambda: received)
+        await fast_mqtt.mqtt_shutdown()
+
+    assert received == [b"early"]
+
+
+async def test_background_connect_retries(monkeypatch: pytest.MonkeyPatch):
+    fast_mqtt = FastMQTT(config=MQTTConfig(connections=2, reconnect_delay=None))
+    attempts: List[MQTTClient] = []
+    delays: List[float] = []
+
+    async def _connect(client: MQTTClient) -> None:
+        attempts.append(client)
+        if client is fast_mqtt.client:
+            # refused in the CONNACK, gmqtt reconnects this one itself
+            client._connection = object()
+            raise MQTTConnectError(135)
+        raise ConnectionRefusedError
+
+    async def _sleep(delay: float) -> None:
+        delays.append(delay)
+        if len(delays) == 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(fast_mqtt, "_FastMQTT__connect_client", _connect)
+    monkeypatch.setattr(asyncio, "sleep", _sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await fast_mqtt._connect_in_background()
+
+    # without reconnect_delay, gmqtt's default delay instead of a busy loop
+    assert delays == [6, 6]
+    assert attempts == [fast_mqtt.clients[0], fast_mqtt.clients[1], fast_mqtt.clients[1]]
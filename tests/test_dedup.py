@@ -0,0 +1,70 @@
+from typing import Any, List
+
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.dedup import DedupWindow
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+_DUP = {"dup": 1}
+
+
+def test_dedup_window_expiry_and_size():
+    clock = _Clock()
+    window = DedupWindow(ttl=10, maxsize=2, clock=clock)
+
+    assert not window.is_duplicate("a", b"1", {})
+    assert window.is_duplicate("a", b"1", _DUP)
+    assert not window.is_duplicate("a", b"2", {})
+    assert not window.is_duplicate("b", b"1", {})
+    # the oldest fingerprint was evicted to keep two entries
+    assert len(window) == 2
+    assert not window.is_duplicate("a", b"1", _DUP)
+
+    clock.now = 10
+    assert len(window) == 2
+    assert not window.is_duplicate("b", b"1", _DUP)
+    assert len(window) == 1
+    assert window.suppressed == 1
+
+
+def test_dedup_window_repeated_payload_without_dup_flag():
+    window = DedupWindow(ttl=10)
+    assert not window.is_duplicate("a", b"on", {"dup": 0})
+    # published again by the application, not a redelivery
+    assert not window.is_duplicate("a", b"on", {"dup": 0})
+    assert window.is_duplicate("a", b"on", _DUP)
+
+
+def test_dedup_window_custom_key():
+    window = DedupWindow(ttl=10, key=lambda topic, payload, properties: properties["id"])
+    assert not window.is_duplicate("a", b"1", {"id": 1})
+    assert window.is_duplicate("b", b"2", {"id": 1})
+    assert not window.is_duplicate("a", b"1", {"id": 2})
+
+
+async def test_duplicate_qos1_messages_dropped_before_dispatch():
+    fast_mqtt = FastMQTT(config=MQTTConfig(dedup_window=60, metrics=True))
+    received: List[Any] = []
+
+    @fast_mqtt.subscribe("orders/#")
+    async def _orders(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append((topic, payload, qos))
+
+    on_message = fast_mqtt._FastMQTT__on_message
+    for qos in (1, 1, 0, 0, 2):
+        await on_message(fast_mqtt.client, "orders/1", b"paid", qos, _DUP)
+
+    # QoS 0 messages may legitimately repeat and QoS 2 is already delivered exactly once
+    assert received == [("orders/1", b"paid", qos) for qos in (1, 0, 0, 2)]
+    assert fast_mqtt.dedup.suppressed == 1
+    assert "fastapi_mqtt_duplicates_suppressed_total 1" in fast_mqtt.metrics.render()
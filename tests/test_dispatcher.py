@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.dispatcher import Dispatcher, topic_level
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from .broker import Broker
+
+_logger = logging.getLogger(__name__)
+
+
+async def _blocked_dispatcher(
+    overflow, handled: List[int], release: asyncio.Event, **kwargs: Any
+) -> Dispatcher:
+    async def _handler(value: int):
+        await release.wait()
+        handled.append(value)
+
+    dispatcher = Dispatcher(_handler, _logger, workers=1, queue_size=2, overflow=overflow, **kwargs)
+    dispatcher.start()
+    # first item is taken by the worker, the next two fill the queue
+    assert await dispatcher.submit(0)
+    await asyncio.sleep(0)
+    assert await dispatcher.submit(1)
+    assert await dispatcher.submit(2)
+    return dispatcher
+
+
+@pytest.mark.parametrize(
+    argnames=["overflow", "queued", "expected"],
+    argvalues=[
+        ("drop_newest", False, [0, 1, 2]),
+        ("drop_oldest", True, [0, 2, 3]),
+    ],
+)
+async def test_dispatcher_overflow(overflow, queued: bool, expected: List[int]):
+    handled: List[int] = []
+    release = asyncio.Event()
+    dispatcher = await _blocked_dispatcher(overflow, handled, release)
+
+    assert dispatcher.queue_depth == 2
+    assert await dispatcher.submit(3) is queued
+    assert dispatcher.dropped == 1
+    assert dispatcher.queue_depth == 2
+
+    release.set()
+    await dispatcher.stop()
+    assert handled == expected
+    assert not dispatcher.running
+
+
+async def test_dispatcher_block():
+    handled: List[int] = []
+    release = asyncio.Event()
+    paused: List[bool] = []
+    dispatcher = await _blocked_dispatcher("block", handled, release, on_backpressure=paused.append)
+
+    # the full queue pauses the reads, messages already read are still queued
+    assert paused == [True]
+    assert await dispatcher.submit(3)
+    assert dispatcher.queue_depth == 3
+
+    release.set()
+    await dispatcher.stop()
+    assert handled == [0, 1, 2, 3]
+    assert paused == [True, False]
+    assert dispatcher.dropped == 0
+
+
+async def test_fastmqtt_dispatch_workers():
+    fast_mqtt = FastMQTT(config=MQTTConfig(dispatch_workers=2, dispatch_queue_size=10))
+    running: List[int] = []
+    max_running = 0
+
+    @fast_mqtt.subscribe("jobs/+")
+    async def _job(client: Any, topic: str, payload: bytes, qos: int, properties: Any):
+        nonlocal max_running
+        running.append(1)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    assert fast_mqtt.dispatcher is not None
+    fast_mqtt.dispatcher.start()
+    for number in range(6):
+        await fast_mqtt._FastMQTT__on_message(fast_mqtt.client, f"jobs/{number}", b"", 0, {})
+    assert fast_mqtt.dispatcher.queue_depth == 6
+
+    await fast_mqtt.dispatcher.stop()
+    assert max_running == 2
+
+
+class _Transport:
+    def __init__(self) -> None:
+        self.reading = True
+
+    def is_closing(self) -> bool:
+        return False
+
+    def pause_reading(self) -> None:
+        self.reading = False
+
+    def resume_reading(self) -> None:
+        self.reading = True
+
+
+async def test_fastmqtt_dispatch_backpressure_pauses_reading():
+    fast_mqtt = FastMQTT(config=MQTTConfig(dispatch_workers=1, dispatch_queue_size=4))
+    transport = _Transport()
+    fast_mqtt.client._connection = SimpleNamespace(_transport=transport)
+    release = asyncio.Event()
+
+    @fast_mqtt.subscribe("jobs/+")
+    async def _job(client: Any, topic: str, payload: bytes, qos: int, properties: Any):
+        await release.wait()
+
+    assert fast_mqtt.dispatcher is not None
+    fast_mqtt.dispatcher.start()
+    for number in range(5):
+        await fast_mqtt._FastMQTT__on_message(fast_mqtt.client, f"jobs/{number}", b"", 0, {})
+    assert not transport.reading
+
+    release.set()
+    await fast_mqtt.dispatcher.stop()
+    assert transport.reading
+
+
+def test_topic_level():
+    assert topic_level(1)("devices/42/state") == "42"
+    assert topic_level(-1)("devices/42/state") == "state"
+    assert topic_level(5)("devices/42/state") == "devices/42/state"
+
+
+async def test_ordered_subscription():
+    fast_mqtt = FastMQTT(config=MQTTConfig(ordered_lanes=4))
+    handled: List[str] = []
+    running = set()
+    concurrent_devices = set()
+
+    @fast_mqtt.subscribe("devices/+/state", ordering_key=topic_level(1))
+    async def _state(client: Any, topic: str, payload: bytes, qos: int, properties: Any):
+        device = topic_level(1)(topic)
+        assert device not in running
+        running.add(device)
+        concurrent_devices.update(running)
+        # later messages finish faster, so order is only kept by the lanes
+        await asyncio.sleep(0.01 / int(payload))
+        handled.append(f"{device}:{payload.decode()}")
+        running.discard(device)
+
+    assert fast_mqtt.ordered_dispatcher is not None
+    fast_mqtt.ordered_dispatcher.start()
+    messages = [
+        fast_mqtt._FastMQTT__on_message(fast_mqtt.client, f"devices/{device}/state", b, 0, {})
+        for b in (b"1", b"2", b"3")
+        for device in ("a", "b")
+    ]
+    await asyncio.gather(*messages)
+    await fast_mqtt.ordered_dispatcher.stop()
+
+    assert [entry for entry in handled if entry.startswith("a")] == ["a:1", "a:2", "a:3"]
+    assert [entry for entry in handled if entry.startswith("b")] == ["b:1", "b:2", "b:3"]
+    assert concurrent_devices == {"a", "b"}
+
+
+async def test_ordered_subscription_added_after_startup():
+    async with Broker() as broker:
+        fast_mqtt = FastMQTT(config=MQTTConfig(host=broker.host, port=broker.port))
+        await fast_mqtt.mqtt_startup()
+        handled: List[str] = []
+
+        @fast_mqtt.subscribe("devices/+/state", ordering_key=topic_level(1))
+        async def _state(client: Any, topic: str, payload: bytes, qos: int, properties: Any):
+            handled.append(topic)
+
+        assert fast_mqtt.ordered_dispatcher is not None
+        assert fast_mqtt.ordered_dispatcher.running
+        await fast_mqtt._FastMQTT__on_message(fast_mqtt.client, "devices/a/state", b"", 0, {})
+        await fast_mqtt.mqtt_shutdown()
+
+    assert handled == ["devices/a/state"]
+    assert not fast_mqtt.ordered_dispatcher.running
@@ -0,0 +1,92 @@
+from typing import Any, List
+
+from async_asgi_testclient import TestClient
+from fastapi import FastAPI
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.health import MQTTHealth
+
+from .broker import Broker
+from .test_local_broker import _wait_for
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_health_counters():
+    clock = _Clock()
+    fast_mqtt = FastMQTT(config=MQTTConfig(connections=2))
+    health = MQTTHealth(fast_mqtt.clients, fast_mqtt.subscriptions, clock=clock)
+
+    health.connected("a")
+    health.connected("b")
+    health.subscribing("a", 1, ["x", "y"])
+    health.subscribing("b", 1, ["x"])
+    assert (health.connected_all, health.subscriptions_pending) == (True, 3)
+    health.subscribed("a", 1, (0, 0x87))
+    assert not health.healthy
+    assert health.rejected_subscriptions == {"y"}
+
+    # pending SUBACKs of a lost connection are forgotten, the subscriptions are sent again
+    clock.now = 5
+    health.disconnected("b")
+    assert health.subscriptions_pending == 0
+    health.connected("b")
+    health.subscribing("a", 2, ["y"])
+    health.subscribed("a", 2, (1,))
+    clock.now = 7.5
+    health.message_received()
+    clock.now = 8
+
+    assert health.healthy
+    state = health.state()
+    assert (state["connects"], state["reconnects"], state["disconnects"]) == (3, 1, 1)
+    assert state["seconds_since_connect"] == 3
+    assert state["seconds_since_message"] == 0.5
+    assert state["connections"] == {"connected": 2, "total": 2}
+
+
+async def test_health_router_through_local_broker():
+    async with Broker() as broker:
+        fast_mqtt = FastMQTT(config=MQTTConfig(host=broker.host, port=broker.port))
+        subacks: List[int] = []
+
+        @fast_mqtt.subscribe("sensors/#")
+        async def _sensors(
+            client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
+        ):
+            pass
+
+        @fast_mqtt.on_subscribe()
+        def _subscribed(client: MQTTClient, mid: int, qos: Any, properties: Any):
+            subacks.append(mid)
+
+        app = FastAPI()
+        app.include_router(fast_mqtt.health.router())
+
+        async with TestClient(app) as client:
+            response = await client.get("/health")
+            assert response.status_code == 503
+            assert response.json()["seconds_since_connect"] is None
+
+            await fast_mqtt.mqtt_startup()
+            await _wait_for(lambda: fast_mqtt.health.healthy)
+            fast_mqtt.publish("sensors/1", "on")
+            await _wait_for(lambda: fast_mqtt.health.messages_received)
+            response = await client.get("/health")
+            await fast_mqtt.mqtt_shutdown()
+
+    assert response.status_code == 200
+    state = response.json()
+    assert state["subscriptions"] == {"total": 1, "pending": 0, "rejected": []}
+    assert state["messages_received"] == 1
+    # the user handler is still called
+    assert len(subacks) == 1
+    assert not fast_mqtt.health.connected_all
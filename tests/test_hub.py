@@ -0,0 +1,128 @@
+import asyncio
+from typing import Any, List
+
+from async_asgi_testclient import TestClient
+from fastapi import FastAPI
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt import FanoutHub, FastMQTT, MQTTConfig
+
+from .broker import Broker
+from .test_local_broker import _wait_for
+
+
+async def test_fan_out_serializes_once_per_message():
+    serialized: List[str] = []
+
+    def _serializer(topic: str, payload: bytes) -> str:
+        serialized.append(topic)
+        return f"{topic}={payload.decode()}"
+
+    fast_mqtt = FastMQTT(config=MQTTConfig(connections=2))
+    hub = FanoutHub(fast_mqtt, serializer=_serializer)
+    both = hub.subscribe("sensors/#", "sensors/+/temperature")
+    other = hub.subscribe("sensors/+/temperature")
+
+    # every filter is subscribed without shared group
+    assert set(fast_mqtt.subscriptions) == {"sensors/#", "sensors/+/temperature"}
+    assert fast_mqtt._broker_topic("sensors/#") == "sensors/#"
+
+    # the message matches both filters, it is handled for each one
+    await fast_mqtt._FastMQTT__on_message(
+        fast_mqtt.client, "sensors/1/temperature", b"20", 0, {"retain": [0]}
+    )
+    assert serialized == ["sensors/1/temperature"]
+    assert [both.pending, other.pending] == [1, 1]
+    assert (await both.get()).text == "sensors/1/temperature=20"
+
+    # without properties, e.g. local deliveries, the message is fanned out once as well
+    await fast_mqtt._FastMQTT__on_message(fast_mqtt.client, "sensors/2/temperature", b"21", 0, None)
+    assert [both.pending, other.pending] == [1, 2]
+    assert (await both.get()).text == "sensors/2/temperature=21"
+
+    other.close()
+    assert set(fast_mqtt.subscriptions) == {"sensors/#", "sensors/+/temperature"}
+    both.close()
+    assert fast_mqtt.subscriptions == {}
+    assert len(hub) == 0
+
+
+async def test_slow_consumer_policies():
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    hub = FanoutHub(fast_mqtt, queue_size=2)
+    dropping = hub.subscribe("a")
+    disconnected = hub.subscribe("a", slow_consumer="disconnect")
+
+    for payload in (b"1", b"2", b"3"):
+        hub.fan_out("a", payload)
+
+    assert [(await dropping.get()).text for _ in range(2)] == [
+        '{"topic": "a", "payload": "2"}',
+        '{"topic": "a", "payload": "3"}',
+    ]
+    assert disconnected.closed and disconnected.slow
+    assert await disconnected.get() is None
+    assert (hub.dropped, hub.disconnected) == (1, 1)
+
+
+async def test_remove_subscription_keeps_other_handlers():
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+
+    @fast_mqtt.subscribe("a/#")
+    def _handler(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        pass
+
+    hub = FanoutHub(fast_mqtt)
+    hub.subscribe("a/#").close()
+    assert len(fast_mqtt.subscriptions["a/#"][1]) == 1
+    fast_mqtt.mqtt_handlers.shutdown()
+
+
+async def test_websocket_and_sse_endpoints():
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    hub = FanoutHub(fast_mqtt)
+    app = FastAPI()
+    app.include_router(hub.router(prefix="/mqtt"))
+
+    async with TestClient(app) as client:
+        async with client.websocket_connect("/mqtt/ws?topic=alerts/fire") as websocket:
+            await _wait_for(lambda: hub.subscribers)
+            hub.fan_out("alerts/fire", b"kitchen")
+            assert await websocket.receive_text() == (
+                '{"topic": "alerts/fire", "payload": "kitchen"}'
+            )
+
+        async def _publish() -> None:
+            await _wait_for(lambda: hub.subscribers.get("alerts/+"))
+            hub.fan_out("alerts/flood", b"cellar")
+            (subscriber,) = hub.subscribers["alerts/+"]
+            await _wait_for(lambda: not subscriber.pending)
+            hub.close()
+
+        publisher = asyncio.ensure_future(_publish())
+        response = await client.get("/mqtt/sse", query_string={"topic": "alerts/+"}, stream=True)
+        body = b"".join([chunk async for chunk in response.iter_content(1024)])
+        await publisher
+
+        assert (await client.get("/mqtt/sse")).status_code == 400
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert body == b'data: {"topic": "alerts/flood", "payload": "cellar"}\n\n'
+
+
+async def test_runtime_subscriptions_through_local_broker():
+    async with Broker() as broker:
+        fast_mqtt = FastMQTT(config=MQTTConfig(host=broker.host, port=broker.port))
+        hub = FanoutHub(fast_mqtt)
+        await fast_mqtt.mqtt_startup()
+
+        subscriber = hub.subscribe("jobs/#")
+        await _wait_for(lambda: broker._subscriptions)
+        fast_mqtt.publish("jobs/1", "run")
+        frame = await asyncio.wait_for(subscriber.get(), 2)
+
+        subscriber.close()
+        await _wait_for(lambda: not broker._subscriptions)
+        await fast_mqtt.mqtt_shutdown()
+
+    assert frame.text == '{"topic": "jobs/1", "payload": "run"}'
@@ -0,0 +1,114 @@
+from typing import Any
+
+from async_asgi_testclient import TestClient
+from fastapi import Depends, FastAPI
+from typing_extensions import Annotated
+
+from fastapi_mqtt import FastMQTT, LastValues, LastValueSettings, MQTTConfig
+from fastapi_mqtt.lastvalue import LastValueCache
+
+from .broker import Broker
+from .test_local_broker import _wait_for
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_last_value_cache_ttl_and_lru():
+    clock = _Clock()
+    cache = LastValueCache("s/+", LastValueSettings(max_entries=2, ttl=10), clock=clock)
+
+    await cache.add(None, "s/1", b"1", 0, {})
+    await cache.add(None, "s/2", b"2", 0, {})
+    await cache.add(None, "s/1", b"3", 0, {})
+    assert cache.get("s/1").payload == b"3"
+    # s/2 is the least recently used
+    await cache.add(None, "s/3", b"4", 0, {})
+    assert cache.get("s/2") is None
+    assert [value.topic for value in cache.query("s/#")] == ["s/1", "s/3"]
+
+    clock.now = 5
+    await cache.add(None, "s/1", b"5", 0, {})
+    clock.now = 10
+    assert cache.get("s/3") is None
+    assert [value.payload for value in cache.query("s/+")] == [b"5"]
+    assert len(cache) == 1
+
+
+async def test_last_values_dependency():
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(
+            last_values={
+                "sensors/+/temperature": LastValueSettings(),
+                "status": LastValueSettings(),
+            }
+        )
+    )
+    assert set(fast_mqtt.subscriptions) == {"sensors/+/temperature", "status"}
+
+    on_message = fast_mqtt._FastMQTT__on_message
+    for topic, payload in (
+        ("sensors/1/temperature", b"20"),
+        ("sensors/2/temperature", b"21"),
+        ("sensors/1/temperature", b"22"),
+        ("sensors/1/humidity", b"40"),
+    ):
+        await on_message(fast_mqtt.client, topic, payload, 0, {})
+
+    app = FastAPI()
+
+    @app.get("/sensors/{sensor}")
+    async def _sensor(
+        sensor: str, values: Annotated[LastValues, Depends(fast_mqtt.last_values)]
+    ) -> Any:
+        value = values.get(f"sensors/{sensor}/temperature")
+        return value.payload.decode() if value else None
+
+    @app.get("/sensors")
+    async def _sensors(values: Annotated[LastValues, Depends(fast_mqtt.last_values)]) -> Any:
+        return {value.topic: value.payload.decode() for value in values.query("sensors/#")}
+
+    async with TestClient(app) as client:
+        assert (await client.get("/sensors/1")).json() == "22"
+        assert (await client.get("/sensors/3")).json() is None
+        assert (await client.get("/sensors")).json() == {
+            "sensors/1/temperature": "22",
+            "sensors/2/temperature": "21",
+        }
+
+
+async def test_last_values_not_shared_between_connections():
+    async with Broker() as broker:
+        fast_mqtt = FastMQTT(
+            config=MQTTConfig(
+                host=broker.host,
+                port=broker.port,
+                connections=2,
+                last_values={"sensors/#": LastValueSettings()},
+            )
+        )
+        assert fast_mqtt._broker_topic("sensors/#") == "sensors/#"
+
+        await fast_mqtt.mqtt_startup()
+        await _wait_for(lambda: fast_mqtt.health.healthy)
+        for index in range(4):
+            fast_mqtt.publish(f"sensors/{index}", str(index))
+        await _wait_for(lambda: len(fast_mqtt.last_values.caches["sensors/#"]) == 4)
+        subscriptions = [(s.topic_filter, s.group) for s in broker._subscriptions]
+        await fast_mqtt.mqtt_shutdown()
+
+    # subscribed once, by the main connection
+    assert subscriptions == [("sensors/#", None)]
+
+
+def test_last_values_not_shared_between_workers():
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(worker_scaling=True, last_values={"sensors/#": LastValueSettings()}),
+        client_id="app",
+    )
+    assert fast_mqtt._broker_topic("sensors/#") == "sensors/#"
@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any, List
+
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from .benchmarks import bench_match
+from .broker import Broker
+
+
+async def _wait_for(condition: Any, seconds: float = 2.0) -> None:
+    async def _poll() -> None:
+        while not condition():  # noqa: ASYNC110
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(_poll(), seconds)
+
+
+async def test_publish_subscribe_through_local_broker():
+    async with Broker() as broker:
+        fast_mqtt = FastMQTT(
+            config=MQTTConfig(
+                host=broker.host, port=broker.port, auto_subscription_identifiers=True
+            )
+        )
+        received: List[Any] = []
+
+        @fast_mqtt.subscribe("sensors/+/temperature")
+        async def _temperature(
+            client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
+        ):
+            received.append((topic, payload, properties["subscription_identifier"]))
+
+        await fast_mqtt.mqtt_startup()
+        await _wait_for(lambda: broker.sessions and broker._subscriptions)
+        fast_mqtt.publish("sensors/kitchen/temperature", "21")
+        await fast_mqtt.publish_async("sensors/kitchen/humidity", "40", qos=2)
+        await _wait_for(lambda: received)
+        await fast_mqtt.mqtt_shutdown()
+
+    assert received == [("sensors/kitchen/temperature", b"21", [1])]
+    assert broker.received == 2
+
+
+async def test_shared_subscription_pool_through_local_broker():
+    async with Broker() as broker:
+        fast_mqtt = FastMQTT(config=MQTTConfig(host=broker.host, port=broker.port, connections=2))
+        clients: List[MQTTClient] = []
+
+        @fast_mqtt.subscribe("jobs/#")
+        async def _jobs(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+            clients.append(client)
+
+        await fast_mqtt.mqtt_startup()
+        await _wait_for(lambda: len(broker._subscriptions) == 2)
+        for index in range(4):
+            fast_mqtt.publish(f"jobs/{index}", "run")
+        await _wait_for(lambda: len(clients) == 4)
+        await fast_mqtt.mqtt_shutdown()
+
+    # each message is handled once, spread over both connections
+    assert {id(client) for client in clients} == {id(client) for client in fast_mqtt.clients}
+
+
+def test_benchmark_results_format():
+    results = bench_match.run(quick=True)
+    assert {result["name"] for result in results} == {"match", "trie_match"}
+    assert all(result["ops_per_second"] > 0 for result in results)
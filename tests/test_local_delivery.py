@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, List
+
+from gmqtt import Client as MQTTClient
+from gmqtt import Message
+
+from .test_publisher import _connected_client
+
+
+async def test_local_only_skips_broker_for_matched_topics():
+    fast_mqtt = _connected_client(local_delivery="local_only")
+    protocol = fast_mqtt.client._connection._protocol
+    received: List[Any] = []
+
+    @fast_mqtt.subscribe("jobs/+")
+    async def _jobs(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append((topic, payload, qos, properties))
+
+    fast_mqtt.publish("jobs/1", "run", qos=1, response_topic="replies")
+    fast_mqtt.publish_many([Message("jobs/2", b"run"), Message("other", b"x")])
+    await fast_mqtt.publish_async("jobs/3", b"run", qos=1)
+    await asyncio.sleep(0.01)
+
+    assert received == [
+        ("jobs/1", b"run", 1, {"response_topic": ["replies"], "dup": 0, "retain": 0}),
+        ("jobs/2", b"run", 0, {"dup": 0, "retain": 0}),
+        ("jobs/3", b"run", 1, {"dup": 0, "retain": 0}),
+    ]
+    # only the unmatched message reached the broker
+    assert len(protocol.writes) == 1
+
+
+async def test_local_and_broker_uses_no_local():
+    fast_mqtt = _connected_client(local_delivery="local_and_broker")
+    protocol = fast_mqtt.client._connection._protocol
+    received: List[str] = []
+    subscribed: List[Any] = []
+    fast_mqtt.client.subscribe = lambda batch, **kwargs: subscribed.extend(batch)
+
+    @fast_mqtt.subscribe("jobs/+", "$share/workers/tasks/#")
+    async def _jobs(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(topic)
+
+    @fast_mqtt.subscribe("events/#", no_local=True)
+    async def _events(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(topic)
+
+    for topic in ("jobs/1", "tasks/1", "events/1"):
+        fast_mqtt.publish(topic, "run")
+    await asyncio.sleep(0.01)
+
+    # shared and no_local subscriptions only receive messages through the broker
+    assert received == ["jobs/1"]
+    assert len(protocol.writes) == 3
+
+    fast_mqtt._FastMQTT__on_connect(fast_mqtt.client, 0, 0, {})
+    assert {(s.topic, s.no_local) for s in subscribed} == {
+        ("jobs/+", True),
+        ("$share/workers/tasks/#", False),
+        ("events/#", True),
+    }
+
+
+async def test_local_delivery_disabled_by_default():
+    fast_mqtt = _connected_client()
+    protocol = fast_mqtt.client._connection._protocol
+    received: List[str] = []
+
+    @fast_mqtt.subscribe("jobs/+")
+    async def _jobs(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(topic)
+
+    fast_mqtt.publish("jobs/1", "run")
+    await asyncio.sleep(0.01)
+    assert received == []
+    assert len(protocol.writes) == 1
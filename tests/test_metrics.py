@@ -0,0 +1,71 @@
+from typing import Any
+
+import pytest
+from async_asgi_testclient import TestClient
+from fastapi import FastAPI
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.metrics import Histogram, MQTTMetrics
+
+from .conftest import Deliver
+
+
+def test_histogram_buckets():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.sum == pytest.approx(3.65)
+
+
+async def test_dispatch_metrics(monkeypatch: pytest.MonkeyPatch, deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(metrics=True))
+
+    @fast_mqtt.subscribe("sensors/+/temperature", "sensors/#")
+    async def _sensors(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        if payload == b"fail":
+            raise ValueError(payload)
+
+    await deliver(fast_mqtt, "sensors/kitchen/temperature")
+    await deliver(fast_mqtt, "sensors/kitchen/humidity")
+    # each handler fails on its own, the other results are kept
+    results = await deliver(fast_mqtt, "sensors/kitchen/temperature", b"fail")
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    monkeypatch.setattr(fast_mqtt.client, "subscribe", lambda batch, **kwargs: None)
+    fast_mqtt._FastMQTT__on_connect(fast_mqtt.client, 0, 0, {})
+    fast_mqtt._FastMQTT__on_connect(fast_mqtt.client, 0, 0, {})
+
+    metrics = fast_mqtt.metrics
+    assert metrics.messages_received == 3
+    assert metrics.filter_messages == {"sensors/+/temperature": 2, "sensors/#": 3}
+    assert [(h.calls, h.failures) for h in metrics.handlers] == [(2, 1), (3, 1)]
+    assert (metrics.connects, metrics.reconnects) == (2, 1)
+
+    text = metrics.render()
+    handler = "tests.test_metrics.test_dispatch_metrics.<locals>._sensors"
+    labels = f'filter="sensors/#",handler="{handler}"'
+    assert f"fastapi_mqtt_handler_calls_total{{{labels}}} 3" in text
+    assert f'fastapi_mqtt_handler_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert 'fastapi_mqtt_filter_messages_total{filter="sensors/+/temperature"} 2' in text
+    assert "fastapi_mqtt_subscriptions 2" in text
+    assert "fastapi_mqtt_reconnects_total 1" in text
+
+
+async def test_metrics_router():
+    metrics = MQTTMetrics()
+    metrics.messages_published = 7
+    metrics.message_matched('quoted/"topic"')
+    app = FastAPI()
+    app.include_router(metrics.router())
+
+    async with TestClient(app) as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "fastapi_mqtt_messages_published_total 7" in response.text
+    assert 'fastapi_mqtt_filter_messages_total{filter="quoted/\\"topic\\""} 1' in response.text
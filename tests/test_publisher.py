@@ -0,0 +1,208 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from gmqtt import Client as MQTTClient
+from gmqtt import Message
+from gmqtt.mqtt.constants import MQTTv50
+from gmqtt.mqtt.package import PublishPacket
+from gmqtt.mqtt.utils import IdGenerator
+
+from fastapi_mqtt import FastMQTT, MQTTConfig, PublishRefusedError
+
+
+class _FakeProtocol:
+    proto_ver = MQTTv50
+
+    def __init__(self) -> None:
+        self.id_generator = IdGenerator()
+        self.writes: List[bytes] = []
+
+    def write_data(self, data: bytes) -> None:
+        self.writes.append(bytes(data))
+
+    def send_publish(self, message: Message):
+        mid, packet = PublishPacket.build_package(message, self)
+        self.write_data(packet)
+        return mid, packet
+
+
+def _connect(client: MQTTClient) -> None:
+    protocol = _FakeProtocol()
+    client._connection = SimpleNamespace(
+        _protocol=protocol, publish=protocol.send_publish, is_closing=lambda: False
+    )
+    client._connack_received.set()
+
+
+def _connected_client(**config) -> FastMQTT:
+    fast_mqtt = FastMQTT(config=MQTTConfig(**config))
+    _connect(fast_mqtt.client)
+    return fast_mqtt
+
+
+async def test_publish_many_single_write():
+    fast_mqtt = _connected_client()
+    protocol = fast_mqtt.client._connection._protocol
+
+    fast_mqtt.publish_many(
+        [Message("a/b", "one"), Message("a/c", b"two", qos=1), Message("a/d", 3, qos=2)]
+    )
+
+    assert len(protocol.writes) == 1
+    assert b"one" in protocol.writes[0] and b"two" in protocol.writes[0]
+    # QoS 1/2 packets are kept until acknowledged
+    assert len(fast_mqtt.client._persistent_storage.get_all()) == 2
+
+
+async def test_publish_queue_coalesces_writes():
+    fast_mqtt = _connected_client(
+        publish_queue=True, publish_queue_max_bytes=1024, publish_queue_max_delay=0.01
+    )
+    protocol = fast_mqtt.client._connection._protocol
+    assert fast_mqtt.publish_queue is not None
+
+    for number in range(10):
+        fast_mqtt.publish("metrics", f"value-{number}")
+    assert protocol.writes == []
+    assert fast_mqtt.publish_queue.buffered_bytes > 0
+
+    await asyncio.sleep(0.02)
+    assert len(protocol.writes) == 1
+    assert protocol.writes[0].index(b"value-0") < protocol.writes[0].index(b"value-9")
+
+    # the size threshold writes without waiting
+    fast_mqtt.publish_many(Message("metrics", b"x" * 600) for _ in range(2))
+    assert len(protocol.writes) == 2
+    assert fast_mqtt.publish_queue.buffered_bytes == 0
+
+
+async def test_publish_async_waits_for_acknowledgement():
+    fast_mqtt = _connected_client(publish_inflight_window=1)
+    storage = fast_mqtt.acknowledgements
+
+    first = asyncio.create_task(fast_mqtt.publish_async("orders", "1", qos=1))
+    second = asyncio.create_task(fast_mqtt.publish_async("orders", "2", qos=2))
+    await asyncio.sleep(0.01)
+    assert not first.done()
+    # the window is full, the second message is not sent yet
+    assert storage.inflight == 1
+
+    ((mid, _),) = storage.get_all()
+    storage.remove_message_by_mid(mid)  # PUBACK
+    await first
+    await asyncio.sleep(0.01)
+    assert storage.inflight == 1
+    assert not second.done()
+
+    ((mid, _),) = storage.get_all()
+    storage.remove_message_by_mid(mid)  # PUBCOMP
+    await second
+
+    # QoS 0 does not wait
+    await fast_mqtt.publish_async("orders", "3", qos=0)
+    assert storage.inflight == 0
+
+
+async def test_publish_async_timeout_and_lost_session():
+    fast_mqtt = _connected_client()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await fast_mqtt.publish_async("orders", "1", qos=1, timeout=0.01)
+    assert fast_mqtt.acknowledgements.inflight == 1
+
+    pending = asyncio.create_task(fast_mqtt.publish_async("orders", "2", qos=1))
+    await asyncio.sleep(0)
+    fast_mqtt.acknowledgements.clear()  # CONNACK without session present
+    with pytest.raises(ConnectionError):
+        await pending
+
+
+async def test_publish_async_single_deadline():
+    fast_mqtt = _connected_client(publish_inflight_window=1)
+    blocking = asyncio.create_task(fast_mqtt.publish_async("orders", "1", qos=1))
+    await asyncio.sleep(0)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    waiting = asyncio.create_task(fast_mqtt.publish_async("orders", "2", qos=1, timeout=0.1))
+    await asyncio.sleep(0.06)
+    # the slot frees up late, only the rest of the timeout is left for the acknowledgement
+    ((mid, _),) = fast_mqtt.acknowledgements.get_all()
+    fast_mqtt.acknowledgements.remove_message_by_mid(mid)
+    await blocking
+    with pytest.raises(asyncio.TimeoutError):
+        await waiting
+    assert loop.time() - start < 0.15
+
+
+async def test_publish_async_refused_by_broker():
+    fast_mqtt = _connected_client()
+    handler = fast_mqtt.client._package_handler
+
+    pending = asyncio.create_task(fast_mqtt.publish_async("orders", "1", qos=2))
+    await asyncio.sleep(0)
+    ((mid, _),) = fast_mqtt.acknowledgements.get_all()
+    # PUBREC with reason code 0x87 (not authorized)
+    handler._handle_pubrec_packet(0x50, mid.to_bytes(2, "big") + b"\x87")
+
+    with pytest.raises(PublishRefusedError) as refused:
+        await pending
+    assert refused.value.reason_code == 0x87
+    assert fast_mqtt.acknowledgements.inflight == 0
+
+
+async def test_publish_async_disconnected():
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    with pytest.raises(ConnectionError):
+        await fast_mqtt.publish_async("orders", "1", qos=1)
+
+    spooling = FastMQTT(config=MQTTConfig(spool=True))
+    await spooling.publish_async("orders", "1", qos=1)
+    assert len(spooling.spool) == 1
+    assert not spooling._inflight_window.locked()
+
+
+def _connected_pool(**config) -> FastMQTT:
+    fast_mqtt = FastMQTT(config=MQTTConfig(**config))
+    for client in fast_mqtt.clients:
+        _connect(client)
+    return fast_mqtt
+
+
+def _writes(fast_mqtt: FastMQTT) -> List[int]:
+    return [len(client._connection._protocol.writes) for client in fast_mqtt.clients]
+
+
+async def test_connection_pool_publish_distribution():
+    fast_mqtt = _connected_pool(connections=3)
+    assert [client._client_id for client in fast_mqtt.clients[1:]] == [
+        f"{fast_mqtt.client._client_id}-1",
+        f"{fast_mqtt.client._client_id}-2",
+    ]
+
+    for _ in range(3):
+        fast_mqtt.publish("devices/1/state", "on")
+    assert sorted(_writes(fast_mqtt)) == [0, 0, 3]
+
+    round_robin = _connected_pool(connections=3, publish_distribution="round_robin")
+    round_robin.publish_many(Message("devices/1/state", "on") for _ in range(6))
+    assert _writes(round_robin) == [1, 1, 1]
+
+
+async def test_connection_pool_shared_subscriptions():
+    fast_mqtt = FastMQTT(config=MQTTConfig(connections=2), client_id="app")
+    subscribed: List[str] = []
+    for client in fast_mqtt.clients:
+        client.subscribe = lambda batch, **kwargs: subscribed.extend(s.topic for s in batch)
+
+    @fast_mqtt.subscribe("devices/+/state", "$share/other/alerts")
+    async def _state(client, topic, payload, qos, properties):
+        pass
+
+    for client in fast_mqtt.clients:
+        fast_mqtt._FastMQTT__on_connect(client, 0, 0, {})
+    assert subscribed == ["$share/fastapi-mqtt-app/devices/+/state", "$share/other/alerts"] * 2
+    # dispatch still matches the original topic filters
+    assert fast_mqtt._resolve_subscriptions("devices/1/state") == ("devices/+/state",)
@@ -0,0 +1,198 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+from gmqtt import Client as MQTTClient
+from gmqtt import Message
+from pydantic import ValidationError
+
+from fastapi_mqtt import FastMQTT, MQTTConfig, RateLimit
+from fastapi_mqtt.ratelimit import RateLimiter
+
+from .test_local_broker import _wait_for
+from .test_publisher import _connected_client
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refill_and_burst():
+    clock = _Clock()
+    limiter = RateLimiter("a/#", RateLimit(rate=2, burst=3), clock=clock)
+
+    assert [limiter.acquire() for _ in range(4)] == [0, 0, 0, None]
+    clock.now = 0.5
+    assert limiter.acquire() == 0
+    assert limiter.acquire() is None
+    # tokens never exceed the burst
+    clock.now = 100
+    assert [limiter.acquire() for _ in range(4)] == [0, 0, 0, None]
+    assert (limiter.passed, limiter.dropped, limiter.shed) == (7, 3, 3)
+
+
+def test_delay_policy_reserves_tokens():
+    clock = _Clock()
+    limiter = RateLimiter(
+        "a", RateLimit(rate=10, burst=1, policy="delay", max_delay=0.25), clock=clock
+    )
+
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == pytest.approx(0.1)
+    assert limiter.acquire() == pytest.approx(0.2)
+    # beyond max_delay the message is dropped
+    assert limiter.acquire() is None
+    assert (limiter.delayed, limiter.dropped) == (2, 1)
+
+
+def test_overflow_policy_needs_handler():
+    with pytest.raises(ValidationError):
+        RateLimit(rate=1, policy="overflow")
+
+
+@pytest.mark.parametrize("settings", [{"rate": 0}, {"rate": -1}, {"rate": 1, "burst": 0}])
+def test_rate_and_burst_must_be_positive(settings: Dict[str, float]):
+    with pytest.raises(ValidationError):
+        RateLimit(**settings)
+
+
+async def test_inbound_limit_per_topic_filter():
+    overflowed: List[str] = []
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(
+            metrics=True,
+            inbound_rate_limits={
+                "noisy/#": RateLimit(rate=1, burst=2),
+                "spare/#": RateLimit(
+                    rate=1,
+                    burst=1,
+                    policy="overflow",
+                    overflow_handler=lambda client, topic, *args: overflowed.append(topic),
+                ),
+            },
+        )
+    )
+    received: List[str] = []
+
+    @fast_mqtt.subscribe("noisy/#", "spare/#", "quiet/#")
+    async def _handler(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(topic)
+
+    on_message = fast_mqtt._FastMQTT__on_message
+    for topic in ("noisy/1", "quiet/1", "noisy/2", "spare/1", "noisy/3", "spare/2", "quiet/2"):
+        await on_message(fast_mqtt.client, topic, b"", 0, {})
+
+    assert received == ["noisy/1", "quiet/1", "noisy/2", "spare/1", "quiet/2"]
+    assert overflowed == ["spare/2"]
+    rendered = fast_mqtt.metrics.render()
+    assert (
+        'fastapi_mqtt_rate_limited_total{direction="inbound",limiter="noisy/#",action="dropped"} 1'
+        in rendered
+    )
+    fast_mqtt.mqtt_handlers.shutdown()
+
+
+async def test_inbound_delay_policy_defers_handlers():
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(
+            inbound_rate_limits={"a": RateLimit(rate=100, burst=1, policy="delay")},
+        )
+    )
+    received: List[bytes] = []
+
+    @fast_mqtt.subscribe("a")
+    async def _handler(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(payload)
+
+    on_message = fast_mqtt._FastMQTT__on_message
+    await asyncio.gather(*(on_message(fast_mqtt.client, "a", b"%d" % i, 0, {}) for i in range(3)))
+    assert received == [b"0"]
+
+    await asyncio.gather(*fast_mqtt._background_tasks)
+    assert received == [b"0", b"1", b"2"]
+    assert fast_mqtt.rate_limiters[0].delayed == 2
+
+
+async def test_inbound_delay_does_not_hold_dispatch_workers():
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(
+            dispatch_workers=1,
+            inbound_rate_limits={"slow": RateLimit(rate=10, burst=1, policy="delay")},
+        )
+    )
+    received: List[str] = []
+
+    @fast_mqtt.subscribe("slow", "fast")
+    async def _handler(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(topic)
+
+    fast_mqtt.dispatcher.start()
+    on_message = fast_mqtt._FastMQTT__on_message
+    for topic in ("slow", "slow", "fast"):
+        await on_message(fast_mqtt.client, topic, b"", 0, {})
+    await _wait_for(lambda: len(received) == 2)
+    # the delayed message waits in the background while the single worker goes on
+    assert received == ["slow", "fast"]
+
+    await asyncio.gather(*fast_mqtt._background_tasks)
+    assert received == ["slow", "fast", "slow"]
+    await fast_mqtt.dispatcher.stop()
+
+
+async def test_outbound_limits():
+    shed: List[Message] = []
+    fast_mqtt = _connected_client(
+        outbound_rate_limits={"alerts/+": RateLimit(rate=1, burst=1)},
+        publish_rate_limit=RateLimit(
+            rate=1, burst=3, policy="overflow", overflow_handler=shed.append
+        ),
+    )
+    protocol = fast_mqtt.client._connection._protocol
+
+    for topic in ("alerts/1", "alerts/2", "status", "status", "status"):
+        fast_mqtt.publish(topic, "x")
+
+    # alerts/2 is dropped by the per-topic limit, the last status by the global one
+    assert len(protocol.writes) == 3
+    assert [message.topic for message in shed] == [b"status"]
+    limiters = {limiter.name: limiter for limiter in fast_mqtt.rate_limiters}
+    assert (limiters["alerts/+"].dropped, limiters["*"].overflowed) == (1, 1)
+
+
+async def test_outbound_tokens_refunded_when_shed():
+    fast_mqtt = _connected_client(
+        outbound_rate_limits={
+            "alerts/#": RateLimit(rate=1, burst=5),
+            "+/fire": RateLimit(rate=1, burst=1),
+        },
+        publish_rate_limit=RateLimit(rate=1, burst=5),
+    )
+
+    for _ in range(3):
+        fast_mqtt.publish("alerts/fire", "x")
+
+    # only the first message was sent, the tokens the others took were given back
+    limiters = {limiter.name: limiter for limiter in fast_mqtt.rate_limiters}
+    assert limiters["+/fire"].dropped == 2
+    assert (limiters["alerts/#"].passed, limiters["*"].passed) == (1, 1)
+    assert limiters["alerts/#"]._tokens == pytest.approx(4, abs=0.1)
+    assert limiters["*"]._tokens == pytest.approx(4, abs=0.1)
+
+
+async def test_outbound_delay_publishes_later():
+    fast_mqtt = _connected_client(
+        publish_rate_limit=RateLimit(rate=100, burst=1, policy="delay"),
+    )
+    protocol = fast_mqtt.client._connection._protocol
+
+    fast_mqtt.publish("a", "1")
+    fast_mqtt.publish("a", "2")
+    assert len(protocol.writes) == 1
+
+    await asyncio.gather(*fast_mqtt._background_tasks)
+    assert len(protocol.writes) == 2
+    assert b"2" in protocol.writes[1]
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any
+
+import pytest
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt import FastMQTT, MQTTConfig
+
+from .broker import Broker
+from .test_local_broker import _wait_for
+
+
+async def test_request_response_through_local_broker():
+    async with Broker() as broker:
+        config = MQTTConfig(host=broker.host, port=broker.port)
+        requester = FastMQTT(config=config, client_id="requester")
+        device = FastMQTT(config=config, client_id="device")
+
+        @device.subscribe("devices/+/commands")
+        async def _command(
+            client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
+        ):
+            device.publish(
+                properties["response_topic"][0],
+                payload.upper(),
+                correlation_data=properties["correlation_data"][0],
+            )
+
+        await device.mqtt_startup()
+        await requester.mqtt_startup()
+        await _wait_for(lambda: len(broker._subscriptions) == 1)
+
+        responses = await asyncio.gather(
+            requester.request("devices/1/commands", "ping", timeout=2),
+            requester.request("devices/2/commands", "pong", timeout=2),
+        )
+        with pytest.raises(asyncio.TimeoutError):
+            await requester.request("nobody/commands", "ping", timeout=0.05)
+
+        await requester.mqtt_shutdown()
+        await device.mqtt_shutdown()
+
+    assert [response.payload for response in responses] == [b"PING", b"PONG"]
+    assert responses[0].topic == "fastapi-mqtt/responses/requester"
+    # answered and timed out requests leave nothing behind
+    assert len(requester.pending_requests) == 0
+    assert broker.subscribe_packets == 2
+
+
+async def test_late_response_is_dropped():
+    fast_mqtt = FastMQTT(config=MQTTConfig(), client_id="app")
+    received = []
+
+    @fast_mqtt.on_message()
+    async def _message(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        received.append(topic)
+
+    await fast_mqtt._FastMQTT__on_message(
+        fast_mqtt.client, fast_mqtt.response_topic, b"", 1, {"correlation_data": [b"old"]}
+    )
+    assert received == []
@@ -0,0 +1,165 @@
+import logging
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from gmqtt import Message
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.spool import DiskSpool, encode_message, PublishSpool
+
+from .test_publisher import _FakeProtocol
+
+
+def _topics(spool: PublishSpool) -> List[bytes]:
+    topics = []
+    while spool:
+        topics.append(spool.peek().topic)
+        spool.pop()
+    return topics
+
+
+def test_disk_spool_survives_restart(tmp_path: Path):
+    path = tmp_path / "spool.bin"
+    spool = DiskSpool(path, max_bytes=4096)
+    message = Message(
+        "a/b",
+        b"\x00payload",
+        qos=1,
+        retain=True,
+        correlation_data=b"\x01\x02",
+        user_property=[("key", "value")],
+    )
+    assert spool.append(encode_message(message))
+    assert spool.append(encode_message(Message("a/c", "second")))
+    spool.pop()
+    spool.close()
+
+    spool = DiskSpool(path, max_bytes=4096)
+    assert len(spool) == 1
+    restored = spool.peek()
+    assert (restored.topic, restored.payload, restored.qos, restored.retain) == (
+        b"a/c",
+        b"second",
+        0,
+        False,
+    )
+    spool.pop()
+    assert len(spool) == 0
+    assert spool.used_bytes == 0
+    spool.close()
+
+    spool = DiskSpool(path, max_bytes=4096)
+    spool.append(encode_message(message))
+    restored = spool.peek()
+    assert restored.properties == {
+        "correlation_data": b"\x01\x02",
+        "user_property": [("key", "value")],
+    }
+    spool.close()
+
+
+def test_publish_spool_overflows_to_disk(tmp_path: Path):
+    spool = PublishSpool(
+        FastMQTT(config=MQTTConfig())._logger,
+        memory_size=2,
+        path=tmp_path / "spool.bin",
+        max_bytes=90,
+    )
+    for index in range(6):
+        spool.put(Message(f"t/{index}", b"x" * 10))
+
+    # two in memory, the file fits three records
+    assert (spool.memory_messages, len(spool.disk), spool.dropped) == (2, 3, 1)
+    spool.pop()
+    # messages keep following the ones on disk while it is not empty
+    spool.put(Message("t/6", b"x" * 10))
+    assert spool.dropped == 2
+    assert _topics(spool) == [b"t/1", b"t/2", b"t/3", b"t/4"]
+
+
+def test_publish_spool_close_persists_memory(tmp_path: Path):
+    path = tmp_path / "spool.bin"
+    logger = FastMQTT(config=MQTTConfig())._logger
+    spool = PublishSpool(logger, memory_size=1, path=path)
+    for index in range(3):
+        spool.put(Message(f"t/{index}", b""))
+    spool.close()
+
+    spool = PublishSpool(logger, memory_size=1, path=path)
+    assert _topics(spool) == [b"t/0", b"t/1", b"t/2"]
+
+
+def test_publish_spool_close_without_file_counts_dropped(caplog: pytest.LogCaptureFixture):
+    fast_mqtt = FastMQTT(config=MQTTConfig(spool=True))
+    for index in range(3):
+        fast_mqtt.spool.put(Message(f"t/{index}", b""))
+    with caplog.at_level(logging.WARNING):
+        fast_mqtt.spool.close()
+
+    assert (len(fast_mqtt.spool), fast_mqtt.spool.dropped) == (0, 3)
+    assert "dropping 3 unsent messages" in caplog.text
+
+
+def test_spool_path_refused_with_worker_scaling(tmp_path: Path):
+    config = MQTTConfig(worker_scaling=True, spool=True, spool_path=str(tmp_path / "spool.bin"))
+    with pytest.raises(ValueError, match="worker_scaling"):
+        FastMQTT(config=config, client_id="orders")
+
+
+async def test_publish_spooled_until_connected(monkeypatch: pytest.MonkeyPatch):
+    fast_mqtt = FastMQTT(config=MQTTConfig(spool=True, spool_drain_rate=40))
+    for index in range(8):
+        fast_mqtt.publish(f"t/{index}", "offline")
+    fast_mqtt.publish_many([Message("t/8", "offline")])
+    assert len(fast_mqtt.spool) == 9
+
+    client = fast_mqtt.client
+    protocol = _FakeProtocol()
+    client._connection = SimpleNamespace(
+        _protocol=protocol, publish=protocol.send_publish, is_closing=lambda: False
+    )
+    client._connack_received.set()
+    monkeypatch.setattr(client, "subscribe", lambda batch, **kwargs: None)
+
+    start = time.perf_counter()
+    fast_mqtt._FastMQTT__on_connect(client, 0, 0, {})
+    # published while draining, queued behind the spooled messages
+    fast_mqtt.publish("t/9", "online")
+    await fast_mqtt._spool_drains[0]
+
+    # 10 messages at 40 per second, sent in bursts of 4
+    assert time.perf_counter() - start >= 0.2
+    assert len(protocol.writes) == 10
+    assert all(f"t/{index}".encode() in write for index, write in enumerate(protocol.writes))
+
+    fast_mqtt.publish("t/10", "online")
+    assert len(fast_mqtt.spool) == 0
+    assert len(protocol.writes) == 11
+
+
+async def test_spool_per_connection(tmp_path: Path):
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(connections=2, spool=True, spool_path=str(tmp_path / "spool.bin"))
+    )
+    assert [spool.disk.path.name for spool in fast_mqtt.spools] == ["spool.bin", "spool.bin.1"]
+    client = fast_mqtt.client
+    protocol = _FakeProtocol()
+    client._connection = SimpleNamespace(
+        _protocol=protocol, publish=protocol.send_publish, is_closing=lambda: False
+    )
+    client._connack_received.set()
+
+    # the second connection is down, only its messages are spooled
+    topics = [f"t/{index}" for index in range(10)]
+    for topic in topics:
+        fast_mqtt.publish(topic, "x")
+    spooled = [topic for topic in topics if fast_mqtt._select_client(topic) == 1]
+    assert 0 < len(spooled) < len(topics)
+    assert len(protocol.writes) == len(topics) - len(spooled)
+    assert (len(fast_mqtt.spools[0]), len(fast_mqtt.spools[1])) == (0, len(spooled))
+    for spool in fast_mqtt.spools:
+        spool.close()
@@ -0,0 +1,30 @@
+from typing import Any, List
+
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from .conftest import Deliver
+
+
+async def test_dispatch_by_subscription_identifier(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(auto_subscription_identifiers=True))
+    calls: List[str] = []
+
+    @fast_mqtt.subscribe("devices/+/state", "devices/#", subscription_identifier=99)
+    async def _state(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        calls.append(topic)
+
+    state, everything = (fast_mqtt.subscriptions[t][0] for t in ("devices/+/state", "devices/#"))
+    assert (state.subscription_identifier, everything.subscription_identifier) == (1, 2)
+
+    # the broker sends the identifiers of the subscriptions it matched
+    properties = {"subscription_identifier": [2]}
+    await fast_mqtt._FastMQTT__on_message(fast_mqtt.client, "devices/1/state", b"", 0, properties)
+    assert calls == ["devices/1/state"]
+    assert fast_mqtt.topic_cache.misses == 0
+
+    # without identifiers, topic matching is used
+    await deliver(fast_mqtt, "devices/1/state")
+    assert calls == ["devices/1/state"] * 3
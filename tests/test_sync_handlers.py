@@ -0,0 +1,59 @@
+import functools
+import threading
+from typing import Any, List
+
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+from .conftest import Deliver
+
+
+async def test_sync_handlers_run_in_thread_pool(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(sync_handler_workers=2))
+    threads: List[str] = []
+
+    @fast_mqtt.subscribe("blocking/#")
+    def _blocking(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        threads.append(threading.current_thread().name)
+        return topic
+
+    @fast_mqtt.on_message()
+    def _all(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        threads.append(threading.current_thread().name)
+        return 0
+
+    assert _blocking.__name__ == "_blocking"
+    assert await deliver(fast_mqtt, "blocking/db") == [0, "blocking/db"]
+    assert len(threads) == 2
+    assert all(name.startswith("fastapi-mqtt") for name in threads)
+    fast_mqtt.mqtt_handlers.shutdown()
+
+
+async def test_async_callables_are_awaited(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    calls: List[str] = []
+
+    class _Handler:
+        async def __call__(
+            self, client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any
+        ):
+            calls.append(f"object {topic}")
+
+    async def _handler(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        calls.append(f"decorated {topic}")
+
+    def _sync_decorator(handler: Any) -> Any:
+        @functools.wraps(handler)
+        def _wrapper(*args: Any) -> Any:
+            return handler(*args)
+
+        return _wrapper
+
+    fast_mqtt.subscribe("a")(_Handler())
+    fast_mqtt.subscribe("a")(_sync_decorator(_handler))
+    await deliver(fast_mqtt, "a")
+
+    assert sorted(calls) == ["decorated a", "object a"]
+    fast_mqtt.mqtt_handlers.shutdown()
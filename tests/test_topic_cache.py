@@ -0,0 +1,61 @@
+from typing import Any, List
+
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.topics import TopicCache
+
+from .conftest import Deliver
+
+
+async def test_dispatch_to_matching_subscriptions(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig())
+    calls: List[str] = []
+
+    @fast_mqtt.subscribe("sensors/+/temperature", "$share/group/sensors/#")
+    async def _sensors(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        calls.append(topic)
+
+    await deliver(fast_mqtt, "sensors/kitchen/temperature")
+    await deliver(fast_mqtt, "lights/kitchen")
+    assert calls == ["sensors/kitchen/temperature"] * 2
+
+
+def test_topic_cache_lru():
+    cache = TopicCache(maxsize=2)
+    cache.put("a", ("a",))
+    cache.put("b", ("+",))
+    assert cache.get("a") == ("a",)
+    cache.put("c", ("#",))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ("a",)
+    assert cache.get("c") == ("#",)
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    disabled = TopicCache(maxsize=0)
+    disabled.put("a", ("a",))
+    assert disabled.get("a") is None
+
+
+async def test_topic_cache_invalidated_on_subscribe(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(topic_cache_size=16))
+    calls: List[str] = []
+
+    @fast_mqtt.subscribe("devices/+/state")
+    async def _state(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        calls.append("state")
+
+    await deliver(fast_mqtt, "devices/1/state")
+    await deliver(fast_mqtt, "devices/1/state")
+    assert (fast_mqtt.topic_cache.hits, fast_mqtt.topic_cache.misses) == (1, 1)
+
+    @fast_mqtt.subscribe("devices/#")
+    async def _all(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        calls.append("all")
+
+    assert len(fast_mqtt.topic_cache) == 0
+    await deliver(fast_mqtt, "devices/1/state")
+    assert sorted(calls) == ["all", "state", "state", "state"]
@@ -0,0 +1,85 @@
+import pytest
+
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.topics import TopicTrie
+
+MATCHING_CASES = [
+    # pattern, topic, match
+    ("sport/tennis/player1", "sport/tennis/player1", True),
+    # wildcard "#"
+    ("sport/tennis/#", "sport/tennis/player1", True),
+    ("sport/tennis/#", "sport/tennis", True),
+    ("sport/#", "sport/tennis/player1", True),
+    ("#", "sport/tennis/player1", True),
+    # wildcard "+"
+    ("+", "anything", True),
+    ("+/+", "/anything", True),
+    ("+/tennis", "anything/tennis", True),
+    ("sport/+/player1", "sport/tennis/player1", True),
+    ("+/tennis/player1", "sport/tennis/player1", True),
+    ("sport/tennis/+", "sport/tennis/player1", True),
+    # both wildcards
+    ("sport/+/#", "sport/tennis/player1", True),
+    ("+/tennis/#", "sport/tennis/player1", True),
+    # leading $ and /
+    ("$SYS/state", "$SYS/state", True),
+    ("$SYS/#", "$SYS/state", True),
+    ("/foo/bar", "/foo/bar", True),
+    ("/#", "/foo/bar", True),
+    # non-matching
+    ("sport/tennis/player1", "sport/tennis/player1/ranking", False),
+    ("sport/tennis/player1", "sport/tennis/player2", False),
+    ("sport/tennis/player1", "sport/tennis", False),
+    ("sport/tennis/+", "sport/tennis", False),
+    ("sport/tennis/+", "sport/tennis/player1/ranking", False),
+    ("sport/+/player1", "sport/tennis/player2", False),
+    ("+", "/anything", False),
+    ("+/tennis", "anything/golf", False),
+    ("#", "$SYS/anything", False),
+    ("+/monitor/Clients", "$SYS/monitor/Clients", False),
+    # According to MQTT5.0 item 4.8.2
+    ("$share/myshare/Clients/anything", "Clients/anything", True),
+    ("$share/myshare/Clients/+", "Clients/anything", True),
+    ("$share/myshare//finance", "/finance", True),
+    ("$share/myshare//finance", "finance", False),
+]
+
+
+@pytest.mark.parametrize(argnames=["pattern", "topic", "match"], argvalues=MATCHING_CASES)
+def test_trie_matching(topic: str, pattern: str, match: bool) -> None:
+    trie = TopicTrie()
+    trie.add(pattern)
+    assert trie.match(topic) == ([pattern] if match else [])
+
+
+def test_trie_multiple_filters() -> None:
+    trie = TopicTrie()
+    patterns = {pattern for pattern, _, _ in MATCHING_CASES}
+    for pattern in patterns:
+        trie.add(pattern)
+    assert len(trie) == len(patterns)
+    assert set(trie) == patterns
+
+    for topic in {topic for _, topic, _ in MATCHING_CASES}:
+        expected = {pattern for pattern in patterns if FastMQTT.match(topic, pattern)}
+        matched = trie.match(topic)
+        assert len(matched) == len(expected)
+        assert set(matched) == expected
+
+
+def test_trie_remove() -> None:
+    trie = TopicTrie()
+    trie.add("sport/tennis/+")
+    trie.add("$share/group/sport/tennis/+")
+    trie.add("sport/#")
+
+    assert trie.remove("sport/tennis/+")
+    assert not trie.remove("sport/tennis/+")
+    assert "sport/tennis/+" not in trie
+    assert "$share/group/sport/tennis/+" in trie
+    assert set(trie.match("sport/tennis/player1")) == {"$share/group/sport/tennis/+", "sport/#"}
+
+    assert trie.remove("$share/group/sport/tennis/+")
+    assert trie.remove("sport/#")
+    assert len(trie) == 0
+    assert trie.match("sport/tennis/player1") == []
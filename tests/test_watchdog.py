@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from typing import Any
+
+import pytest
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+from fastapi_mqtt.watchdog import HandlerTimeoutError
+
+from .conftest import Deliver
+
+
+async def test_handler_timeouts_are_isolated(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(handler_timeout=0.02, metrics=True))
+
+    @fast_mqtt.on_message()
+    async def _everything(client: MQTTClient, topic: str, payload: bytes, qos: int, properties):
+        await asyncio.sleep(1)
+
+    @fast_mqtt.subscribe("jobs/#", timeout=1)
+    async def _patient(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        await asyncio.sleep(0.05)
+        return "done"
+
+    @fast_mqtt.subscribe("jobs/+")
+    async def _failing(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        raise ValueError(payload)
+
+    results = await deliver(fast_mqtt, "jobs/1", b"x")
+
+    assert isinstance(results[0], HandlerTimeoutError)
+    assert "_everything" in str(results[0]) and "jobs/1" in str(results[0])
+    assert results[1] == "done"
+    assert isinstance(results[2], ValueError)
+    assert fast_mqtt.watchdog.timeouts == 1
+    assert "fastapi_mqtt_handler_timeouts_total 1" in fast_mqtt.metrics.render()
+
+
+async def test_timeout_of_the_handler_itself_is_not_converted(deliver: Deliver):
+    fast_mqtt = FastMQTT(config=MQTTConfig(handler_timeout=10))
+
+    @fast_mqtt.subscribe("jobs/#")
+    async def _waiting(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        await asyncio.wait_for(asyncio.sleep(1), 0.01)
+
+    results = await deliver(fast_mqtt, "jobs/1")
+
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert not isinstance(results[0], HandlerTimeoutError)
+    assert fast_mqtt.watchdog.timeouts == 0
+
+
+async def test_slow_handler_reported_while_running(
+    caplog: pytest.LogCaptureFixture, deliver: Deliver
+):
+    fast_mqtt = FastMQTT(
+        config=MQTTConfig(slow_handler_threshold=0.01), mqtt_logger=logging.getLogger("mqtt")
+    )
+
+    @fast_mqtt.subscribe("sensors/+", "sensors/#")
+    async def _slow(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        await asyncio.sleep(0.05)
+
+    with caplog.at_level(logging.WARNING, logger="mqtt"):
+        await deliver(fast_mqtt, "sensors/kitchen")
+        await deliver(fast_mqtt, "sensors/kitchen/humidity")
+
+    assert [(h.topic_filter, h.slow_calls) for h in fast_mqtt.watchdog.handlers] == [
+        ("sensors/+", 1),
+        ("sensors/#", 2),
+    ]
+    assert len(caplog.records) == 3
+    message = caplog.records[0].getMessage()
+    assert "test_slow_handler_reported_while_running.<locals>._slow" in message
+    assert message.endswith("on sensors/kitchen")
@@ -0,0 +1,29 @@
+import os
+from typing import Any, List
+
+import pytest
+from gmqtt import Client as MQTTClient
+
+from fastapi_mqtt.config import MQTTConfig
+from fastapi_mqtt.fastmqtt import FastMQTT
+
+
+def test_worker_scaling_subscriptions():
+    fast_mqtt = FastMQTT(config=MQTTConfig(worker_scaling=True), client_id="app")
+    assert fast_mqtt.client._client_id == f"app-{os.getpid()}"
+    subscribed: List[str] = []
+    fast_mqtt.client.subscribe = lambda batch, **kwargs: subscribed.extend(s.topic for s in batch)
+
+    @fast_mqtt.subscribe("devices/+/state")
+    async def _state(client: MQTTClient, topic: str, payload: bytes, qos: int, properties: Any):
+        pass
+
+    fast_mqtt._FastMQTT__on_connect(fast_mqtt.client, 0, 0, {})
+    assert subscribed == ["$share/fastapi-mqtt-app/devices/+/state"]
+    assert list(fast_mqtt.subscriptions) == ["devices/+/state"]
+
+    # without client id, the group must be named
+    with pytest.raises(ValueError):
+        FastMQTT(config=MQTTConfig(worker_scaling=True))
+    named = FastMQTT(config=MQTTConfig(worker_scaling=True, shared_group="orders"))
+    assert named._broker_topic("a") == "$share/orders/a"